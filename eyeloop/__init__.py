@@ -5,6 +5,7 @@ from eyeloop import extractors
 from eyeloop import guis
 from eyeloop import sources
 from eyeloop import run_eyeloop
+from eyeloop import run_batch
 from eyeloop import utilities
 
 __all__ = [
@@ -15,5 +16,6 @@ __all__ = [
     "sources",
     "utilities",
     "run_eyeloop",
+    "run_batch",
     "config"
 ]
@@ -7,3 +7,17 @@ anglesteps_cos = np.array([np.cos(np.radians(i * 360 / angular_iter)) for i in a
 anglesteps_sin = np.array([np.sin(np.radians(i * 360 / angular_iter)) for i in angular_range], dtype=np.float64)
 number_row = np.arange(1, len(anglesteps_cos) + 1, 1)
 zeros = np.zeros(len(number_row), dtype=int)
+
+# blink detection: frame brightness is sampled on a grid of every blink_grid_step-th pixel
+blink_calibration_frames = 300
+blink_grid_step = 4
+blink_onset = 10  # brightness deviation (gray levels) that starts a blink
+blink_offset = 7  # ...and the deviation below which it ends
+
+# parameter auto-tuning (eyeloop autotune): threshold candidates per shape, gaussian kernel sizes tried,
+# the cost of a frame without a fit relative to the (relative) residual, jitter and size terms,
+# and the relative cost margin within which thresholds count as equally good
+tune_thresholds = 32
+tune_blurs = (1, 3, 5, 7, 9)
+tune_failure_cost = 4
+tune_tolerance = .1
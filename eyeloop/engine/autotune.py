@@ -0,0 +1,151 @@
+import logging
+
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.constants.engine_constants import (blink_onset, tune_blurs, tune_failure_cost, tune_thresholds,
+                                                tune_tolerance)
+from eyeloop.engine.blink import BlinkDetector
+from eyeloop.engine.preprocessor import Preprocessor
+from eyeloop.engine.processor import CornealReflection, Pupil
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.target_type import TargetType
+
+logger = logging.getLogger(__name__)
+
+
+def new_processor(name: str):
+    if name == "pupil":
+        return Pupil()
+    return CornealReflection(n=int(name.split("_")[1]))
+
+
+def open_frames(frames: np.ndarray) -> np.ndarray:
+    """
+    Drops blinks: frames whose brightness deviates more than blink_onset from the clip's median.
+    """
+    detector = BlinkDetector()
+    brightness = np.array([detector.brightness(frame) for frame in frames])
+    return frames[np.abs(brightness - np.median(brightness)) <= blink_onset]
+
+
+def threshold_candidates(frames: np.ndarray, name: str, n: int = tune_thresholds) -> np.ndarray:
+    """
+    Integer thresholds spread over the gray levels where the shape's edge can lie:
+    between the darkest pixels and the median for the pupil, between the median and the brightest for a cr.
+    """
+    sample = frames[:, ::4, ::4]
+    low, median, high = np.percentile(sample, (.1, 50, 99.9))
+    if name == "pupil":
+        low, high = low + 1, median
+    else:
+        low, high = median, high - 1
+    return np.unique(np.linspace(low, high, n).round().astype(int))
+
+
+def score_track(processor, preprocessors: list) -> tuple:
+    """
+    Tracks the calibration frames with one processor setting, on the engine's path: the walkout for the pupil,
+    GlintTracker for a corneal reflection (see CornealReflection.track). The cost adds up the share of frames
+    without a fit (weighted by tune_failure_cost), the median fit residual (none for reflections, which are
+    labelled, not fitted), the median frame-to-frame center jitter and the median deviation of the fitted size,
+    all relative to the median radius. Medians keep partly occluded frames (eyelids) from dominating. Lower is better.
+    Returns (cost, stats).
+    """
+    centers, radii, residuals = [], [], []
+    for preprocessor in preprocessors:
+        params = processor.track(preprocessor.frame, preprocessor)
+        residual = 0. if processor.type == TargetType.CORNEAL_REFLECTION else processor.fit_model.residual
+        if params is None or residual is None:
+            continue
+
+        center, width, height, _ = params
+        radius = (width + height) / 2
+        if not np.isfinite(radius) or radius >= processor.max_radius * .95 or radius < processor.min_radius * 1.5:
+            continue  # rays that never exit collapse to min_radius or run to max_radius
+
+        centers.append(center)
+        radii.append(radius)
+        residuals.append(residual)
+
+    n = len(preprocessors)
+    if len(radii) < max(n // 4, 2):
+        return np.inf, {"fits": len(radii)}
+
+    radius = np.median(radii)
+    stats = {
+        "fits": len(radii),
+        "radius": radius,
+        "residual": np.median(residuals) / radius,
+        "jitter": np.median(np.linalg.norm(np.diff(centers, axis=0), axis=1)) / radius,
+        "size": np.median(np.abs(np.asarray(radii) - radius)) / radius,
+    }
+    cost = (1 - len(radii) / n) * tune_failure_cost + stats["residual"] + stats["jitter"] + stats["size"]
+    return cost, stats
+
+
+def tune_blur(args: list, frames: np.ndarray, name: str, center: tuple, thresholds: np.ndarray, blur: int) -> list:
+    """
+    Scores every threshold for one gaussian kernel size. The blurred frames are computed once and shared by all
+    thresholds through per-frame Preprocessor caches. Runs in a worker process.
+    Returns [(cost, threshold, blur, stats)].
+    """
+    config.arguments = Arguments(args)
+
+    erode = new_processor(name).erode
+    preprocessors = []
+    for frame in frames:
+        preprocessor = Preprocessor(frame)
+        preprocessor.blurred((blur, blur), erode)
+        preprocessors.append(preprocessor)
+
+    height, width = frames.shape[1:3]
+    results = []
+    for threshold in thresholds:
+        processor = new_processor(name)
+        processor.set_dimensions((width, height))
+        processor.binarythreshold = float(threshold)
+        processor.blur = [blur, blur]
+        processor.set_center(center)
+
+        cost, stats = score_track(processor, preprocessors)
+        results.append((cost, int(threshold), blur, stats))
+    return results
+
+
+def tune(args: list, frames: np.ndarray, centers: dict, map_=map) -> dict:
+    """
+    Grid search of (binarythreshold, blur) per shape on the calibration frames (blinks excluded), starting from
+    the selected centers ({"pupil": (x, y), "cr_0": (x, y), ...}). map_ distributes the (shape, blur) units,
+    e.g. a process pool's map. Returns the params dict Engine.arm loads: [binarythreshold, blur, center] per shape.
+    """
+    frames = open_frames(frames)
+    units = []
+    for name, center in centers.items():
+        thresholds = threshold_candidates(frames, name)
+        units += [(name, center, thresholds, blur) for blur in tune_blurs]
+
+    results = map_(_tune_unit, [(args, frames) + unit for unit in units])
+
+    scores = {}
+    for (name, _, _, blur), unit_scores in zip(units, results):
+        scores.setdefault(name, []).extend(unit_scores)
+
+    params = {}
+    for name, center in centers.items():
+        cost, threshold, blur, stats = min(scores[name], key=lambda score: score[0])
+        if not np.isfinite(cost):
+            raise ValueError(f"No setting tracks {name} from {center} in {len(frames)} frames.")
+
+        # Edges are usually sharp enough that neighbouring thresholds score alike; taking the middle of the
+        # near-optimal thresholds (at the best blur) keeps the setting away from the edge of what works.
+        near = sorted(t for c, t, b, _ in scores[name] if b == blur and c <= cost * (1 + tune_tolerance))
+        threshold = near[len(near) // 2]
+
+        logger.info(f"{name}: threshold {threshold}, blur {blur}, cost {cost:.3f} {stats}")
+        params[name] = [threshold, [blur, blur], center]
+    return params
+
+
+def _tune_unit(unit: tuple) -> list:
+    return tune_blur(*unit)
@@ -0,0 +1,89 @@
+import numpy as np
+
+from eyeloop.constants.engine_constants import (blink_calibration_frames, blink_grid_step, blink_offset,
+                                                blink_onset)
+
+
+class BlinkDetector:
+    """
+    Streaming blink detector on mean frame brightness, O(1) per frame.
+    The first calibration_frames frames establish the baseline (running mean/variance);
+    afterwards the baseline follows slow drifts as an exponentially weighted average of non-blink frames.
+    A blink starts when the brightness deviates more than onset from the baseline and ends once it is back within offset.
+    """
+
+    def __init__(self, calibration_frames: int = blink_calibration_frames, onset: float = blink_onset,
+                 offset: float = blink_offset, step: int = blink_grid_step) -> None:
+        self.onset_threshold = onset
+        self.offset_threshold = offset
+        self.step = step
+        self.alpha = 1 / calibration_frames
+
+        self.samples = np.zeros(calibration_frames, dtype=np.float64)
+        self.n = 0
+        self.mean = 0.
+        self.var = 0.
+
+        self.value = 0.  # brightness of the last frame
+        self.active = False
+        self.onset = False   # a blink started on the last frame
+        self.offset = False  # a blink ended on the last frame
+
+    @property
+    def calibrating(self) -> bool:
+        return self.n < len(self.samples)
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.var)
+
+    def brightness(self, frame: np.ndarray) -> float:
+        return frame[::self.step, ::self.step].mean()
+
+    def load(self, samples: np.ndarray) -> None:
+        """
+        Restores the baseline from calibration samples (blinkcalibration_*.npy).
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        self.samples = samples.copy()
+        self.n = len(samples)
+        self.mean = samples.mean()
+        self.var = samples.var()
+
+    def update(self, frame: np.ndarray) -> bool:
+        """
+        Adds a frame and returns whether the eye is blinking.
+        """
+        return self.add(self.brightness(frame))
+
+    def add(self, value: float) -> bool:
+        """
+        Adds the brightness of a frame and returns whether the eye is blinking; replays recorded brightness values.
+        """
+        self.value = value
+        self.onset = self.offset = False
+
+        if self.calibrating:
+            # Welford's running mean/variance
+            self.samples[self.n] = value
+            self.n += 1
+            delta = value - self.mean
+            self.mean += delta / self.n
+            self.var += (delta * (value - self.mean) - self.var) / self.n
+            return False
+
+        deviation = abs(value - self.mean)
+        if self.active:
+            if deviation < self.offset_threshold:
+                self.active = False
+                self.offset = True
+        elif deviation > self.onset_threshold:
+            self.active = True
+            self.onset = True
+
+        if not self.active:
+            delta = value - self.mean
+            self.mean += self.alpha * delta
+            self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+
+        return self.active
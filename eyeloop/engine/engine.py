@@ -6,15 +6,32 @@ import glob, os
 
 import eyeloop.config as config
 from eyeloop.constants.engine_constants import *
+from eyeloop.engine.blink import BlinkDetector
+from eyeloop.engine.glints import GlintTracker
+from eyeloop.engine.pipeline import Pipeline
+from eyeloop.engine.preprocessor import Preprocessor
 from eyeloop.engine.processor import CornealReflection, Pupil
 from eyeloop.sources.source import Source
 from eyeloop.utilities.general_operations import to_int, tuple_int
+from eyeloop.utilities.latency import LatencyRecorder
+from eyeloop.utilities.profiler import profiler
+from eyeloop.utilities.ring_buffer import DropPolicy
 from eyeloop.utilities.target_type import TargetType
 
 logger = logging.getLogger(__name__)
 PARAMS_DIR = f"{dirname(dirname(abspath(__file__)))}/engine/params"
 
 
+def load_params(path: str) -> dict:
+    """
+    Loads the newest params_*.npy matching path; it must hold a pupil center to seed tracking without the GUI.
+    """
+    params = np.load(max(glob.glob(path), key=os.path.getctime), allow_pickle=True).tolist()
+    if len(params["pupil"]) < 3 or np.ndim(params["pupil"][2]) == 0:
+        raise ValueError(f"{path} has no pupil center. Select the pupil in the GUI and quit to save one.")
+    return params
+
+
 class State(Enum):
     TRACK = 0
     RECORD = 1
@@ -26,15 +43,20 @@ class Engine:
         if (gui is not None):
             self.gui = gui(on_angle=self.update_angle, on_quit=self.release)
 
-        self.extractors = []
-        self.extractor_data = []
+        self.extractors = {}
+        self.extractor_data = {}
         self.state = State.RECORD if config.arguments.tracking == 0 else State.TRACK
-        self.blink_active = False
+        self.blink_detector = BlinkDetector()
 
         self.frame_i = 0
+        self.capture_time = 0.  # capture time of the frame being published, see Source.capture_time
+        self.media_time = None  # its position in the recording, see Source.media_time
+        self.latency = LatencyRecorder(keep_samples=config.arguments.latency == 1)
         self.angle = 0
+        self.preprocessor = Preprocessor()
         self.pupil_processor = Pupil()
-        self.cr_processors = [CornealReflection(n = x) for x in range(2)]
+        self.cr_processors = [CornealReflection(n = x) for x in range(config.arguments.crs)]
+        self.glint_tracker = GlintTracker(self.cr_processors)
 
     def activate(self) -> None:
         """
@@ -54,11 +76,7 @@ class Engine:
         """
         Releases/deactivates all running process, i.e., importers, extractors.
         """
-        param_dict = {
-            "pupil" : [self.pupil_processor.binarythreshold, self.pupil_processor.blur],
-        }
-        for i in range(len(self.cr_processors)):
-            param_dict[f'cr_{i}'] = [self.cr_processors[i].binarythreshold, self.cr_processors[i].blur]
+        param_dict = self.construct_param_dict()
 
         path = f"{config.file_manager.new_folderpath}/params_{self.dataout['time']}.npy"
         np.save(path, param_dict)
@@ -68,11 +86,17 @@ class Engine:
         if (self.gui is not None):
             self.gui.release()
 
-        for extractor in self.extractors:
+        profiler.disable()
+
+        self.latency.log()
+        if config.arguments.latency == 1:
+            self.latency.save(f"{config.file_manager.new_folderpath}/latency.json")
+
+        for key, extractor in self.extractors.items():
             try:
                 extractor.release(self)
             except AttributeError:
-                logger.warning(f"Extractor {extractor} has no release() method")
+                logger.warning(f"Extractor {key} has no release() method")
             else:
                 pass
 
@@ -94,17 +118,42 @@ class Engine:
 
         for key, value in self.extractors.items():
             try:
+                start = profiler.start()
                 self.extractor_data[key] = value.fetch(self)
+                profiler.stop(f"extractor.{key}", start)
+                self.latency.issued(key, self.capture_time)
             except Exception as e:
                 print("Error in module class: {}".format(key))
                 print("Error message: ", e)
 
     def construct_param_dict(self):
-        param_dict = { "pupil" : [self.pupil_processor.binarythreshold, self.pupil_processor.blur] }
+        """
+        Per processor: [binarythreshold, blur, center]. The center (-1 if never selected) seeds batch tracking.
+        """
+        param_dict = { "pupil" : [self.pupil_processor.binarythreshold, self.pupil_processor.blur, self.pupil_processor.center] }
         for i in range(len(self.cr_processors)):
-            param_dict[f'cr_{i}'] = [self.cr_processors[i].binarythreshold, self.cr_processors[i].blur]
+            param_dict[f'cr_{i}'] = [self.cr_processors[i].binarythreshold, self.cr_processors[i].blur, self.cr_processors[i].center]
         return param_dict
 
+    def apply_params(self, param_dict):
+        """
+        Sets thresholds and blur; corneal reflections beyond those saved in param_dict keep their defaults.
+        """
+        self.pupil_processor.binarythreshold, self.pupil_processor.blur = param_dict["pupil"][0], param_dict["pupil"][1]
+        for i in range(len(self.cr_processors)):
+            if f'cr_{i}' in param_dict:
+                self.cr_processors[i].binarythreshold, self.cr_processors[i].blur = param_dict[f'cr_{i}'][0], param_dict[f'cr_{i}'][1]
+
+    def set_centers(self, param_dict):
+        """
+        Seeds the pupil and every corneal reflection with a selected center (-1 = not selected).
+        """
+        self.pupil_processor.set_center(param_dict["pupil"][2])
+        for i, processor in enumerate(self.cr_processors):
+            center = param_dict[f"cr_{i}"][2] if len(param_dict.get(f"cr_{i}", ())) > 2 else -1
+            if np.ndim(center) != 0:
+                processor.set_center(center)
+
     def update_angle(self, inc):
         self.angle += inc
         self.source.angle = self.angle # TODO(aelsen) not great
@@ -121,11 +170,20 @@ class Engine:
         self.center = (width//2, height//2)
         self.width, self.height = width, height
 
+        self.source.capture_time = time.perf_counter()
         self.on_frame(image)
 
+        # Default thresholds; overridden below by any reloaded parameters.
+        filtered_image = image[np.logical_and((image < 220), (image > 30))]
+
+        self.pupil_processor.set_dimensions((width, height))
+        self.pupil_processor.binarythreshold = np.min(filtered_image) * 1 + np.median(filtered_image) * .1 # + 50
+        for i in range(len(self.cr_processors)):
+            self.cr_processors[i].set_dimensions((width, height))
+            self.cr_processors[i].binarythreshold = float(np.min(filtered_image)) * .7 + 150
+
         if config.arguments.blinkcalibration != "":
-            config.blink = np.load(config.arguments.blinkcalibration)
-            self.blink_sampled = lambda _:None
+            self.blink_detector.load(np.load(config.arguments.blinkcalibration))
             logger.info("(success) blink calibration loaded")
 
         if config.arguments.clear == False or config.arguments.params != "":
@@ -138,99 +196,106 @@ class Engine:
                     latest_params = max(glob.glob(PARAMS_DIR + "/*.npy"), key=os.path.getctime)
 
                 params_ = np.load(latest_params, allow_pickle=True).tolist()
-
-                self.pupil_processor.binarythreshold, self.pupil_processor.blur = params_["pupil"][0], params_["pupil"][1]
-                for i in range(len(self.cr_processors)):
-                    self.cr_processors[i].binarythreshold, self.cr_processors[i].blur = params_[f'cr_{i}'][0], params_[f'cr_{i}'][1]
+                self.apply_params(params_)
 
                 logger.warn("(!) Parameters reloaded. Run --clear 1 to prevent this.")
-                param_dict = self.construct_param_dict()
-                logger.info(f"loaded parameters:\n{param_dict}")
 
             except:
                 pass
-            
-        filtered_image = image[np.logical_and((image < 220), (image > 30))]
-
-        self.pupil_processor.set_dimensions((width, height))
-        self.pupil_processor.binarythreshold = np.min(filtered_image) * 1 + np.median(filtered_image) * .1 # + 50
-        for i in range(len(self.cr_processors)):
-            self.cr_processors[i].set_dimensions((width, height))
-            self.cr_processors[i].binarythreshold = float(np.min(filtered_image)) * .7 + 150
 
         param_dict = self.construct_param_dict()
         logger.info(f"loaded parameters:\n{param_dict}")
 
-    def blink_sampled(self, t:int = 1):
-        if t == 1:
-            if config.blink_i% 20 == 0:
-                print(f"calibrating blink detector {round(config.blink_i/config.blink.shape[0]*100,1)}%")
+    def blink_sampled(self) -> None:
+        detector = self.blink_detector
+        if detector.calibrating:
+            if detector.n % 20 == 0:
+                print(f"calibrating blink detector {round(detector.n/len(detector.samples)*100,1)}%")
         else:
             logger.info("(success) blink detection calibrated")
-            path = f"{config.file_manager.new_folderpath}/blinkcalibration_{self.dataout['time']}.npy"
-            np.save(path, config.blink)
+            path = f"{config.file_manager.new_folderpath}/blinkcalibration_{time.time()}.npy"
+            np.save(path, detector.samples)
             print("blink calibration file saved")
 
     def on_frame(self, frame) -> None:
         self.frame_i += 1
+        self.capture_time = self.source.capture_time
+        self.media_time = self.source.media_time
+        self.dataout = self.process(frame)
+        self.publish(frame)
+
+    def process(self, frame) -> dict:
+        """
+        Tracking half of on_frame: returns the data output of the frame without touching extractors or the GUI.
+        """
+        start = profiler.start()
+        self.preprocessor.on_frame(frame)
         if (self.state == State.RECORD):
-            self.record(frame)
+            dataout = self.record(frame)
         else:
-            self.track(frame)
-        
+            dataout = self.track(frame)
+        profiler.stop("process", start)
+        return dataout
+
+    def publish(self, frame) -> None:
+        """
+        Publishing half of on_frame: hands self.dataout to the extractors and the GUI.
+        """
         self.run_extractors()
         if (self.gui is not None):
+            start = profiler.start()
             self.gui.update(frame, self.extractor_data)
+            profiler.stop("gui", start)
+
+        profiler.tick(self.frame_i)
 
     def run(self) -> None:
-        self.source.route()
+        if config.arguments.profile > 0:
+            profiler.enable(config.file_manager.new_folderpath, config.arguments.profile)
+
+        if config.arguments.pipeline == 1:
+            Pipeline(self, config.arguments.queue_size, DropPolicy(config.arguments.drop_policy)).run()
+        else:
+            self.source.route()
 
-    def record(self, frame) -> None:
+    def record(self, frame) -> dict:
         """
         Runs Core engine in record mode. Timestamps all frames in data output log.
         """
-        self.dataout = { "time": time.time() }
+        return { "time": time.time() }
 
-    def track(self, frame) -> None:
+    def track(self, frame) -> dict:
         """
         Executes the tracking algorithm on the pupil and corneal reflections.
-        First, blinking is analyzed.
-        Second, corneal reflections are detected.
-        Third, corneal reflections are inverted at pupillary overlap.
-        Fourth, pupil is detected.
-        Finally, data is logged and extractors are run.
-        """
-        mean_img = np.mean(frame)
-        try:
-            config.blink[config.blink_i] = mean_img
-            config.blink_i += 1
-            self.blink_sampled(1)
-
-        except IndexError:
-            self.blink_sampled(0)
-            self.blink_sampled = lambda _:None
-            config.blink_i = 0
-
-        self.dataout = {
+        First, blinking is analyzed (no blinks are reported while the detector calibrates).
+        Second, pupil is detected.
+        Third, all corneal reflections are detected in one pass and matched to their identities (see GlintTracker).
+        Finally, the data output of the frame is returned for logging.
+        """
+        start = profiler.start()
+        calibrating = self.blink_detector.calibrating
+        is_blinking = self.blink_detector.update(frame)
+        if calibrating:
+            self.blink_sampled()
+        profiler.stop("blink", start)
+
+        dataout = {
             "time": time.time()
         }
 
-        # if np.abs(mean_img - np.mean(config.blink[np.nonzero(config.blink)])) > 10:
-        mean_blink = np.mean(config.blink)
-        is_blinking = np.abs(mean_img - mean_blink) > 10
-        # blinks_nonzero = config.blink[np.nonzero(config.blink)]
-        # if np.abs(mean_img - np.mean(blinks_nonzero)) > 10:
         if is_blinking:
-            self.dataout["blink"] = 1
+            dataout["blink"] = 1
             self.pupil_processor.fit_model.params = None
-            if (not self.blink_active):
-                self.blink_active = True
+            self.glint_tracker.miss()
+            if self.blink_detector.onset:
                 logger.info("Blink started.")
         else:
-            if (self.blink_active):
-                self.blink_active = False
+            if self.blink_detector.offset:
                 logger.info("Blink over.")
 
-            self.dataout["pupil"] = self.pupil_processor.track(frame)
-            for i in range(len(self.cr_processors)):
-                self.dataout[f"cr_{i}"] = self.cr_processors[i].track(frame)
+            dataout["pupil"] = self.pupil_processor.track(frame, self.preprocessor)
+            pupil = None if dataout["pupil"] is None else dataout["pupil"][0]
+            for i, params in enumerate(self.glint_tracker.track(frame, self.preprocessor, pupil)):
+                dataout[f"cr_{i}"] = params
+
+        return dataout
@@ -0,0 +1,188 @@
+import logging
+
+import cv2
+import numpy as np
+
+from eyeloop.constants.processor_constants import glint_tolerance
+from eyeloop.utilities.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+
+def label_glints(binary: np.ndarray, min_radius: float, max_radius: float) -> tuple:
+    """
+    Bright connected components of a binarized image whose area-equivalent radius lies within [min_radius, max_radius].
+    Returns the label image, the component stats, and per valid component its label and
+    [centroid x, centroid y, radius] (shape (k, 3)).
+    """
+    _, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    radius = np.sqrt(stats[1:, cv2.CC_STAT_AREA] / np.pi)
+    valid = np.flatnonzero((radius >= min_radius) & (radius <= max_radius))
+    return labels, stats, valid + 1, np.column_stack((centroids[valid + 1], radius[valid]))
+
+
+def weighted_centroid(labels: np.ndarray, box: np.ndarray, label: int, blurred: np.ndarray, threshold: float) -> tuple:
+    """
+    Centroid of one component weighted by its brightness above threshold; sub-pixel, where the binary centroid
+    only moves when edge pixels flip. box is the component's [left, top, width, height].
+    """
+    x0, y0, width, height = box[:4]
+    weights = blurred[y0:y0 + height, x0:x0 + width].astype(np.float64) - threshold
+    weights[labels[y0:y0 + height, x0:x0 + width] != label] = 0
+    ys, xs = np.mgrid[y0:y0 + height, x0:x0 + width]
+    total = weights.sum()
+    return (weights * xs).sum() / total, (weights * ys).sum() / total
+
+
+def register(centers: np.ndarray, glints: np.ndarray, reach: float, search: float, tolerance: float) -> np.ndarray:
+    """
+    Common displacement of the tracked identities, as the reflections of all LEDs move together with the cornea.
+    Of the displacements that carry one identity onto one glint, the one bringing the most identities within
+    tolerance px of a glint wins, the shortest among equals. Displacements beyond reach (px) must bring at least
+    two identities onto glints, and none may exceed search.
+    centers has shape (m, 2), glints (k, 3); returns the displacement [dx, dy].
+    """
+    shifts = np.vstack((np.zeros((1, 2)), (glints[np.newaxis, :, :2] - centers[:, np.newaxis]).reshape(-1, 2)))
+    lengths = np.linalg.norm(shifts, axis=1)
+
+    moved = centers[np.newaxis] + shifts[:, np.newaxis]
+    distances = np.linalg.norm(moved[:, :, np.newaxis] - glints[np.newaxis, np.newaxis, :, :2], axis=3)
+    hits = (distances.min(axis=2) <= tolerance).sum(axis=1)
+    hits[(lengths > search) | ((lengths > reach) & (hits < 2))] = -1
+    return shifts[np.lexsort((lengths, -hits))[0]]
+
+
+def match_glints(centers: np.ndarray, glints: np.ndarray, reach: float, search: float = 0,
+                 tolerance: float = 0) -> np.ndarray:
+    """
+    Assigns glints to tracked identities: all identities are moved by their common displacement (see register;
+    tolerance 0 = not moved), then matched closest pairs first, each glint at most once and only within
+    reach (px) of its identity. centers has shape (m, 2), glints (k, 3).
+    Returns the glint index per identity, -1 where none matched.
+    """
+    matches = np.full(len(centers), -1)
+    if len(glints) == 0:
+        return matches
+
+    if tolerance > 0:
+        centers = centers + register(centers, glints, reach, max(search, reach), tolerance)
+    distances = np.linalg.norm(centers[:, np.newaxis] - glints[np.newaxis, :, :2], axis=2)
+    distances[distances > reach] = np.inf
+    taken = np.zeros(len(glints), dtype=bool)
+    for flat in np.argsort(distances, axis=None):
+        identity, glint = divmod(int(flat), len(glints))
+        if not np.isfinite(distances[identity, glint]):
+            break
+        if matches[identity] == -1 and not taken[glint]:
+            matches[identity] = glint
+            taken[glint] = True
+    return matches
+
+
+class GlintTracker:
+    """
+    Tracks all corneal reflections of the engine in one pass: the processors sharing a (threshold, blur) setting
+    binarize the shared blurred image once, within the window their glints can lie in, and label its bright
+    components, which are matched to the processors' last (or, with --motion, predicted) centers after moving them
+    by their common displacement (see register).
+    A lost reflection is searched for at its last offset from the pupil; the search for a common displacement
+    widens while reflections stay lost. Each processor keeps its center, radius and fit params as if it had
+    tracked alone.
+    """
+
+    def __init__(self, processors: list) -> None:
+        self.processors = processors
+        self.offsets = [None] * len(processors)  # last center of each reflection relative to the pupil
+
+    def groups(self) -> dict:
+        groups = {}
+        for i, processor in enumerate(self.processors):
+            if processor.active:
+                key = (float(processor.binarythreshold), tuple(processor.blur), processor.erode)
+                groups.setdefault(key, []).append(i)
+        return groups
+
+    def bounds(self, frame: np.ndarray, processors: list) -> tuple:
+        """
+        Smallest window holding every glint the processors can be matched to: their search radius around their
+        centers, plus a glint and the blur margin. Returns (x0, y0, x1, y1), clipped to the frame.
+        """
+        height, width = frame.shape[:2]
+        centers = np.array([processor.center for processor in processors], dtype=np.float64)
+        half = np.array([processor.max_radius * (processor.roi_scale + 1) + max(processor.blur)
+                         for processor in processors])[:, np.newaxis]
+        x0, y0 = np.maximum(np.floor(centers - half).min(axis=0), 0).astype(int)
+        x1, y1 = np.minimum(np.ceil(centers + half).max(axis=0) + 1, (width, height)).astype(int)
+        return x0, y0, x1, y1
+
+    def seed(self, i: int, frame: np.ndarray, pupil) -> None:
+        """
+        Moves processor i to where it is expected in this frame.
+        """
+        processor = self.processors[i]
+        height, width = frame.shape[:2]
+        if processor.roi_scale > 1 and pupil is not None and self.offsets[i] is not None:
+            processor.center = tuple(np.clip(np.add(pupil, self.offsets[i]), 0, (width - 1, height - 1)))
+            return
+
+        prediction = None if processor.motion is None else processor.motion.predict()
+        if prediction is not None:
+            processor.center = tuple(np.clip(prediction, 0, (width - 1, height - 1)))
+
+    def miss(self) -> None:
+        """
+        Frame without tracking (a blink): the reflections may have moved anywhere meanwhile.
+        """
+        for processor in self.processors:
+            if processor.active:
+                processor.widen_roi()
+
+    def track(self, frame: np.ndarray, preprocessor, pupil = None) -> list:
+        """
+        Tracks every active processor, given the last pupil center (None if unknown).
+        Returns the fit params (center, radius, radius, 0) of every processor, None where inactive or lost.
+        """
+        results = [None] * len(self.processors)
+        for (threshold, blur, erode), members in self.groups().items():
+            for i in members:
+                self.seed(i, frame, pupil)
+            processors = [self.processors[i] for i in members]
+            max_radius = processors[0].max_radius
+
+            start = profiler.start()
+            bounds = self.bounds(frame, processors)
+            origin = np.array(bounds[:2])
+            blurred = preprocessor.blurred(blur, erode, bounds)
+            binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)[1]
+            profiler.stop("glints.threshold", start)
+
+            start = profiler.start()
+            labels, stats, glint_labels, glints = label_glints(binary, processors[0].min_radius, max_radius)
+            centers = np.array([processor.center for processor in processors], dtype=np.float64) - origin
+            search = max_radius * max(processor.roi_scale for processor in processors)
+            matches = match_glints(centers, glints, max_radius, search, max_radius * glint_tolerance)
+            profiler.stop("glints.label", start)
+
+            for i, processor, match in zip(members, processors, matches):
+                processor.src, processor.blurred = binary, blurred
+                processor.origin[:] = origin
+                if match == -1:
+                    logger.warning(f"Failed to fit with processor {processor.type} - no glint within reach")
+                    processor.widen_roi()
+                    if processor.motion is not None:
+                        processor.motion.miss()
+                    continue
+
+                label = glint_labels[match]
+                x, y = np.add(weighted_centroid(labels, stats[label], label, blurred, threshold), origin)
+                radius = glints[match, 2]
+                processor.center = (x, y)
+                processor.radius = radius
+                processor.fit_model.params = ((x, y), radius, radius, 0)
+                processor.roi_scale = 1
+                if processor.motion is not None:
+                    processor.motion.update(processor.center)
+                if pupil is not None:
+                    self.offsets[i] = np.subtract(processor.center, pupil)
+                results[i] = processor.fit_model.params
+        return results
@@ -5,70 +5,77 @@
 
 import numpy as np
 import logging
-np.seterr('raise')
 
 from eyeloop.engine.models.model import Model
 from eyeloop.utilities.general_operations import tuple_int
 logger = logging.getLogger(__name__)
 
+# relative tolerance below which the moment determinant is treated as zero (collinear/coincident points)
+DEGENERATE_TOL = 1e-12
+
+
+def hyper_fit(points: np.ndarray) -> tuple:
+    """
+    Fits circles to a stack of point sets in one vectorized pass.
+    Inputs:
+        - points, numpy array of shape (B, n, 2): B point sets of n [x_coord, y_coord] each
+    Outputs:
+        - circles, numpy array of shape (B, 3): xc, yc, R per point set
+        - residuals, numpy array of shape (B,): rms distance of the points to their circle
+    Degenerate point sets (fewer than 3 distinct, collinear points) give NaN instead of raising.
+    """
+    n = points.shape[1]
+    mean = points.mean(axis=1)
+    centered = points - mean[:, np.newaxis]
+    z = np.einsum("bni,bni->bn", centered, centered)
+
+    # moments
+    M = np.einsum("bni,bnj->bij", centered, centered) / n
+    Mxx, Myy, Mxy = M[:, 0, 0], M[:, 1, 1], M[:, 0, 1]
+    Mxz, Myz = np.einsum("bni,bn->ib", centered, z) / n
+    Mz = Mxx + Myy
+
+    # finding the root of the characteristic polynomial
+    det = (Mxx * Myy - Mxy ** 2) * 2
+    det[np.abs(det) <= DEGENERATE_TOL * Mz ** 2] = np.nan
+
+    circles = np.empty((len(points), 3), dtype=np.float64)
+    Xcenter = (Mxz * Myy - Myz * Mxy) / det
+    Ycenter = (Myz * Mxx - Mxz * Mxy) / det
+    circles[:, 0] = Xcenter + mean[:, 0]
+    circles[:, 1] = Ycenter + mean[:, 1]
+    circles[:, 2] = np.sqrt(Xcenter ** 2 + Ycenter ** 2 + Mz)
+
+    distances = np.linalg.norm(points - circles[:, np.newaxis, :2], axis=2)
+    residuals = np.sqrt(np.mean((distances - circles[:, 2:]) ** 2, axis=1))
+
+    return circles, residuals
+
 
 class Circle(Model):
     def __init__(self):
         super().__init__()
+        self.residual = None
 
     def fit(self, r) -> tuple:
         return self.hyper_fit(r)
 
-    def hyper_fit(self, r: float) -> tuple:
+    def hyper_fit(self, r: np.ndarray) -> tuple:
         """
-        Fits coords to circle using hyperfit algorithm.
+        Fits coords to circle using hyperfit algorithm, see hyper_fit().
         Inputs:
-            - coords, list or numpy array with len > 2 of the form:
-            [
-        [x_coord, y_coord],
-        ...,
-        [x_coord, y_coord]
-        ]
-            or numpy array of shape (n, 2)
+            - coords, numpy array of shape (n, 2)
         Outputs:
-            - xc : x-coordinate of solution center (float)
-            - yc : y-coordinate of solution center (float)
-            - R : Radius of solution (float)
-            - residu : s, sigma - variance of data wrt solution (float)
+            - center, (xc, yc); self.params and self.residual are updated.
+        Raises ValueError if the points are degenerate.
         """
-        X, Y = r[:,0], r[:,1]
-        n = X.shape[0]
-
-        mean_X = np.mean(X)
-        mean_Y = np.mean(Y)
-        Xi = X - mean_X
-        Yi = Y - mean_Y
-        Xi_sq = Xi**2
-        Yi_sq = Yi**2
-        Zi = Xi_sq + Yi_sq
-
-        # compute moments
-
-        Mxy = np.sum(Xi * Yi) / n
-        Mxx = np.sum(Xi_sq) / n
-        Myy = np.sum(Yi_sq) / n
-        Mxz = np.sum(Xi * Zi) / n
-        Myz = np.sum(Yi * Zi) / n
-
-        Mz = Mxx + Myy
-
-        # finding the root of the characteristic polynomial
-        det = (Mxx * Myy - Mxy**2) * 2
-        try:
-            Xcenter = (Mxz * Myy - Myz * Mxy) / det
-            Ycenter = (Myz * Mxx - Mxz * Mxy) / det
-        except:
-            return False
-
-        x = Xcenter + mean_X
-        y = Ycenter + mean_Y
+        circles, residuals = hyper_fit(r[np.newaxis])
+        x, y, radius = circles[0]
+        if np.isnan(radius):
+            raise ValueError("Degenerate circle fit")
+
         center = (x, y)
-        r = np.sqrt(Xcenter ** 2 + Ycenter ** 2 + Mz)
-        self.params = (center, r, r, 0)
+        self.params = (center, radius, radius, 0)
+        self.residual = residuals[0]
 
         return center
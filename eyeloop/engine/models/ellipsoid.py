@@ -24,110 +24,156 @@ from eyeloop.engine.models.model import Model
 """
 
 
+# Inverse of the constraint matrix [eqn. 18] from (*), applied to S1 + S2*T as a row permutation and scaling
+C1_INV_ROWS = [2, 1, 0]
+C1_INV_SCALE = np.array([[.5], [-1.], [.5]])
+
+
+def fit_conics(points: np.ndarray) -> tuple:
+    """Least squares fitting algorithm, theory taken from (*), for a stack of point sets.
+    Solving equation Sa=lCa. with a = |a b c d f g> and a1 = |a b c>
+        a2 = |d f g>
+    Args
+    ----
+    points (ndarray): (B, n, 2) stack of B point sets of n [x, y] coordinates each
+    Returns
+    ------
+    coef (ndarray): (B, 6) coefficients [a,b,c,d,f,g] corresponding to ax**2+bxy+cy**2+dx+fy+g
+        in coordinates centered on the mean; NaN where no ellipse satisfies the constraint
+    centered (ndarray): (B, n, 2) centered points
+    mean (ndarray): (B, 2) point set means
+    """
+
+    # coordinates are centered for conditioning
+    mean = points.mean(axis=1)
+    centered = points - mean[:, np.newaxis]
+    x, y = centered[..., 0], centered[..., 1]
+
+    # Design matrix [eqn. 15, 16] and scatter matrices S1, S2, S3 [eqn. 17] from (*)
+    D = np.empty(points.shape[:2] + (6,), dtype=np.float64)
+    D[..., 0] = x * x
+    D[..., 1] = x * y
+    D[..., 2] = y * y
+    D[..., 3] = x
+    D[..., 4] = y
+    D[..., 5] = 1.
+    S = D.transpose(0, 2, 1) @ D
+    S1, S2, S3 = S[:, :3, :3], S[:, :3, 3:], S[:, 3:, 3:]
+
+    # |d f g> = T*|a b c> with T = -S3^(-1)*S2^(T) [eqn. 24]; singular S3 means too few distinct points
+    singular = np.linalg.det(S3) <= 0
+    S3[singular] = np.eye(3)
+    T = -np.linalg.solve(S3, S2.transpose(0, 2, 1))
+
+    # Reduced scatter matrix [eqn. 29]; M*|a b c >=l|a b c > [eqn. 28]
+    M = (S1 + S2 @ T)[:, C1_INV_ROWS] * C1_INV_SCALE
+    evec = np.linalg.eig(M)[1].real
+
+    # eigenvector must meet constraint 4ac - b^2 > 0 to be valid.
+    cond = 4 * evec[:, 0] * evec[:, 2] - evec[:, 1] ** 2
+    valid = np.any(cond > 0, axis=1) & ~singular
+    a1 = np.take_along_axis(evec, np.argmax(cond > 0, axis=1)[:, np.newaxis, np.newaxis], axis=2)
+
+    # eigenvectors |a b c d f g>
+    coef = np.concatenate([a1, T @ a1], axis=1)[..., 0]
+    coef[~valid] = np.nan
+
+    return coef, centered, mean
+
+
+def conic_to_ellipse(a, b, c, d, f, g) -> tuple:
+    """finds the important parameters of the fitted ellipse, theory taken form http://mathworld.wolfram
+    Works on scalars and on arrays of coefficients alike.
+    Args
+    -----
+    a, b, c, d, f, g: coefficients of ax**2+bxy+cy**2+dx+fy+g
+    Returns
+    _______
+    x0, y0: center
+    width (float): major axis
+    height (float): minor axis
+    angle (float): rotation of major axis form the x-axis in degrees
+    """
+
+    # a*x^2 + 2*b*x*y + c*y^2 + 2*d*x + 2*f*y + g = 0 [eqn. 15) from (**) or (***)
+    b, d, f = b / 2., d / 2., f / 2.
+
+    # finding center of ellipse [eqn.19 and 20] from (**)
+    af = a * f
+    cd = c * d
+    bd = b * d
+    ac = a * c
+
+    b_sq = b ** 2.
+    z_ = (b_sq - ac)
+    x0 = (cd - b * f) / z_
+    y0 = (af - bd) / z_
+
+    # Find the semi-axes lengths [eqn. 21 and 22] from (**)
+    ac_subtr = a - c
+    numerator = 2 * (af * f + cd * d + g * b_sq - 2 * bd * f - ac * g)
+    denom = np.copysign(np.sqrt(ac_subtr ** 2 + 4 * b_sq), ac_subtr)  # finite for circles (a == c, b == 0)
+
+    width = np.sqrt(numerator / ((-denom - c - a) * z_))
+    height = np.sqrt(numerator / ((denom - c - a) * z_))
+
+    phi = np.nan_to_num(.5 * np.arctan((2. * b) / ac_subtr))  # 0/0 for circles: any angle will do
+    angle = np.rad2deg(phi) % 360
+    return x0, y0, width, height, angle
+
+
+def sampson_residual(coef: np.ndarray, centered: np.ndarray) -> np.ndarray:
+    """
+    rms Sampson distance |F(x, y)| / |grad F(x, y)| of the points to their conics,
+    a first-order estimate of the geometric distance in pixels. Shapes (..., 6), (..., n, 2) -> (...).
+    """
+    a, b, c, d, f, g = (coef[..., i, np.newaxis] for i in range(6))
+    x, y = centered[..., 0], centered[..., 1]
+
+    F = (a * x + b * y + d) * x + (c * y + f) * y + g
+    grad_x = 2 * a * x + b * y + d
+    grad_y = b * x + 2 * c * y + f
+    return np.sqrt(np.mean(F ** 2 / (grad_x ** 2 + grad_y ** 2), axis=-1))
+
+
+def fit_ellipses(points: np.ndarray) -> tuple:
+    """
+    Fits ellipses to a (B, n, 2) stack of point sets.
+    Returns (B, 5) rows of [x0, y0, width, height, angle] and (B,) rms Sampson residuals;
+    point sets without a valid ellipse give NaN.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coef, centered, mean = fit_conics(points)
+        params = np.column_stack(conic_to_ellipse(*coef.T))
+        residuals = sampson_residual(coef, centered)
+
+    params[:, :2] += mean
+    invalid = ~np.all(np.isfinite(params), axis=1)
+    params[invalid] = np.nan
+    residuals[invalid] = np.nan
+    return params, residuals
+
+
 class Ellipse(Model):
     def __init__(self):
         super().__init__()
+        self.residual = None
 
-    def fit(self, r: float):
-        """Least Squares fitting algor6ithm
-        Theory taken from (*)
-        Solving equation Sa=lCa. with a = |a b c d f g> and a1 = |a b c>
-            a2 = |d f g>
-        Args
-        ----
-        data (list:list:float): list of two lists containing the x and y data of the
-            ellipse. of the form [[x1, x2, ..., xi],[y1, y2, ..., yi]]
-        Returns
-        ------
-        coef (list): list of the coefficients describing an ellipse
-           [a,b,c,d,f,g] corresponding to ax**2+2bxy+cy**2+2dx+2fy+g
+    def fit(self, r: np.ndarray):
         """
-
-        x, y = r[:,0], r[:,1]
-        
-
-        # Quadratic part of design matrix [eqn. 15] from (*)
-
-        D1 = np.mat(np.vstack([x ** 2, x * y, y ** 2])).T
-        # Linear part of design matrix [eqn. 16] from (*)
-        D2 = np.mat(np.vstack([x, y, np.ones(len(x))])).T
-
-        # forming scatter matrix [eqn. 17] from (*)
-        S1 = D1.T * D1
-        S2 = D1.T * D2
-        S3 = D2.T * D2
-
-        # Constraint matrix [eqn. 18]
-        C1 = np.mat('0. 0. 2.; 0. -1. 0.; 2. 0. 0.')
-
-        # Reduced scatter matrix [eqn. 29]
-        M = C1.I * (S1 - S2 * S3.I * S2.T)
-
-        # M*|a b c >=l|a b c >. Find eigenvalues and eigenvectors from this equation [eqn. 28]
-        eval, evec = np.linalg.eig(M)
-
-        # eigenvector must meet constraint 4ac - b^2 to be valid.
-        cond = 4 * np.multiply(evec[0, :], evec[2, :]) - np.power(evec[1, :], 2)
-        a1 = evec[:, np.nonzero(cond.A > 0)[1]]
-        # self.fitscore=eval[np.nonzero(cond.A > 0)[1]]
-
-        # |d f g> = -S3^(-1)*S2^(T)*|a b c> [eqn. 24]
-        #a2 = -S3.I * S2.T * a1
-
-        # eigenvectors |a b c d f g>
-        self.coef = np.vstack([a1, -S3.I * S2.T * a1])
-
-
-        """finds the important parameters of the fitted ellipse
-
-        Theory taken form http://mathworld.wolfram
-        Args
-        -----
-        coef (list): list of the coefficients describing an ellipse
-           [a,b,c,d,f,g] corresponding to ax**2+2bxy+cy**2+2dx+2fy+g
-        Returns
-        _______
-        center (List): of the form [x0, y0]
-        width (float): major axis
-        height (float): minor axis
-        phi (float): rotation of major axis form the x-axis in radians
+        Fits an ellipse to the (n, 2) coordinates r, see fit_conics().
+        Returns the center; self.params and self.residual are updated.
+        Raises ValueError if the points do not describe an ellipse.
         """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coef, centered, mean = fit_conics(r[np.newaxis])
+            x0, y0, width, height, angle = conic_to_ellipse(*coef[0])
+
+        if not np.isfinite(x0 + y0 + width + height + angle):
+            raise ValueError("No valid ellipse fit")
 
-        # eigenvectors are the coefficients of an ellipse in general form
-        # a*x^2 + 2*b*x*y + c*y^2 + 2*d*x + 2*f*y + g = 0 [eqn. 15) from (**) or (***)
-        a = self.coef[0, 0]
-        b = self.coef[1, 0] / 2.
-        c = self.coef[2, 0]
-        d = self.coef[3, 0] / 2.
-        f = self.coef[4, 0] / 2.
-        g = self.coef[5, 0]
-
-    #    if (a - c) == 0:
-    #        return True
-
-        # finding center of ellipse [eqn.19 and 20] from (**)
-        af = a * f
-        cd = c * d
-        bd = b * d
-        ac = a * c
-
-        b_sq = b ** 2.
-        z_ = (b_sq - ac)
-        x0 = (cd - b * f) / z_#(b ** 2. - a * c)
-        y0 = (af - bd) / z_#(b ** 2. - a * c)
-        center = (x0, y0)
-
-        # Find the semi-axes lengths [eqn. 21 and 22] from (**)
-        ac_subtr = a - c
-        numerator = 2 * (af * f + cd * d + g * b_sq - 2 * bd * f - ac * g)
-        denom = ac_subtr * np.sqrt(1 + 4 * b_sq / ac_subtr**2)
-        denominator1, denominator2 = (np.array([-denom, denom], dtype=np.float64) - c - a) * z_
-
-        width = np.sqrt(numerator / denominator1)
-        height = np.sqrt(numerator / denominator2)
-
-        phi = .5 * np.arctan((2. * b) / ac_subtr)
-        angle = np.rad2deg(phi) % 360
+        center = (x0 + mean[0, 0], y0 + mean[0, 1])
         self.params = (center, width, height, angle)
+        self.residual = sampson_residual(coef[0], centered[0])
 
         return center
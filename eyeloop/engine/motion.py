@@ -0,0 +1,79 @@
+import logging
+
+import numpy as np
+
+from eyeloop.constants.processor_constants import motion_alpha, motion_beta
+
+logger = logging.getLogger(__name__)
+
+
+class MotionModel:
+    """
+    Constant-velocity alpha-beta filter on a shape center, in pixels per frame.
+    predict() gives the walkout seed for the next frame and a search radius around it;
+    update() feeds back the fitted center and reports the innovation (fit - prediction).
+    Fits further from the prediction than the search radius are treated as outliers:
+    the filter restarts from them instead of learning their velocity.
+    """
+
+    def __init__(self, radius: float, alpha: float = motion_alpha, beta: float = motion_beta) -> None:
+        self.radius = radius
+        self.alpha = alpha
+        self.beta = beta
+
+        self.position = None
+        self.velocity = np.zeros(2, dtype=np.float64)
+        self.prediction = None
+        self.steps = 0  # frames since the last update
+        self.innovation = np.zeros(2, dtype=np.float64)
+        self.outliers = 0
+
+    def reset(self, center) -> None:
+        self.position = np.array(center, dtype=np.float64)
+        self.velocity[:] = 0
+        self.prediction = self.position.copy()
+        self.steps = 0
+
+    @property
+    def search_radius(self) -> float:
+        """
+        Expected distance of the next fit from the prediction; grows with speed and missed frames.
+        """
+        return self.radius + np.linalg.norm(self.velocity) * self.steps
+
+    def predict(self) -> np.ndarray:
+        if self.position is None:
+            return None
+
+        self.steps += 1
+        self.prediction = self.position + self.velocity * self.steps
+        return self.prediction
+
+    def update(self, center) -> float:
+        """
+        Corrects the filter with a fitted center and returns the innovation magnitude.
+        """
+        center = np.asarray(center, dtype=np.float64)
+        if self.position is None or self.steps == 0:
+            self.reset(center)
+            return 0.
+
+        self.innovation = center - self.prediction
+        distance = np.linalg.norm(self.innovation)
+
+        if distance > self.search_radius:
+            self.outliers += 1
+            logger.debug(f"motion model outlier: innovation {distance:.1f} px > {self.search_radius:.1f} px")
+            self.reset(center)
+            return distance
+
+        self.position = self.prediction + self.alpha * self.innovation
+        self.velocity += self.beta / self.steps * self.innovation
+        self.steps = 0
+        return distance
+
+    def miss(self) -> None:
+        """
+        A failed fit: the velocity decays, so the prediction does not run away while the shape is lost.
+        """
+        self.velocity *= .5
@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+
+import eyeloop.config as config
+from eyeloop.utilities.profiler import LatencyHistogram, profiler
+from eyeloop.utilities.ring_buffer import DropPolicy, RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class Pipeline:
+    """
+    Runs the engine as concurrent stages connected by bounded ring buffers:
+    capture (source.route, incl. resize/rotate) -> track (Engine.process) -> publish (extractors, GUI).
+    Frame saving runs on the file manager's own writer thread, fed directly by the capture stage.
+    The publish stage runs on the calling thread; the GUI only posts frames to its render loop from there.
+    The capture->track buffer follows the drop policy; track->publish always blocks,
+    so every tracked frame reaches the datalog.
+    """
+
+    def __init__(self, engine, size: int = 8, policy: DropPolicy = DropPolicy.BLOCK) -> None:
+        self.engine = engine
+        self.source = engine.source
+        self.track_buffer = RingBuffer(size, policy)
+        self.publish_buffer = RingBuffer(size, DropPolicy.BLOCK)
+
+        self.latency = {name: LatencyHistogram(name) for name in ("queue", "track", "publish", "end_to_end")}
+
+    def capture(self, image) -> None:
+        self.track_buffer.put((self.source.capture_time, self.source.media_time, image))
+
+    def route(self) -> None:
+        try:
+            self.source.route()
+        finally:
+            self.track_buffer.close()
+
+    def track(self) -> None:
+        try:
+            while True:
+                item = self.track_buffer.get()
+                if item is None:
+                    break
+
+                stamp, media_time, image = item
+                start = time.perf_counter()
+                self.latency["queue"].add(start - stamp)
+                profiler.stop("pipeline.queue", stamp)
+
+                dataout = self.engine.process(image)
+                self.latency["track"].add(time.perf_counter() - start)
+
+                self.publish_buffer.put((stamp, media_time, image, dataout))
+        finally:
+            self.publish_buffer.close()
+
+    def publish(self) -> None:
+        while True:
+            item = self.publish_buffer.get()
+            if item is None:
+                break
+
+            stamp, media_time, image, dataout = item
+            start = time.perf_counter()
+
+            self.engine.frame_i += 1
+            self.engine.capture_time = stamp
+            self.engine.media_time = media_time
+            self.engine.dataout = dataout
+            self.engine.publish(image)
+
+            end = time.perf_counter()
+            self.latency["publish"].add(end - start)
+            self.latency["end_to_end"].add(end - stamp)
+            profiler.stop("pipeline.end_to_end", stamp)
+
+    def run(self) -> None:
+        self.source.on_frame = self.capture
+
+        tracker = threading.Thread(target=self.track, name="eyeloop-track")
+        capture = threading.Thread(target=self.route, name="eyeloop-capture", daemon=True)
+
+        tracker.start()
+        capture.start()
+
+        self.publish()
+        tracker.join()
+
+        self.report()
+
+    def report(self) -> None:
+        logger.info(f"pipeline dropped {self.track_buffer.dropped} frame(s) before tracking")
+        for counter in self.latency.values():
+            logger.info(f"pipeline latency {counter}")
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from eyeloop.constants.processor_constants import kernel
+
+
+class Preprocessor:
+    """
+    Per-frame cache of the derived images (erosion, gaussian blur) shared by all shape processors.
+    Each distinct (blur, erode, bounds) image is computed once per frame; processors receive the
+    cached array itself and must treat it as read-only. The engine invalidates the cache on every frame.
+    """
+
+    def __init__(self, frame: np.ndarray = None) -> None:
+        self.frame = frame
+        self.images = {}
+
+    def on_frame(self, frame: np.ndarray) -> None:
+        self.frame = frame
+        self.images.clear()
+
+    def crop(self, bounds: tuple = None) -> np.ndarray:
+        if bounds is None:
+            return self.frame
+
+        x0, y0, x1, y1 = bounds
+        return self.frame[y0:y1, x0:x1]
+
+    def eroded(self, bounds: tuple = None) -> np.ndarray:
+        key = ("erode", bounds)
+        image = self.images.get(key)
+        if image is None:
+            image = cv2.erode(self.crop(bounds), kernel, iterations = 1)
+            self.images[key] = image
+
+        return image
+
+    def blurred(self, blur, erode: bool = False, bounds: tuple = None) -> np.ndarray:
+        """
+        Gaussian-blurred frame (optionally eroded first), restricted to bounds = (x0, y0, x1, y1).
+        A cropped request is served as a view of the full-frame image if one was already computed.
+        """
+        blur = tuple(blur)
+        key = ("blur", blur, erode, bounds)
+        image = self.images.get(key)
+        if image is not None:
+            return image
+
+        full = self.images.get(("blur", blur, erode, None))
+        if full is not None:
+            x0, y0, x1, y1 = bounds
+            return full[y0:y1, x0:x1]
+
+        src = self.eroded(bounds) if erode else self.crop(bounds)
+        image = cv2.GaussianBlur(src, blur, 0)
+        self.images[key] = image
+        return image
@@ -2,11 +2,19 @@ from abc import abstractmethod
 import cv2
 import logging
 
+import numpy as np
+
 import eyeloop.config as config
 from eyeloop.constants.processor_constants import *
 from eyeloop.engine.models.circular import Circle
+from eyeloop.engine.glints import GlintTracker
 from eyeloop.engine.models.ellipsoid import Ellipse
+from eyeloop.engine.motion import MotionModel
+from eyeloop.engine.preprocessor import Preprocessor
+from eyeloop.engine.reacquire import Reacquirer
+from eyeloop.engine.walkout import get_ray_caster
 from eyeloop.utilities.general_operations import to_int, tuple_int
+from eyeloop.utilities.profiler import profiler
 from eyeloop.utilities.target_type import TargetType
 
 logger = logging.getLogger(__name__)
@@ -15,22 +23,35 @@ logger = logging.getLogger(__name__)
 # TODO(aelsen): min and max radii pulled out into constructor, should be in config
 
 class Shape():
-    def __init__(self, min_radius = 1, max_radius = 100):
+    def __init__(self, min_radius = 1, max_radius = 100, n_rays = pupil_rays):
         self.active = False
         self.type = None
+        self.name = "shape"  # stage name prefix for --profile
 
         self.max_radius = max_radius
         self.min_radius = min_radius
         self.binarythreshold = -1
         self.blur = [3, 3]
+        self.erode = False
         self.model = config.arguments.model
-        self.threshold = len(CROP_STOCK) * self.min_radius * 1.05
+        self.rays = get_ray_caster(n_rays, min_radius, max_radius)
+        self.threshold = n_rays * self.min_radius * 1.05
 
         self.src = None
         self.src_dimms = (0, 0)
         self.center = -1
+        self.radius = None  # mean radius of the last fit
         self.fit_model = None
 
+        self.roi = config.arguments.roi == 1
+        self.subpixel = config.arguments.subpixel == 1
+        self.blurred = None
+
+        # seeds the walkout with the center predicted from the shape's velocity
+        self.motion = MotionModel(max_radius / 4) if config.arguments.motion == 1 else None
+        self.roi_scale = 1
+        self.origin = np.zeros(2, dtype=int)
+
 
     # TODO(aelsen): pup_source DNE
     # def artefact(self, params):
@@ -52,29 +73,65 @@ class Shape():
 
     def fit(self, src, src_raw):
         try:
+            start = profiler.start()
             r = self.walkout(src)
+            profiler.stop(f"{self.name}.walkout", start)
             # logger.info(f"Fitting processor {self.type} - r {r}")
+            start = profiler.start()
             self.center = self.fit_model.fit(r)
+            profiler.stop(f"{self.name}.fit", start)
             # logger.info(f"Fitting processor {self.type} - center {self.center}")
             # params = self.fit_model.params
             # self.artefact(params)
 
+            self.roi_scale = 1
+            self.radius = np.mean(self.fit_model.params[1:3])
+            if self.motion is not None:
+                self.motion.update(self.center)
+
             return self.fit_model.params
 
         except IndexError as e:
             logger.warn(f"Failed to fit with processor {self.type} - fit index error - {e}")
+            self.widen_roi()
             self.on_fit_failure(src, src_raw)
 
         except Exception as e:
             logger.warn(f"Failed to fit with processor {self.type} - Failed to fit shape model: {e}")
             self.on_fit_failure(src, src_raw)
 
+        if self.motion is not None:
+            self.motion.miss()
+
     @abstractmethod
     def on_fit_failure(self, src, src_raw):
         pass
 
+    def roi_bounds(self, frame):
+        """
+        Window around the last known center that contains every walkout ray, plus blur margin.
+        Returns (x0, y0, x1, y1), clipped to the frame.
+        """
+        height, width = frame.shape[:2]
+        half = int(self.max_radius * self.roi_scale) + max(self.blur)
+        center = np.clip(np.round(self.center).astype(int), 0, (width - 1, height - 1))
+
+        x0, y0 = max(center[0] - half, 0), max(center[1] - half, 0)
+        x1, y1 = min(center[0] + half + 1, width), min(center[1] + half + 1, height)
+        return x0, y0, x1, y1
+
+    def widen_roi(self):
+        """
+        Doubles the region of interest after a lost track, up to the full frame.
+        """
+        max_scale = max(self.src_dimms) / self.max_radius
+        self.roi_scale = min(self.roi_scale * 2, max(max_scale, 1))
+
     def set_center(self, center):
         self.center = center
+        self.roi_scale = 1
+        if self.motion is not None:
+            self.motion.reset(center)
         self.standard_corners = [(0, 0), self.src_dimms]
         self.corners = self.standard_corners.copy()
         self.active = True
@@ -83,25 +140,43 @@ class Shape():
     def set_dimensions(self, dimms):
         self.src_dimms = dimms
     
-    def track(self, frame):
+    def track(self, frame, preprocessor = None):
         if (not self.active):
             return
 
-        src_raw = frame.copy()
-        src = frame.copy()
+        if preprocessor is None:
+            preprocessor = Preprocessor(frame)
+
+        prediction = None if self.motion is None else self.motion.predict()
+        if prediction is not None:
+            height, width = frame.shape[:2]
+            self.center = tuple(np.clip(prediction, 0, (width - 1, height - 1)))
+
+        bounds = None
+        if self.roi:
+            bounds = self.roi_bounds(frame)
+            self.origin[:] = bounds[:2]
 
-        # Performs a simple binarization and applies a smoothing gaussian kernel.
-        src = self.apply_threshold(src)
+        # Applies a smoothing gaussian kernel (shared across processors) and performs a simple binarization.
+        start = profiler.start()
+        self.blurred = preprocessor.blurred(self.blur, self.erode, bounds)
+        src = self.apply_threshold(self.blurred)
+        profiler.stop(f"{self.name}.threshold", start)
 
         self.src = src
 
-        return self.fit(src, src_raw)
+        return self.fit(src, frame)
 
 
 class Pupil(Shape):
-    def __init__(self, min_radius = 2, max_radius = 100):
-        super().__init__(min_radius, max_radius)
+    def __init__(self, min_radius = 2, max_radius = 100, n_rays = None):
+        if n_rays is None:
+            n_rays = config.arguments.rays
+        super().__init__(min_radius, max_radius, n_rays)
         self.type = TargetType.PUPIL
+        self.name = "pupil"
+        self.erode = True
+        self.reacquirer = Reacquirer(min_radius, max_radius)
 
         if self.model == "circular":
             self.fit_model = Circle()
@@ -109,29 +184,20 @@ class Pupil(Shape):
             self.fit_model = Ellipse()
 
     def center_adjust(self, src_raw):
-        # adjust settings:
-        circles = cv2.HoughCircles(src_raw, cv2.HOUGH_GRADIENT, 1, 10, param1=200, param2=100, minRadius=self.min_radius, maxRadius=self.max_radius)
-
-        if circles is None:
-            return
+        """
+        Re-acquires the pupil after a lost track, searching near the predicted center first when --motion is on.
+        """
+        if self.motion is not None and self.motion.position is not None:
+            prior, search_radius = self.motion.prediction, self.motion.search_radius
         else:
-            smallest = -1
-            current = -1
-
-            for circle in circles[0, :]:
-                score = self.distance(circle[:2], self.center) + np.mean(src_raw[int(circle[1])-self.min_radius:int(circle[1])+self.min_radius, int(circle[0]-self.min_radius):int(circle[0]+self.min_radius)])
-
-                src_raw[int(circle[1]), int(circle[0])] = 100
-                cv2.imshow("kk", src_raw)
-                cv2.waitKey(0)
-                if smallest == -1:
-                    smallest = score
-                    current = circle[:2]
-                elif score < smallest:
-                    smallest = score
-                    current = circle[:2]
-                #self.center = circles[0,0][:1]
-            self.center = tuple(current)
+            prior, search_radius = self.center, self.max_radius * self.roi_scale
+
+        start = profiler.start()
+        center = self.reacquirer.find(src_raw, self.binarythreshold, prior, search_radius, self.radius)
+        profiler.stop(f"{self.name}.reacquire", start)
+        if center is not None:
+            logger.info(f"{self.type} re-acquired at {tuple_int(center)}")
+            self.set_center(center)
 
     def cond(self, r):
         # dists =  np.linalg.norm(np.mean([rx,ry],axis=1, dtype=np.float64)[:,np.newaxis] - np.array([rx, ry], dtype = np.float64), axis = 0)
@@ -139,215 +205,64 @@ class Pupil(Shape):
 
         mean = np.mean(dists)
         std = np.std(dists)
-        lower, upper = mean - std, mean + std * .8
+        # rays end on whole pixels, so a round pupil walks out to two rings a pixel apart: keep both
+        lower, upper = mean - max(std, 1), mean + max(std * .8, 1)
         cond_ = np.logical_and(np.greater_equal(dists, lower), np.less(dists, upper))
         return r[cond_]
 
     def apply_threshold(self, src):
-        src = cv2.threshold(cv2.GaussianBlur(cv2.erode(src, kernel, iterations = 1), self.blur, 0), self.binarythreshold, 255, cv2.THRESH_BINARY_INV)[1]
+        src = cv2.threshold(src, self.binarythreshold, 255, cv2.THRESH_BINARY_INV)[1]
         return src
 
     def on_fit_failure(self, src, src_raw):
         self.center_adjust(src_raw)
 
     def walkout(self, src):
-        # diag_matrix = main_diagonal[:canvas_.shape[0], :canvas_.shape[1]]
-
         try:
             center = np.round(self.center).astype(int)
         except:
             logger.warn(f"Failed to perform walkout - failed to round center {self.center}")
             return
 
-
-        canvas = np.array(src, dtype=int)#.copy()
-        canvas[-1,:] = canvas[:,-1] = canvas[0,:] = canvas[:,0] = 0
-
-
-        r = rr_2d.copy()
-
-        crop_list = CROP_STOCK.copy()
-
-
-        canvas_ = canvas[center[1]:, center[0]:]
-        canv_shape0, canv_shape1 = canvas_.shape
-        crop_canvas = np.flip(canvas[:center[1], :center[0]])
-        crop_canv_shape0, crop_canv_shape1 = crop_canvas.shape
-
-        crop_canvas2 = np.fliplr(canvas[center[1]:, :center[0]])
-        crop_canv2_shape0, crop_canv2_shape1 = crop_canvas2.shape
-
-        crop_canvas3 = np.flipud(canvas[:center[1], center[0]:])###
-        crop_canv3_shape0, crop_canv3_shape1 = crop_canvas3.shape
-
-        canvas2 = np.flip(canvas) # flip once
-
-
-        crop_list=np.array([
-            np.argmax(canvas_[:, 0][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[0, :][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[main_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas[main_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[main_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas3[main_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(canvas2[-center[1], -center[0]:][self.min_radius:self.max_radius] == 0), np.argmax(canvas2[-center[1]:, -center[0]][self.min_radius:self.max_radius] == 0),
-            np.argmax(canvas_[ half_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas[half_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[half_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas3[half_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[invhalf_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas[invhalf_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[invhalf_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas3[invhalf_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[fourth_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas3[fourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas[fourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[fourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[invfourth_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas2[invfourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas[invfourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas3[invfourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(canvas_[third_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[third_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas[third_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas3[third_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(canvas_[invthird_diagonal[:canv_shape0, :canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas2[invthird_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][self.min_radius:self.max_radius] == 0),
-            np.argmax(crop_canvas[invthird_diagonal[:crop_canv_shape0, :crop_canv_shape1]][self.min_radius:self.max_radius] == 0), np.argmax(crop_canvas3[invthird_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][self.min_radius:self.max_radius] == 0)
-        ], dtype=int) + self.min_radius
-
-
+        inside = self.rays.sample(src, center - self.origin)
+        crop_list = self.rays.cast(inside)
 
         if np.sum(crop_list) < self.threshold:
             #origin inside corneal reflection?
-            offset_list = np.array([
-            np.argmax(canvas_[:, 0][1:] == 255), np.argmax(canvas_[0, :][1:] == 255), np.argmax(canvas_[main_diagonal[:canv_shape0, :canv_shape1]][1:] == 255),
-            np.argmax(crop_canvas[main_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas2[main_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255),
-            np.argmax(crop_canvas3[main_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255), np.argmax(canvas2[-center[1], -center[0]:][1:] == 255), np.argmax(canvas2[-center[1]:, -center[0]][1:] == 255),
-            np.argmax(canvas_[ half_diagonal[:canv_shape0, :canv_shape1]][1:] == 255), np.argmax(crop_canvas[half_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas2[half_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255),
-            np.argmax(crop_canvas3[half_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255), np.argmax(canvas_[invhalf_diagonal[:canv_shape0, :canv_shape1]][1:] == 255),
-            np.argmax(crop_canvas[invhalf_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas2[invhalf_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255),
-            np.argmax(crop_canvas3[invhalf_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255), np.argmax(canvas_[fourth_diagonal[:canv_shape0, :canv_shape1]][1:] == 255), np.argmax(crop_canvas3[fourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255),
-            np.argmax(crop_canvas[fourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas2[fourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255), np.argmax(canvas_[invfourth_diagonal[:canv_shape0, :canv_shape1]][1:] == 255),
-            np.argmax(crop_canvas2[invfourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255), np.argmax(crop_canvas[invfourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas3[invfourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255),
-            np.argmax(canvas_[third_diagonal[:canv_shape0, :canv_shape1]][1:] == 255), np.argmax(crop_canvas2[third_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255), np.argmax(crop_canvas[third_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255),
-            np.argmax(crop_canvas3[third_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255), np.argmax(canvas_[invthird_diagonal[:canv_shape0, :canv_shape1]][1:] == 255), np.argmax(crop_canvas2[invthird_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][1:] == 255),
-            np.argmax(crop_canvas[invthird_diagonal[:crop_canv_shape0, :crop_canv_shape1]][1:] == 255), np.argmax(crop_canvas3[invthird_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][1:] == 255)
-            ], dtype=int) + 1
-
-
-            crop_list=np.array([
-            np.argmax(canvas_[:, 0][offset_list[0]:] == 0), np.argmax(canvas_[0, :][offset_list[1]:] == 0), np.argmax(canvas_[main_diagonal[:canv_shape0, :canv_shape1]][offset_list[2]:] == 0),
-            np.argmax(crop_canvas[main_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[3]:] == 0), np.argmax(crop_canvas2[main_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[4]:] == 0),
-            np.argmax(crop_canvas3[main_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[5]:] == 0), np.argmax(canvas2[-center[1], -center[0]:][offset_list[6]:] == 0), np.argmax(canvas2[-center[1]:, -center[0]][offset_list[7]:] == 0),
-            np.argmax(canvas_[ half_diagonal[:canv_shape0, :canv_shape1]][offset_list[8]:] == 0), np.argmax(crop_canvas[half_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[9]:] == 0), np.argmax(crop_canvas2[half_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[10]:] == 0),
-            np.argmax(crop_canvas3[half_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[11]:] == 0), np.argmax(canvas_[invhalf_diagonal[:canv_shape0, :canv_shape1]][offset_list[12]:] == 0),
-            np.argmax(crop_canvas[invhalf_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[13]:] == 0), np.argmax(crop_canvas2[invhalf_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[14]:] == 0),
-            np.argmax(crop_canvas3[invhalf_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[15]:] == 0), np.argmax(canvas_[fourth_diagonal[:canv_shape0, :canv_shape1]][offset_list[16]:] == 0), np.argmax(crop_canvas3[fourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[17]:] == 0),
-            np.argmax(crop_canvas[fourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[18]:] == 0), np.argmax(crop_canvas2[fourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[19]:] == 0), np.argmax(canvas_[invfourth_diagonal[:canv_shape0, :canv_shape1]][offset_list[20]:] == 0),
-            np.argmax(crop_canvas2[invfourth_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[21]:] == 0), np.argmax(crop_canvas[invfourth_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[22]:] == 0), np.argmax(crop_canvas3[invfourth_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[23]:] == 0),
-            np.argmax(canvas_[third_diagonal[:canv_shape0, :canv_shape1]][offset_list[24]:] == 0), np.argmax(crop_canvas2[third_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[25]:] == 0), np.argmax(crop_canvas[third_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[26]:] == 0),
-            np.argmax(crop_canvas3[third_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[27]:] == 0), np.argmax(canvas_[invthird_diagonal[:canv_shape0, :canv_shape1]][offset_list[28]:] == 0), np.argmax(crop_canvas2[invthird_diagonal[:crop_canv2_shape0, :crop_canv2_shape1]][offset_list[29]:] == 0),
-            np.argmax(crop_canvas[invthird_diagonal[:crop_canv_shape0, :crop_canv_shape1]][offset_list[30]:] == 0), np.argmax(crop_canvas3[invthird_diagonal[:crop_canv3_shape0, :crop_canv3_shape1]][offset_list[31]:] == 0)
-            ], dtype=int) + offset_list
-
+            crop_list = self.rays.cast_offset(inside)
 
             if np.sum(crop_list) < self.threshold:
                 raise IndexError("Lost track, do reset")
 
-        r[:8,:] = center
-        r[ry_add, 1] += crop_list[ry_add]
-        r[rx_add, 0] += crop_list[rx_add]
-        r[ry_subtract, 1] -= crop_list[ry_subtract] #
-        r[rx_subtract, 0] -= crop_list[rx_subtract]
-        r[rx_multiplied, 0] *= rx_multiply
-        r[ry_multiplied, 1] *= ry_multiply
-        r[8:,:] += center
-
+        if self.subpixel:
+            crop_list = self.rays.refine(self.blurred, center - self.origin, crop_list, self.binarythreshold)
 
-            #return
-        # try:
-        #    canvas_rgb = cv2.cvtColor(src, cv2.COLOR_GRAY2RGB)
-        #    cy, cx = np.mean(ry, dtype=int), np.mean(rx, dtype=int)
-        #    canvas_rgb[cy,cx] = [0,0,255]
-        #    canvas_rgb[ry.astype("int"), rx.astype("int")] = [0,0,255]
-        #    canvas_rgb[center[1], center[0]] = [255,0,0]
-        #    rx1,ry1 = self.cond(rx, ry, crop_list)
-        #    canvas_rgb[ry1.astype("int"), rx1.astype("int")] = [0,255,0]
-        #    cv2.imshow("JJJ", canvas_rgb)
-        #    cv2.waitKey(5)
-        # except Exception as e:
-        #    logger.info(e)
-
-        # return self.cond(r, crop_list)#rx[cond_], ry[cond_]#rx, ry
-        return self.cond(r)
+        return self.cond(self.rays.points(center, crop_list))
 
 
 
 class CornealReflection(Shape):
-    def __init__(self, n = 0, min_radius = 1, max_radius = 20):
-        super().__init__(min_radius, max_radius)
+    """
+    State of one corneal reflection (thresholds, center, radius, fit params); tracked by GlintTracker.
+    """
+
+    def __init__(self, n = 0, min_radius = 1, max_radius = 20, n_rays = cr_rays):
+        super().__init__(min_radius, max_radius, n_rays)
         self.type = TargetType.CORNEAL_REFLECTION
+        self.name = f"cr_{n}"
         self.fit_model = Circle()
         # self.fit_model = Center() # old
         # self.expand = 1.2 # old
 
     def apply_threshold(self, src):
-        _, src = cv2.threshold(cv2.GaussianBlur(src, self.blur, 0), self.binarythreshold, 255, cv2.THRESH_BINARY)
+        _, src = cv2.threshold(src, self.binarythreshold, 255, cv2.THRESH_BINARY)
         return src
 
-    def walkout(self, src):
-        # diag_matrix = main_diagonal[:canvas_.shape[0], :canvas_.shape[1]]
-
-        try:
-            center = np.round(self.center).astype(int)
-        except:
-            logger.warn(f"Failed to perform walkout - failed to round center {self.center}")
-            return
-
-        # canvas = np.array(src, dtype=int)#.copy()
-
-        r = rr_2d_cr.copy()
-
-        crop_list = CROP_STOCK_CR.copy()
-        #rx = np.zeros(4)
-        #ry = np.zeros(4)
-        logger.info(f"{self.type} walkout - center {center}")
-
-        canvas_ = src[center[1]:, center[0]:]
-
-        crop_list[0] = np.argmax(canvas_[:, 0] == 0) #- 1
-        #crop_ = np.argmax(canvas_[:, 0] == 0) #- 1
-
-        #ry[0], rx[0] = crop_ + center[1], center[0]
-
-
-        crop_list[2] = np.argmax(canvas_[0, :] == 0) #- 1
-        #crop_ = np.argmax(canvas_[0, :] == 0) #- 1
-
-    #    ry[2], rx[2] = center[1], crop_ + center[0]
-
-
-        canvas = np.flip(src) # flip once
-
-        crop_list[3] = -np.argmax(canvas[-center[1], -center[0]:] == 0)
-        #crop_ = np.argmax(canvas[-center[1], -center[0]:] == 0)# - 1
-
-        #ry[3], rx[3] = center[1], -crop_ + center[0]
-
-
-        crop_list[1]= -np.argmax(canvas[-center[1]:, -center[0]] == 0)
-    #    crop_ = np.argmax(canvas[-center[1]:, -center[0]] == 0)
-
-        #ry[1], rx[1] = -crop_ + center[1], center[0]
-        #logger.info()
-
-        #logger.info(r, crop_list)
-        r[:,:] = center
-
-        r[:2, 1] += crop_list[:2]
-        r[2:, 0] += crop_list[2:]
-
-
-
-        #logger.info(r, rx, ry)
-
-        # try:
-        #
-        #    canvas_rgb = cv2.cvtColor(src, cv2.COLOR_GRAY2RGB)
-        #
-        #   # canvas_rgb[cy,cx] = [0,0,255]
-        #    #canvas_rgb[ry.astype("int"), rx.astype("int")] = [0,255,0]
-        #    canvas_rgb[r[:,1].astype("int"), r[:,0].astype("int")] = [0,0,255]
-        #    #canvas_rgb[center[1], center[0]] = [255,0,0]
-        #    #rx1,ry1 = self.cond(rx, ry, crop_list)
-        #   # canvas_rgb[ry1.astype("int"), rx1.astype("int")] = [0,255,0]
-        #    cv2.imshow("JJJ", canvas_rgb)
-        #    cv2.waitKey(5)
-        # except Exception as e:
-        #    logger.info(e)
-
-
-        return r#rx[cond_], ry[cond_]#rx, ry
\ No newline at end of file
+    def track(self, frame, preprocessor = None):
+        """
+        Tracks this reflection on its own, the way the engine's GlintTracker tracks all of them
+        (corneal reflections are labelled as bright blobs, there is no walkout).
+        """
+        if preprocessor is None:
+            preprocessor = Preprocessor(frame)
+        return GlintTracker([self]).track(frame, preprocessor)[0]
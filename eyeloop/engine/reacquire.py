@@ -0,0 +1,135 @@
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from eyeloop.constants.processor_constants import reacquire_budget, reacquire_levels, reacquire_max_levels
+
+logger = logging.getLogger(__name__)
+
+
+class Reacquirer:
+    """
+    Finds a lost pupil as the best dark blob on a downsampled image pyramid, then refines its center at full resolution.
+    The time budget bounds every stage: the coarse search runs on further pyramid levels (up to max_levels) when its
+    cost per pixel, measured on earlier searches, would not fit in what is left; the search is abandoned if the
+    pyramid used up the budget, and the coarse estimate is returned unrefined if the coarse search did.
+    Once the (smoothing) pyramid has taken more than half the budget, e.g. on 4K frames, levels are decimated instead.
+    """
+
+    def __init__(self, min_radius: int, max_radius: int, levels: int = reacquire_levels,
+                 budget: float = reacquire_budget, max_levels: int = reacquire_max_levels) -> None:
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self.levels = levels
+        self.max_levels = max(max_levels, levels)
+        self.budget = budget
+        self.pixel_time = 0.  # seconds per pixel of the coarse search, as last measured
+        self.decimate = False
+
+    def find(self, frame: np.ndarray, threshold: float, prior=None, search_radius: float = None,
+             radius: float = None):
+        """
+        Returns the (x, y) center of the most likely pupil in frame, or None.
+        Pixels darker than threshold count as pupil; prior is the last known/predicted center
+        and radius the last fitted pupil radius, if known.
+        """
+        start = time.perf_counter()
+        deadline = start + self.budget
+
+        small, scale = frame, 1
+        for _ in range(self.levels):
+            small, scale = self.down(small), scale * 2
+        while scale < 2 ** self.max_levels and time.perf_counter() + small.size * self.pixel_time > deadline:
+            small, scale = self.down(small), scale * 2
+
+        if not self.decimate and time.perf_counter() - start > self.budget / 2:
+            logger.info("re-acquisition pyramid exceeds half its time budget, decimating instead")
+            self.decimate = True
+
+        start = time.perf_counter()
+        if start > deadline:
+            logger.debug(f"re-acquisition skipped, the pyramid took the time budget of {self.budget * 1e3:.1f} ms")
+            return None
+
+        candidate = self.coarse(small, threshold, prior, search_radius, radius, scale)
+        self.pixel_time = (time.perf_counter() - start) / small.size
+        if candidate is None:
+            return None
+
+        if time.perf_counter() > deadline:
+            return tuple(candidate[:2] * scale)
+
+        return self.refine(frame, threshold, candidate, scale)
+
+    def down(self, image: np.ndarray) -> np.ndarray:
+        if self.decimate:
+            return np.ascontiguousarray(image[::2, ::2])
+        return cv2.pyrDown(image)
+
+    def coarse(self, small: np.ndarray, threshold: float, prior, search_radius: float = None, radius: float = None,
+               scale: int = None):
+        """
+        Scores the dark connected components of the image downsampled by scale by compactness, distance to prior
+        (relative to the search radius) and size relative to radius. Blobs cut off by the frame border are penalized.
+        Returns [x, y, radius] in downsampled coordinates, or None.
+        """
+        if scale is None:
+            scale = 2 ** self.levels
+        height, width = small.shape[:2]
+        binary = cv2.threshold(small, threshold, 255, cv2.THRESH_BINARY_INV)[1]
+        n, _, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if n < 2:
+            return None
+
+        stats, centroids = stats[1:], centroids[1:]
+        area = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+        left, top = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        box_w, box_h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        border = (left == 0) | (top == 0) | (left + box_w == width) | (top + box_h == height)
+
+        min_area = max(np.pi * (self.min_radius / scale) ** 2, 1)
+        max_area = np.pi * (self.max_radius / scale) ** 2
+        fill = area / (box_w * box_h)  # ~pi/4 for an ellipse
+        aspect = np.minimum(box_w, box_h) / np.maximum(box_w, box_h)
+        valid = (area >= min_area) & (area <= max_area) & (fill > .5) & (aspect > .4)
+        if not np.any(valid):
+            return None
+
+        blob_radius = np.sqrt(area / np.pi)
+        score = np.abs(fill - np.pi / 4) + (1 - aspect) + border
+        if radius is not None:
+            score += np.abs(np.log(blob_radius * scale / radius))
+        if prior is not None:
+            distance = np.linalg.norm(centroids - np.asarray(prior, dtype=np.float64) / scale, axis=1)
+            score += distance / (((search_radius or 0) + self.max_radius) / scale)
+        score[~valid] = np.inf
+
+        best = np.argmin(score)
+        return np.array([*centroids[best], blob_radius[best]])
+
+    def refine(self, frame: np.ndarray, threshold: float, candidate: np.ndarray, scale: int = None) -> tuple:
+        """
+        Centroid of the full-resolution dark blob under the coarse candidate (at scale).
+        """
+        if scale is None:
+            scale = 2 ** self.levels
+        height, width = frame.shape[:2]
+        x, y, radius = candidate * scale
+        half = int(radius * 1.5) + scale
+        x0, y0 = int(max(x - half, 0)), int(max(y - half, 0))
+        x1, y1 = int(min(x + half + 1, width)), int(min(y + half + 1, height))
+
+        roi = cv2.GaussianBlur(frame[y0:y1, x0:x1], (3, 3), 0)
+        binary = cv2.threshold(roi, threshold, 255, cv2.THRESH_BINARY_INV)[1]
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        if n < 2:
+            return x, y
+
+        # the component under the coarse center, else the largest one
+        label = labels[min(int(y) - y0, y1 - y0 - 1), min(int(x) - x0, x1 - x0 - 1)]
+        if label == 0:
+            label = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+
+        return centroids[label][0] + x0, centroids[label][1] + y0
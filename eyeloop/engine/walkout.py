@@ -0,0 +1,99 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+class RayCaster:
+    """
+    Casts rays outward from a seed point on a binarized image and reports
+    where each ray leaves the shape (first pixel == 0).
+
+    The integer pixel offsets of every ray are tabulated once per
+    (n_rays, min_radius, max_radius), so a walkout is a single
+    fancy-indexing gather of shape (n_rays, max_radius) on the source image.
+    """
+
+    def __init__(self, n_rays: int = 32, min_radius: int = 1, max_radius: int = 100) -> None:
+        self.n_rays = n_rays
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+
+        angles = np.arange(n_rays, dtype=np.float64) * (2 * np.pi / n_rays)
+        self.directions = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+
+        steps = np.arange(max_radius, dtype=np.float64)
+        self.offsets_x = np.rint(np.outer(self.directions[:, 0], steps)).astype(np.intp)
+        self.offsets_y = np.rint(np.outer(self.directions[:, 1], steps)).astype(np.intp)
+        self.steps = np.arange(max_radius, dtype=np.intp)
+
+    def sample(self, src: np.ndarray, center: np.ndarray) -> np.ndarray:
+        """
+        Gathers all rays from src in one op. Pixels on or beyond the image border read as 0.
+        Returns a boolean array of shape (n_rays, max_radius); True where the ray is inside the shape.
+        """
+        height, width = src.shape[:2]
+        xs = self.offsets_x + center[0]
+        ys = self.offsets_y + center[1]
+
+        outside = (xs <= 0) | (ys <= 0) | (xs >= width - 1) | (ys >= height - 1)
+        np.clip(xs, 0, width - 1, out=xs)
+        np.clip(ys, 0, height - 1, out=ys)
+
+        inside = src[ys, xs] != 0
+        inside[outside] = False
+        return inside
+
+    def cast(self, inside: np.ndarray) -> np.ndarray:
+        """
+        Ray lengths to the first exit in [min_radius, max_radius).
+        Rays that never exit collapse to min_radius.
+        """
+        return np.argmin(inside[:, self.min_radius:], axis=1) + self.min_radius
+
+    def cast_offset(self, inside: np.ndarray) -> np.ndarray:
+        """
+        Ray lengths for a seed that sits on a hole in the shape (e.g., a corneal reflection within the pupil):
+        each ray first walks to the shape, then on to its exit.
+        """
+        entry = np.argmax(inside[:, 1:], axis=1) + 1
+        exited = np.logical_and(self.steps >= entry[:, np.newaxis], np.logical_not(inside))
+        return np.where(np.any(exited, axis=1), np.argmax(exited, axis=1), entry)
+
+    def refine(self, gray: np.ndarray, center: np.ndarray, lengths: np.ndarray, threshold: float) -> np.ndarray:
+        """
+        Sub-pixel ray lengths: linearly interpolates where the (blurred) grayscale profile of each ray
+        crosses the binarization threshold, between the last step inside and the first step outside.
+        gray is sampled bilinearly along the exact ray direction.
+        """
+        height, width = gray.shape[:2]
+        before = np.maximum(lengths - 1, 0)[:, np.newaxis]
+        steps = np.hstack((before, before + 1)).astype(np.float64)
+
+        xs = np.clip(self.directions[:, 0, np.newaxis] * steps + center[0], 0, width - 1.001)
+        ys = np.clip(self.directions[:, 1, np.newaxis] * steps + center[1], 0, height - 1.001)
+        x0, y0 = xs.astype(np.intp), ys.astype(np.intp)
+        fx, fy = xs - x0, ys - y0
+
+        values = ((gray[y0, x0] * (1 - fx) + gray[y0, x0 + 1] * fx) * (1 - fy) +
+                  (gray[y0 + 1, x0] * (1 - fx) + gray[y0 + 1, x0 + 1] * fx) * fy)
+
+        inner, outer = values[:, 0], values[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.clip((threshold - inner) / (outer - inner), 0, 1)
+        fraction[~np.isfinite(fraction)] = .5
+
+        return np.where(lengths > 0, before[:, 0] + fraction, lengths)
+
+    def points(self, center: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Converts ray lengths to contour points of shape (n_rays, 2) in (x, y).
+        """
+        return self.directions * lengths[:, np.newaxis] + center
+
+
+@lru_cache(maxsize=None)
+def get_ray_caster(n_rays: int, min_radius: int, max_radius: int) -> RayCaster:
+    """
+    Returns a shared RayCaster, so processors with the same geometry share their offset tables.
+    """
+    return RayCaster(n_rays, min_radius, max_radius)
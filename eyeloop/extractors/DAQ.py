@@ -1,33 +1,32 @@
-import json
 import logging
-from pathlib import Path
 
 from eyeloop.extractors.extractor import Extractor
+from eyeloop.utilities.datalog import DATALOGS
 
 
 class DaqExtractor(Extractor):
-    def __init__(self, output_dir):
+    def __init__(self, output_dir, datalog = "json"):
         self.output_dir = output_dir
-        self.datalog_path = Path(output_dir, f"datalog.json")
-        self.file = open(self.datalog_path, "a")
+        self.format = datalog
+        self.datalog = None
 
     def activate(self):
         return
 
     def fetch(self, core):
+        if self.datalog is None:
+            self.datalog = DATALOGS[self.format](self.output_dir, len(core.cr_processors))
+
         try:
-            self.file.write(json.dumps(core.dataout) + "\n")
+            self.datalog.write(core.dataout, core.frame_i)
 
         except ValueError:
             pass
 
     def release(self, core):
-        try:
-            self.file.write(json.dumps(core.dataout) + "\n")
-            self.file.close()
-        except ValueError:
-            pass
-        self.fetch(core)
+        if self.datalog is not None:
+            self.datalog.close()
+        self.fetch = lambda core: None
 
     # def set_digital_line(channel, value):
     # digital_output = PyDAQmx.Task()
@@ -0,0 +1,104 @@
+import logging
+from pathlib import Path
+import socket
+import time
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.constants.minimum_gui_constants import *
+from eyeloop.utilities.general_operations import tuple_int
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CODEC = "MJPG"
+PREVIEW_QUALITY = 80
+MAX_DATAGRAM = 65507
+
+
+class HeadlessGUI:
+    """
+    Stand-in for the minimum GUI on machines without a display (--headless 1): creates no windows
+    and reads no keys. With --preview, every 1/--framerate seconds the current frame is annotated
+    with the pupil/cr fits and written to a video file, or sent as one jpg datagram to udp://host:port.
+    """
+
+    def __init__(self, on_angle=None, on_center=None, on_quit=None) -> None:
+        self.on_angle = on_angle
+        self.on_center = on_center
+        self.on_quit = on_quit
+
+        self.target = config.arguments.preview
+        self.period = 1 / config.arguments.fps if config.arguments.fps > 0 else 0
+        self.next_time = 0
+        self.video = None
+        self.socket = None
+        self.address = None
+        self.sent = 0
+
+    def arm(self, image_dimensions, pupil_processor, cr_processors=[]) -> None:
+        self.pupil_processor = pupil_processor
+        self.cr_processors = cr_processors
+        self.width, self.height = image_dimensions
+
+        if self.target.startswith("udp://"):
+            url = urlparse(self.target)
+            self.address = (url.hostname, url.port)
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            logger.info(f"streaming preview to {self.target}")
+        elif self.target != "":
+            path = Path(self.target)
+            if not path.is_absolute():
+                path = Path(config.file_manager.new_folderpath, path)
+            fps = 1 / self.period if self.period else 30
+            self.video = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*PREVIEW_CODEC), fps,
+                                         (self.width, self.height))
+            logger.info(f"writing preview to {path}")
+
+    def draw(self, frame: np.ndarray) -> np.ndarray:
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        shapes = [(self.pupil_processor, red)] + [(processor, green) for processor in self.cr_processors]
+        for processor, color in shapes:
+            params = processor.fit_model.params
+            if params is None or not processor.active:
+                continue
+            try:
+                center, width, height, angle = params
+                cv2.ellipse(frame_rgb, tuple_int(center), tuple_int((width, height)), angle, 0, 360, color, 1)
+            except Exception as e:
+                logger.debug(f"preview skipped {processor.type} - {e}")
+        return frame_rgb
+
+    def update(self, frame, data) -> None:
+        if self.video is None and self.socket is None:
+            return
+
+        now = time.perf_counter()
+        if now < self.next_time:
+            return
+        self.next_time = now + self.period
+
+        frame_rgb = self.draw(frame)
+        if frame_rgb.shape[:2] != (self.height, self.width):  # rotated or rescaled stream
+            frame_rgb = cv2.resize(frame_rgb, (self.width, self.height))
+
+        if self.video is not None:
+            self.video.write(frame_rgb)
+        else:
+            _, jpg = cv2.imencode(".jpg", frame_rgb, [cv2.IMWRITE_JPEG_QUALITY, PREVIEW_QUALITY])
+            if len(jpg) > MAX_DATAGRAM:
+                logger.warning(f"preview frame of {len(jpg)} bytes does not fit a datagram, skipped")
+                return
+            self.socket.sendto(jpg.tobytes(), self.address)
+        self.sent += 1
+
+    def release(self) -> None:
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        logger.info(f"preview: {self.sent} frame(s)")
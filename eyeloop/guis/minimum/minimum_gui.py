@@ -10,6 +10,8 @@ import numpy as np
 import eyeloop.config as config
 from eyeloop.constants.minimum_gui_constants import *
 from eyeloop.utilities.general_operations import to_int, tuple_int
+from eyeloop.utilities.ring_buffer import DropPolicy, RingBuffer
+import queue
 import threading
 
 import logging
@@ -22,6 +24,7 @@ WINDOW_TOOLTIP = "Instructions"
 WINDOW_TRACKING = "Tracking"
 WINDOW_RECORDING = "Recording"
 CV_IMAGE_PERIOD = 1
+RENDER_TIMEOUT = .02  # the render loop pumps window events at least this often without new frames
 
 tooltips = {
     "0": {
@@ -64,6 +67,15 @@ class GuiState(Enum):
     RECORDING = "RECORDING"
 
 class GUI:
+    """
+    Renders apart from tracking, so drawing and window events never stall it: run() moves tracking to a worker
+    thread and renders on the calling thread, the main thread, which HighGUI needs on macOS.
+    update() runs on the tracking thread: at most --framerate times per second it posts the frame and a snapshot
+    of the fits to a single-slot mailbox (a newer frame replaces one not yet rendered), and it applies the
+    keys the render loop has read, through a command queue, to the processors.
+    All HighGUI calls (windows, imshow, waitKey, mouse callbacks) happen in the render loop.
+    """
+
     def __init__(self, on_angle = None, on_center = None, on_quit = None) -> None:
         self.on_angle = on_angle
         self.on_center = on_center
@@ -78,16 +90,20 @@ class GUI:
 
         self._state = GuiState.CONFIGURATION
         self.inquiry = "none"
-        self.last_time = time.time()
         self.first_run = True
         self.cr_index = 0
         self.cr_processor_index = 0
         self.cr_processors = []
 
         self.out = None
+        self.tooltip = None
+        self.next_post = 0
+        self.mailbox = RingBuffer(1, DropPolicy.OLDEST)
+        self.commands = queue.Queue()
+        self.thread = None
 
     def release(self):
-        cv2.destroyAllWindows()
+        self.mailbox.close()
 
     def on_mouse_move(self, event, x, y, flags, params) -> None:
         # logger.info(f'Mouse move {x} {y}')
@@ -104,8 +120,10 @@ class GUI:
                     self.update_tool_tip(x)
 
     def update_tool_tip(self, index: int, error: bool = False) -> None:
-        key = str(index) if not error else f'{str(index)}_error'
-        cv2.imshow(WINDOW_TOOLTIP, self.tooltips[key]["src"])
+        """
+        Shown by the render loop on its next pass.
+        """
+        self.tooltip = str(index) if not error else f'{str(index)}_error'
 
     def add_mouse_events(self) -> None:
         try:
@@ -143,11 +161,6 @@ class GUI:
         if self.inquiry == "track":
             if "y" == key:
                 print("Initiating tracking..")
-                self.destroy()
-
-                cv2.imshow(WINDOW_TRACKING, self.bin_stock)
-                cv2.moveWindow(WINDOW_TRACKING, 100, 100)
-
                 self._state = GuiState.TRACKING
                 self.inquiry = "none"
                 return
@@ -178,28 +191,24 @@ class GUI:
                     logger.info(f"Failed selecting pupil - {e}")
 
             elif "2" == key:
+                # the next unselected corneal reflection, or the current one once all are selected
+                index = next((i for i, processor in enumerate(self.cr_processors) if not processor.active),
+                             self.cr_processor_index)
                 try:
-                    current_cr_processor.set_center(self.cursor)
-                    self.cr_processor_index = 0
+                    self.cr_processors[index].set_center(self.cursor)
+                    self.cr_processor_index = index
                     self.update_tool_tip(2)
-                    print("Corneal reflex 1 selected.\nAdjust binarization via W/S (threshold) and E/D (smoothing).")
+                    print(f"Corneal reflex {index + 1} of {len(self.cr_processors)} selected.\n"
+                          "Adjust binarization via W/S (threshold) and E/D (smoothing), press 3 to switch reflex.")
 
                 except Exception as e:
                     self.update_tool_tip(1, True)
                     logger.info(f"Failed selecting corneal reflection - {e}")
 
             elif "3" == key:
-                try:
-                    current_cr_processor.set_center(self.cursor)
-                    self.cr_processor_index = 1
-                    self.update_tool_tip(2)
-
-                    print("\nCorneal reflex 2 selected.")
-                    print("Adjust binarization via W/S (threshold) and E/D (smoothing).")
-
-                except:
-                    self.update_tool_tip(1, True)
-                    print("Hover and click on the corneal reflex, then press 3.")
+                self.cr_processor_index = (self.cr_processor_index + 1) % len(self.cr_processors)
+                print(f"\nCorneal reflex {self.cr_processor_index + 1} of {len(self.cr_processors)} is adjusted.")
+                print("Adjust binarization via W/S (threshold) and E/D (smoothing), press 2 to select it at the cursor.")
 
 
             elif "z" == key:
@@ -208,20 +217,20 @@ class GUI:
 
             elif "w" == key:
                 current_cr_processor.binarythreshold += 1
-                print("Corneal reflex binarization threshold increased (%s)." % current_cr_processor.binarythreshold)
+                print(f"Corneal reflex {self.cr_processor_index + 1} binarization threshold increased ({current_cr_processor.binarythreshold}).")
 
             elif "s" == key:
                 current_cr_processor.binarythreshold -= 1
-                print("Corneal reflex binarization threshold decreased (%s)." % current_cr_processor.binarythreshold)
+                print(f"Corneal reflex {self.cr_processor_index + 1} binarization threshold decreased ({current_cr_processor.binarythreshold}).")
 
             elif "e" == key:
                 current_cr_processor.blur = [x + 2 for x in current_cr_processor.blur]
-                print("Corneal reflex blurring increased (%s)." % current_cr_processor.blur)
+                print(f"Corneal reflex {self.cr_processor_index + 1} blurring increased ({current_cr_processor.blur}).")
 
             elif "d" == key:
                 if current_cr_processor.blur[0] > 1:
                     current_cr_processor.blur = [x - 2 for x in current_cr_processor.blur]
-                print("Corneal reflex blurring decreased (%s)." % current_cr_processor.blur)
+                print(f"Corneal reflex {self.cr_processor_index + 1} blurring decreased ({current_cr_processor.blur}).")
 
             elif "r" == key:
                 self.pupil_processor.binarythreshold += 1
@@ -245,7 +254,7 @@ class GUI:
             self.on_quit()
 
     def arm(self, image_dimensions, pupil_processor, cr_processors = []) -> None:
-        self.frequency_track = np.round(1 / config.arguments.fps, 2)
+        self.period = 1 / config.arguments.fps if config.arguments.fps > 0 else 0
         self.pupil_processor = pupil_processor
 
         self.cr_index = 0
@@ -257,17 +266,16 @@ class GUI:
         self.binary_width = max(width, 300)
         self.binary_height = max(height, 200)
 
-        # Initialize windows
-        self.init(width, height)
-
         fourcc = cv2.VideoWriter_fourcc(*'MPEG')
         output_vid = Path(config.file_manager.new_folderpath, "output.avi")
         self.out = cv2.VideoWriter(str(output_vid), fourcc, 50.0, (self.width, self.height))
 
+        # Canvases are allocated once and redrawn in place; bin_P and bin_CR are the two halves of the binary window.
         self.bin_stock = np.zeros((self.binary_height, self.binary_width))
-        self.bin_P = self.bin_stock.copy()
-        self.bin_CR = self.bin_stock.copy()
-        #self.CRStock = self.bin_stock.copy()
+        self.binary = np.zeros((self.binary_height * 2, self.binary_width))
+        self.bin_P = self.binary[:self.binary_height]
+        self.bin_CR = self.binary[self.binary_height:]
+        self.frame_rgb = np.zeros((height, width, 3), dtype=np.uint8)
 
         self.src_txt = np.zeros((20, width, 3))
         self.prev_txt = self.src_txt.copy()
@@ -287,17 +295,83 @@ class GUI:
         cv2.putText(self.crstock_txt, 'CR | W/S | E/D || bin/blur', (10, 15), font, .7, 1, 0, cv2.LINE_4)
         cv2.putText(self.crstock_txt_selected, '(*) CR | W/S | E/D || bin/blur', (10, 15), font, .7, 1, 0, cv2.LINE_4)
 
-        cv2.imshow(WINDOW_CONFIGURATION, np.hstack((self.bin_stock, self.bin_stock)))
-        cv2.imshow(WINDOW_BINARY, np.vstack((self.bin_stock, self.bin_stock)))
-        cv2.imshow(WINDOW_TOOLTIP, self.first_tool_tip)
+    def run(self, track) -> None:
+        """
+        Runs track (the engine's capture and tracking loop) on a worker thread and the render loop on the calling
+        thread until tracking ends or the GUI is released. Errors raised by track are raised here.
+        """
+        errors = []
+
+        def tracking():
+            try:
+                track()
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                self.mailbox.close()
+
+        self.thread = threading.Thread(target=tracking, name="eyeloop-track", daemon=True)
+        self.thread.start()
+        self.render_loop()
+        self.thread.join()
+        if errors:
+            raise errors[0]
+
+    def render_loop(self) -> None:
+        """
+        Draws the latest posted frame, pumps window events and forwards key presses.
+        """
+        try:
+            self.init(self.width, self.height)
+            cv2.imshow(WINDOW_CONFIGURATION, np.hstack((self.bin_stock, self.bin_stock)))
+            cv2.imshow(WINDOW_BINARY, self.binary)
+            cv2.imshow(WINDOW_TOOLTIP, self.first_tool_tip)
+            rendered_state = GuiState.CONFIGURATION
+
+            while not self.mailbox.closed:
+                if self.tooltip is not None:
+                    tooltip, self.tooltip = self.tooltip, None
+                    cv2.imshow(WINDOW_TOOLTIP, self.tooltips[tooltip]["src"])
+
+                snapshot = self.mailbox.get(RENDER_TIMEOUT)
+                if snapshot is not None:
+                    if snapshot["state"] != rendered_state:
+                        self.switch_windows(snapshot["state"])
+                        rendered_state = snapshot["state"]
+                    self.render(snapshot)
+
+                key = cv2.waitKey(CV_IMAGE_PERIOD)
+                if key != -1:
+                    self.commands.put(key)
+        except Exception:
+            logger.exception("GUI render loop failed: ")
+        finally:
+            try:
+                cv2.destroyAllWindows()
+            except cv2.error:
+                pass
+
+    def switch_windows(self, state) -> None:
+        if state == GuiState.TRACKING:
+            self.destroy()
+            cv2.imshow(WINDOW_TRACKING, self.bin_stock)
+            cv2.moveWindow(WINDOW_TRACKING, 100, 100)
+
+    def render(self, snapshot) -> None:
+        state = snapshot["state"]
+        if state == GuiState.RECORDING:
+            self.render_record(snapshot)
+        elif state == GuiState.TRACKING:
+            self.render_track(snapshot)
+        else:
+            self.render_configure(snapshot)
 
     def draw_cross(self, source: np.ndarray, point: tuple, color: tuple) -> None:
         # print(f"Draw cross: source {source}, point: {point}, color: {color}")
         source[to_int(point[1] - 3):to_int(point[1] + 4), to_int(point[0])] = color
         source[to_int(point[1]), to_int(point[0] - 3):to_int(point[0] + 4)] = color
 
-    def draw_pupil(self, frame_rgb):
-        params = self.pupil_processor.fit_model.params
+    def draw_pupil(self, frame_rgb, params):
         if (params == None):
             return
 
@@ -309,15 +383,10 @@ class GUI:
             self.draw_cross(frame_rgb, center, red)
             return True
         except Exception as e:
-            logger.info(f"pupil not found: {e} - {self.pupil_processor.fit_model.params}")
+            logger.info(f"pupil not found: {e} - {params}")
             return False
 
-    def draw_corneal_reflection(self, frame_rgb, index):
-        if (index >= len(self.cr_processors)):
-            logger.warn(f'Error drawing corneal reflection #{index} - no processor')
-            return
-
-        params = self.cr_processors[index].fit_model.params
+    def draw_corneal_reflection(self, frame_rgb, index, params):
         if (params == None):
             return
 
@@ -331,36 +400,35 @@ class GUI:
         except Exception as e:
             logger.warn(f'Error processing corneal reflection #{index} - {e} {params}')
             return False
-    
-    def generate_pupil_binarization(self):
-        src = self.pupil_processor.src
+
+    def paste_binarization(self, canvas, src) -> None:
+        """
+        Centers a processor's binary image on its (preallocated) canvas, below the header row.
+        """
+        canvas[20:] = 0
         if (type(src) is not np.ndarray):
             return
 
+        offset_y = int((self.binary_height - src.shape[0]) / 2)
+        offset_x = int((self.binary_width - src.shape[1]) / 2)
+        y0, x0 = max(offset_y, 20), max(offset_x, 0)
+        y1, x1 = min(offset_y + src.shape[0], self.binary_height), min(offset_x + src.shape[1], self.binary_width)
+        canvas[y0:y1, x0:x1] = src[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x]
+
+    def generate_pupil_binarization(self, src):
         try:
-            offset_y = int((self.binary_height - src.shape[0]) / 2)
-            offset_x = int((self.binary_width - src.shape[1]) / 2)
-            self.bin_P[offset_y:min(offset_y + src.shape[0], self.binary_height),
-            offset_x:min(offset_x + src.shape[1], self.binary_width)] = src
+            self.paste_binarization(self.bin_P, src)
         except Exception as e:
             logger.warn(f'Failed to calculate the binarized data for the pupil processor - {e}')
-            
-    def generate_corneal_reflection_binarization(self):
-        self.bin_CR = self.bin_stock.copy()
-        src = self.cr_processors[self.cr_processor_index].src
-        if (type(src) is not np.ndarray):
-            return
 
+    def generate_corneal_reflection_binarization(self, src):
         try:
-            offset_y = int((self.binary_height - src.shape[0]) / 2)
-            offset_x = int((self.binary_width - src.shape[1]) / 2)
-            self.bin_CR[offset_y:min(offset_y + src.shape[0], self.binary_height),
-            offset_x:min(offset_x + src.shape[1], self.binary_width)] = src
+            self.paste_binarization(self.bin_CR, src)
             self.bin_CR[0:20, 0:self.binary_width] = self.crstock_txt_selected
         except Exception as e:
             logger.warn(f'Failed to calculate the binarized data for the corneal reflect processor - {src} {e}')
             self.bin_CR[0:20, 0:self.binary_width] = self.crstock_txt
-    
+
     def render_fps(self, frame, data):
         key = "FpsExtractor"
         if (not key in data):
@@ -369,59 +437,71 @@ class GUI:
         # print(f"render fps {fps}")
         cv2.putText(frame, f'FPS: {fps}', (10, 15), font, .7, 1, 0, cv2.LINE_4)
 
-    def update(self, frame, data):
-        if (self._state == GuiState.RECORDING):
-            self.update_record(frame, data)
-        elif (self._state == GuiState.TRACKING):
-            self.update_track(frame, data)
-        else:
-            self.update_configure(frame, data)
+    def to_rgb(self, frame):
+        if frame.shape[:2] != self.frame_rgb.shape[:2]:
+            self.frame_rgb = np.zeros(frame.shape[:2] + (3,), dtype=np.uint8)
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR, dst=self.frame_rgb)
+
+    def snapshot(self, frame, data) -> dict:
+        """
+        Everything the render loop draws, taken on the tracking thread. Fit params are immutable tuples and
+        the binary images are reallocated by every track(), so no copies are needed.
+        """
+        cr_processor = self.cr_processors[self.cr_processor_index] if self.cr_processors else None
+        return {
+            "state": self._state,
+            "frame": frame,
+            "data": dict(data),
+            "pupil": self.pupil_processor.fit_model.params,
+            "pupil_src": self.pupil_processor.src,
+            "cr": [processor.fit_model.params for processor in self.cr_processors],
+            "cr_index": self.cr_processor_index,
+            "cr_src": None if cr_processor is None else cr_processor.src,
+        }
 
-    def update_configure(self, frame, data):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    def update(self, frame, data):
+        while True:
+            try:
+                key = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            self.key_listener(key)
+
+        now = time.perf_counter()
+        if now < self.next_post:
+            return
+        self.next_post = now + self.period
+        self.mailbox.put(self.snapshot(frame, data))
 
-        self.bin_P = self.bin_stock.copy()
+    def render_configure(self, snapshot):
+        frame_rgb = self.to_rgb(snapshot["frame"])
 
-        if self.draw_pupil(frame_rgb):
+        if self.draw_pupil(frame_rgb, snapshot["pupil"]):
             self.bin_P[0:20, 0:self.binary_width] = self.bin_stock_txt_selected
         else:
             self.bin_P[0:20, 0:self.binary_width] = self.bin_stock_txt
-        self.generate_pupil_binarization()
-        
+        self.generate_pupil_binarization(snapshot["pupil_src"])
 
-        self.draw_corneal_reflection(frame_rgb, self.cr_processor_index)
-        self.generate_corneal_reflection_binarization()
+        if snapshot["cr"]:
+            self.draw_corneal_reflection(frame_rgb, snapshot["cr_index"], snapshot["cr"][snapshot["cr_index"]])
+        self.generate_corneal_reflection_binarization(snapshot["cr_src"])
 
-        self.render_fps(frame, data)
+        self.render_fps(frame_rgb, snapshot["data"])
 
-        cv2.imshow(WINDOW_BINARY, np.vstack((self.bin_P, self.bin_CR)))
+        cv2.imshow(WINDOW_BINARY, self.binary)
         cv2.imshow(WINDOW_CONFIGURATION, frame_rgb)
-
-        key = cv2.waitKey(CV_IMAGE_PERIOD)
-        self.key_listener(key)
         if self.first_run:
             self.first_run = False
 
-    def update_record(self, frame_preview, data) -> None:
-        cv2.imshow(WINDOW_RECORDING, frame_preview)
-        if cv2.waitKey(1) == ord('q'):
-            self.on_quit()
-
-    def update_track(self, frame, data) -> None:
-        diff = time.time() - self.last_time
-        if (diff < self.frequency_track):
-            return
-        self.last_time = time.time()
+    def render_record(self, snapshot) -> None:
+        cv2.imshow(WINDOW_RECORDING, snapshot["frame"])
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    def render_track(self, snapshot) -> None:
+        frame_rgb = self.to_rgb(snapshot["frame"])
 
-        self.draw_pupil(frame_rgb)
-        for i in range(len(self.cr_processors)):
-            self.draw_corneal_reflection(frame_rgb, i)
+        self.draw_pupil(frame_rgb, snapshot["pupil"])
+        for i, params in enumerate(snapshot["cr"]):
+            self.draw_corneal_reflection(frame_rgb, i, params)
 
-        self.render_fps(frame_rgb, data)
+        self.render_fps(frame_rgb, snapshot["data"])
         cv2.imshow(WINDOW_TRACKING, frame_rgb)
-
-
-        if cv2.waitKey(CV_IMAGE_PERIOD) == ord("q"):
-            self.on_quit()
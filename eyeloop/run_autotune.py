@@ -0,0 +1,71 @@
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.engine.autotune import tune
+from eyeloop.engine.engine import load_params
+from eyeloop.run_batch import first_frames
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+logger = logging.getLogger(__name__)
+
+
+def load_frames(length: int) -> np.ndarray:
+    """
+    The first length frames of --video, scaled like the engine scales them (--scale).
+    """
+    frames = []
+    for image in first_frames(length):
+        if config.arguments.scale != 1:
+            image = cv2.resize(image, None, fx=config.arguments.scale, fy=config.arguments.scale,
+                               interpolation=cv2.INTER_NEAREST)
+        frames.append(image)
+    if not frames:
+        raise ValueError(f"No frames in {config.arguments.video}")
+    return np.stack(frames)
+
+
+def main(args: list = None) -> str:
+    """
+    eyeloop autotune --video [file]/[folder] --params [params_*.npy] [--tune_frames N] [--workers N]
+    Searches binarization threshold and blur for the pupil and every selected corneal reflection on the first
+    frames of the video, starting from the centers in --params, and saves the result as a new params_*.npy
+    to pass to eyeloop --params (or eyeloop batch).
+    """
+    args = sys.argv[2:] if args is None else args
+    config.arguments = Arguments(args)
+    if config.arguments.video == "" or config.arguments.params == "":
+        raise ValueError("Auto-tuning needs --video and --params (with the selected pupil center).")
+
+    config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format=config.arguments.img_format)
+
+    seed = load_params(config.arguments.params)
+    centers = {name: values[2] for name, values in seed.items() if len(values) > 2 and np.ndim(values[2]) != 0}
+    frames = load_frames(config.arguments.tune_frames)
+
+    workers = config.arguments.workers if config.arguments.workers > 0 else os.cpu_count()
+    logger.info(f"auto-tuning {list(centers)} on {len(frames)} frames with {workers} worker(s)")
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        params = tune(args, frames, centers, pool.map)
+    logger.info(f"auto-tuned in {time.perf_counter() - start:.1f} s")
+
+    for name, values in seed.items():
+        params.setdefault(name, values)
+
+    path = f"{config.file_manager.new_folderpath}/params_{time.time()}.npy"
+    np.save(path, params)
+    print(f"Tuned parameters saved to {path}")
+    return path
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
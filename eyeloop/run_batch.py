@@ -0,0 +1,302 @@
+import copy
+import functools
+import glob
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import sys
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.engine.blink import BlinkDetector
+from eyeloop.engine.engine import Engine, load_params
+from eyeloop.sources.chunk import ChunkSource
+from eyeloop.sources.raw import RawSource
+from eyeloop.utilities.accuracy import TOLERANCES
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.datalog import DATALOGS
+from eyeloop.utilities.file_manager import File_Manager
+from eyeloop.utilities.frame_store import RawFrameStore, is_raw_stack
+
+logger = logging.getLogger(__name__)
+
+SEEK_SLACK = 5  # frames tracked past the end of each chunk, in case its video seek landed early
+
+
+class BatchCollector:
+    """
+    Extractor that keeps the data output of every frame of a chunk, warm start included, with its (nominal) frame
+    number, the timestamps of the frames when the source has them (video files) and their blink detector brightness.
+    """
+
+    def __init__(self) -> None:
+        self.records = []
+        self.timestamps = []
+        self.brightness = []
+
+    def activate(self) -> None:
+        return
+
+    def fetch(self, engine) -> None:
+        self.records.append(dict(engine.dataout, frame=engine.source.frame))
+        self.timestamps.append(getattr(engine.source, "timestamp", None))
+        self.brightness.append(engine.blink_detector.value)
+
+    def release(self, engine) -> None:
+        return
+
+
+def count_frames(video: Path, img_format: str) -> int:
+    if is_raw_stack(video):
+        store = RawFrameStore(video)
+        return int(store.frame_numbers[-1]) + 1
+
+    if video.is_file():
+        capture = cv2.VideoCapture(str(video))
+        n_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        return n_frames
+
+    return len(glob.glob(str(Path(video, img_format.replace("$", "*", 1)))))
+
+
+def first_frames(length: int):
+    """
+    Yields the first length frames of --video as grayscale images, at their recorded size.
+    """
+    if is_raw_stack(config.arguments.video):
+        yield from RawFrameStore(config.arguments.video).frames[:length]
+        return
+
+    source = ChunkSource(None, 0, length)
+    source.init()
+    try:
+        for i in range(length):
+            image = source.read()
+            if image is None:
+                break
+            yield image
+            source.frame += 1
+    finally:
+        source.release()
+
+
+def calibrate_blink() -> np.ndarray:
+    """
+    Blink detector calibration on the first frames of the video, shared by all workers.
+    """
+    detector = BlinkDetector()
+    for image in first_frames(len(detector.samples)):
+        detector.update(image)
+    return detector.samples[:detector.n]
+
+
+def track_chunk(args: list, file_manager: File_Manager, params: dict, blink, overlap: int, chunk: tuple) -> BatchCollector:
+    """
+    Tracks a chunk from its warm start to SEEK_SLACK frames past its end, seeded with the centers of params and
+    blink calibration samples (or a BlinkDetector in its state at the warm start).
+    Returns the collector of all tracked frames; ChunkMerger renumbers them and keeps the chunk's own.
+    """
+    first, last = chunk
+    warm_start = max(first - overlap, 0)
+
+    config.arguments = Arguments(args)
+    config.arguments.save = 0
+    config.arguments.clear = 1
+    config.file_manager = file_manager
+
+    source = RawSource if is_raw_stack(config.arguments.video) else ChunkSource
+    end = None if last is None else last + SEEK_SLACK
+    engine = Engine(source=functools.partial(source, first=warm_start, last=end), gui=None)
+    engine.arm()
+    if isinstance(blink, BlinkDetector):
+        engine.blink_detector = blink
+    else:
+        engine.blink_detector.load(blink)
+    engine.apply_params(params)
+
+    engine.set_centers(params)
+    # lost reflections are searched for at their offset from the pupil (see GlintTracker.seed)
+    for i in range(len(engine.cr_processors)):
+        center = params[f"cr_{i}"][2] if len(params.get(f"cr_{i}", ())) > 2 else -1
+        if np.ndim(center) != 0:
+            engine.glint_tracker.offsets[i] = np.subtract(center, params["pupil"][2])
+
+    collector = BatchCollector()
+    engine.load_extractors({"BatchCollector": collector})
+    engine.run()
+
+    logger.info(f"tracked frames {first}-{engine.source.frame} (warm start at {warm_start})")
+    return collector
+
+
+def frame_offset(records: list, timestamps: list, times: dict) -> int:
+    """
+    True minus nominal frame number of a chunk, found from the frames it shares with the previous chunk
+    (times maps their timestamps to true frame numbers). Frames with equal timestamps are outvoted by the rest.
+    Without shared timestamps (image sequences, raw stacks, the first chunk) frame numbers are exact: 0.
+    """
+    offsets = [times[timestamp] - record["frame"] for record, timestamp in zip(records, timestamps)
+               if timestamp is not None and timestamp in times]
+    if not offsets:
+        if times and any(timestamp is not None for timestamp in timestamps):
+            logger.warning(f"chunk at frame {records[0]['frame']} shares no frame with the previous chunk, "
+                           f"its frame numbers may be off (increase --overlap)")
+        return 0
+    return max(set(offsets), key=offsets.count)
+
+
+def same_track(a: dict, b: dict) -> bool:
+    """
+    Whether two records of a frame agree on the blink, and on the fits and centers (within TOLERANCES) of the pupil
+    and every corneal reflection.
+    """
+    if bool(a.get("blink")) != bool(b.get("blink")):
+        return False
+    for key in ("pupil", *[key for key in a if key.startswith("cr_")]):
+        fit_a, fit_b = a.get(key), b.get(key)
+        if (fit_a is None) != (fit_b is None):
+            return False
+        tolerance = TOLERANCES["pupil_center" if key == "pupil" else "cr_center"]
+        if fit_a is not None and np.linalg.norm(np.subtract(fit_a[0], fit_b[0])) > tolerance:
+            return False
+    return True
+
+
+class ChunkMerger:
+    """
+    Merges tracked chunks, in order, into one datalog and checks that each tracked as a single process would have:
+    its blinks must match a replay of the blink detector over the brightness of all frames so far, and its frames
+    tracked by the previous chunk as well (past the end of that chunk) must agree with it.
+    A chunk that does not is re-tracked from the state of the merged track at its warm start (see seed).
+    """
+
+    def __init__(self, datalog, params: dict, blink: np.ndarray, chunks: list, overlap: int) -> None:
+        self.datalog = datalog
+        self.params = params
+        self.overlap = overlap
+        self.detector = BlinkDetector()
+        self.detector.load(blink)
+        self.centers = {key: value[2] for key, value in params.items() if len(value) > 2}  # last fitted centers
+        self.seeds = dict.fromkeys(max(first - overlap, 0) for first, _ in chunks)  # warm start: state()
+        self.previous = {}  # frame number: record, of the last merged chunk
+        self.times = {}     # timestamp: frame number, of the last merged chunk
+        self.expected = 0
+        self.retracked = 0
+
+    def own(self, record: dict, first: int, last: int) -> bool:
+        return max(first, self.expected) <= record["frame"] and (last is None or record["frame"] < last)
+
+    def renumber(self, collector: BatchCollector) -> None:
+        offset = frame_offset(collector.records, collector.timestamps, self.times)
+        for record in collector.records:
+            record["frame"] += offset
+
+    def agrees(self, collector: BatchCollector, first: int, last: int) -> bool:
+        detector = copy.deepcopy(self.detector)
+        for record, value in zip(collector.records, collector.brightness):
+            if self.own(record, first, last) and detector.add(value) != bool(record.get("blink")):
+                return False
+            if record["frame"] >= first and record["frame"] in self.previous:
+                if not same_track(record, self.previous[record["frame"]]):
+                    return False
+        return True
+
+    def seed(self, warm_start: int):
+        """
+        Params seeded with the centers last fitted before warm_start, and the blink detector in its state at
+        warm_start; None if the merge has not passed warm_start.
+        """
+        if warm_start == self.expected:
+            return self.state()
+        return self.seeds.get(warm_start)
+
+    def state(self) -> tuple:
+        params = {key: [*value[:2], self.centers.get(key, -1)] for key, value in self.params.items()}
+        return params, copy.deepcopy(self.detector)
+
+    def write(self, collector: BatchCollector, first: int, last: int) -> None:
+        for record, value in zip(collector.records, collector.brightness):
+            if not self.own(record, first, last):
+                continue
+            frame = record["frame"]
+            if frame > self.expected:
+                logger.warning(f"frames {self.expected}-{frame - 1} were not tracked")
+            if frame in self.seeds:
+                self.seeds[frame] = self.state()
+
+            self.detector.add(value)
+            for key in self.params:
+                if record.get(key):
+                    self.centers[key] = tuple(record[key][0])
+            self.datalog.write(record, frame)
+            self.expected = frame + 1
+
+        self.previous = {record["frame"]: record for record in collector.records}
+        self.times = {}
+        for record, timestamp in zip(collector.records, collector.timestamps):
+            if timestamp is not None:
+                self.times.setdefault(timestamp, record["frame"])
+
+    def merge(self, collector: BatchCollector, chunk: tuple, retrack) -> None:
+        """
+        Writes the chunk's own frames, after re-tracking it with retrack(params, detector) if it disagrees.
+        """
+        first, last = chunk
+        self.renumber(collector)
+        if not self.agrees(collector, first, last):
+            seed = self.seed(max(first - self.overlap, 0))
+            if seed is not None and first > 0:
+                logger.info(f"re-tracking frames {first}-{last} from the merged track at their warm start")
+                self.retracked += 1
+                collector = retrack(*seed)
+                self.renumber(collector)
+        self.write(collector, first, last)
+
+
+def main(args: list = None) -> Path:
+    """
+    eyeloop batch --video [file]/[folder] --params [params_*.npy] [--workers N] [--chunk_size N] [--overlap N]
+    Tracks the video offline in a process pool and merges the chunks into one ordered datalog (--datalog json/npy).
+    """
+    args = sys.argv[2:] if args is None else args
+    config.arguments = Arguments(args)
+    if config.arguments.video == "" or config.arguments.params == "":
+        raise ValueError("Batch tracking needs --video and --params.")
+
+    config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format=config.arguments.img_format)
+
+    params = load_params(config.arguments.params)
+    if config.arguments.blinkcalibration != "":
+        blink = np.load(config.arguments.blinkcalibration)
+    else:
+        blink = calibrate_blink()
+
+    n_frames = count_frames(Path(config.arguments.video), config.arguments.img_format)
+    chunk_size = config.arguments.chunk_size
+    chunks = [(first, first + chunk_size) for first in range(0, max(n_frames, 1), chunk_size)]
+    chunks[-1] = (chunks[-1][0], None)  # the last chunk runs to the end, frame counts may be approximate
+
+    workers = config.arguments.workers if config.arguments.workers > 0 else os.cpu_count()
+    logger.info(f"batch tracking {n_frames} frames in {len(chunks)} chunk(s) on {workers} worker(s)")
+
+    track = functools.partial(track_chunk, args, config.file_manager, params, blink, config.arguments.overlap)
+    datalog = DATALOGS[config.arguments.datalog](config.file_manager.new_folderpath, len([key for key in params if key.startswith("cr_")]))
+    merger = ChunkMerger(datalog, params, blink, chunks, config.arguments.overlap)
+    with multiprocessing.Pool(workers) as pool:
+        for chunk, collector in zip(chunks, pool.imap(track, chunks)):
+            retrack = lambda params, detector: pool.apply(track_chunk, (args, config.file_manager, params, detector,
+                                                                        config.arguments.overlap, chunk))
+            merger.merge(collector, chunk, retrack)
+    datalog.close()
+    logger.info(f"{merger.retracked} of {len(chunks)} chunk(s) re-tracked from the merged track")
+
+    print(f"Batch datalog saved to {config.file_manager.new_folderpath}")
+    return config.file_manager.new_folderpath
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
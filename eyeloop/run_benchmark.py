@@ -0,0 +1,331 @@
+import argparse
+import functools
+import json
+import logging
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.engine.blink import BlinkDetector
+from eyeloop.engine.engine import Engine, load_params
+from eyeloop.engine.glints import GlintTracker
+from eyeloop.engine.models.circular import Circle
+from eyeloop.engine.models.ellipsoid import Ellipse
+from eyeloop.engine.preprocessor import Preprocessor
+from eyeloop.engine.processor import CornealReflection, Pupil
+from eyeloop.sources.chunk import ChunkSource
+from eyeloop.sources.synthetic import SyntheticEye, SyntheticSource, parse_synthetic
+from eyeloop.utilities.accuracy import compare_tracks, load_tracks, save_tracks, track_arrays
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+EYELOOP_DIR = Path(__file__).parent
+PROJECT_DIR = EYELOOP_DIR.parent
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_DIR = PROJECT_DIR / "tests" / "testdata" / "golden"
+
+# Bundled recordings, tracked with fixed parameters (params_*.npy, from eyeloop autotune) and blink calibrations,
+# so every run tracks the same way, and the reference tracks they must reproduce.
+BENCHMARK_VIDEOS = {
+    "short_human_3blink": {
+        "path": PROJECT_DIR / "tests" / "testdata" / "short_human_3blink.mp4",
+        "params": GOLDEN_DIR / "params_short_human_3blink.npy",
+        "blink": GOLDEN_DIR / "blinkcalibration_short_human_3blink.npy",
+        "reference": GOLDEN_DIR / "short_human_3blink.npz",
+    },
+    "short_mouse_noblink": {
+        "path": PROJECT_DIR / "tests" / "testdata" / "short_mouse_noblink.m4v",
+        "params": GOLDEN_DIR / "params_short_mouse_noblink.npy",
+        "blink": GOLDEN_DIR / "blinkcalibration_short_mouse_noblink.npy",
+        "reference": GOLDEN_DIR / "short_mouse_noblink.npz",
+    },
+    "Frmd7": {
+        "path": PROJECT_DIR / "misc" / "travis-sample" / "Frmd7.m4v",
+        "params": GOLDEN_DIR / "params_short_mouse_noblink.npy",
+        "blink": GOLDEN_DIR / "blinkcalibration_short_mouse_noblink.npy",
+        "reference": GOLDEN_DIR / "short_mouse_noblink.npz",  # same frames as short_mouse_noblink
+    },
+}
+
+REGRESSION = .1  # relative slowdown flagged by --compare
+SYNTHETIC_FRAMES = 1000  # frames tracked with --synthetic
+
+
+def timed(function, inputs: list, repeat: int) -> dict:
+    """
+    Calls function(*item) for every item of inputs, repeat times; per-call times in microseconds.
+    """
+    times = np.empty(len(inputs) * repeat)
+    i = 0
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            function(*item)
+            times[i] = time.perf_counter() - start
+            i += 1
+
+    times *= 1e6
+    return {"n": len(times), "mean_us": times.mean(), "p50_us": np.percentile(times, 50),
+            "p90_us": np.percentile(times, 90), "min_us": times.min()}
+
+
+def load_video(path: Path) -> np.ndarray:
+    config.arguments.video = path
+    source = ChunkSource(None, 0)
+    source.init()
+    frames = []
+    while True:
+        image = source.read()
+        if image is None:
+            break
+        frames.append(image)
+        source.frame += 1
+    source.capture.release()
+    return np.stack(frames)
+
+
+def recorded_inputs(frames: np.ndarray, params: dict) -> dict:
+    """
+    Tracks the frames once with params and records, per successful pupil fit, the walkout arguments
+    and the walkout points (fitted by both shape models), and per frame the glint tracker's arguments.
+    """
+    pupil, glint = Pupil(), CornealReflection(n=0)
+    inputs = {"pupil": [], "ellipse": [], "circle": [], "glints": []}
+    for processor, name in ((pupil, "pupil"), (glint, "cr_0")):
+        processor.set_dimensions(frames.shape[2:0:-1])
+        processor.binarythreshold, processor.blur = params[name][0], params[name][1]
+        processor.set_center(params[name][2])
+
+    tracker = GlintTracker([glint])
+    for frame in frames:
+        inputs["glints"].append((tracker, frame, glint.center, glint.roi_scale))
+        tracker.track(frame, Preprocessor(frame))
+
+        center = pupil.center
+        if pupil.track(frame, Preprocessor(frame)) is None:
+            continue
+
+        item = (pupil, pupil.src, center, pupil.origin.copy(), pupil.blurred)
+        fitted, points = pupil.center, walkout(*item)
+        pupil.center = fitted
+
+        inputs["pupil"].append(item)
+        inputs["ellipse"].append((points,))
+        inputs["circle"].append((points,))
+    return inputs
+
+
+def walkout(processor, src, center, origin, blurred) -> np.ndarray:
+    processor.center = center
+    processor.origin[:] = origin
+    processor.blurred = blurred
+    return processor.walkout(src)
+
+
+def track_glints(tracker, frame, center, roi_scale) -> list:
+    processor = tracker.processors[0]
+    processor.center, processor.roi_scale = center, roi_scale
+    return tracker.track(frame, Preprocessor(frame))
+
+
+def micro_benchmarks(frames: np.ndarray, video: dict, repeat: int) -> dict:
+    inputs = recorded_inputs(frames, load_params(str(video["params"])))
+    results = {
+        "Pupil.walkout": timed(walkout, inputs["pupil"], repeat),
+        "GlintTracker.track": timed(track_glints, inputs["glints"], repeat),
+        "Ellipse.fit": timed(Ellipse().fit, inputs["ellipse"], repeat),
+        "Circle.hyper_fit": timed(Circle().hyper_fit, inputs["circle"], repeat),
+    }
+
+    detector = BlinkDetector()
+    detector.load(np.load(video["blink"]))
+    results["BlinkDetector.update"] = timed(detector.update, [(frame,) for frame in frames], repeat)
+    return results
+
+
+def set_arguments(engine_args: list) -> None:
+    config.arguments = Arguments(engine_args + ["--save", "0", "--clear", "1"])
+
+
+def track(source, params: dict, blink: np.ndarray = None) -> tuple:
+    """
+    Tracks the whole source without GUI, saving or pacing, seeded with params (and blink calibration samples).
+    The pupil re-acquisition time budget is lifted, so results do not depend on machine load.
+    Returns the summary, the data output of every frame and the engine.
+    """
+    records = []
+
+    class Collector:
+        def fetch(self, engine):
+            records.append(engine.dataout)
+
+    engine = Engine(source=source, gui=None)
+    engine.load_extractors({"Collector": Collector()})
+    if blink is not None:
+        engine.blink_detector.load(blink)
+    engine.pupil_processor.reacquirer.budget = np.inf
+    engine.arm()
+    engine.apply_params(params)
+    engine.set_centers(params)
+    records.clear()
+
+    start = time.perf_counter()
+    engine.run()
+    elapsed = time.perf_counter() - start
+
+    n = len(records)
+    summary = {"frames": n, "seconds": elapsed, "fps": n / elapsed, "ms_per_frame": elapsed / n * 1e3,
+               "pupil_fits": sum(1 for record in records if record.get("pupil")),
+               "blinks": sum(1 for record in records if record.get("blink"))}
+    return summary, records, engine
+
+
+def end_to_end(video: dict, engine_args: list) -> tuple:
+    """
+    Tracks a bundled video with its fixed parameters and blink calibration.
+    Returns the summary and the data output of every frame.
+    """
+    set_arguments(engine_args)
+    config.arguments.video = video["path"]
+    summary, records, _ = track(functools.partial(ChunkSource, first=0), load_params(str(video["params"])),
+                                np.load(video["blink"]))
+    return summary, records
+
+
+def synthetic_end_to_end(engine_args: list) -> dict:
+    """
+    Tracks SYNTHETIC_FRAMES frames of the --synthetic eye, seeded with its own parameters, and compares
+    the output with the rendered ground truth.
+    """
+    set_arguments(engine_args)
+    eye = SyntheticEye(**parse_synthetic(config.arguments.synthetic), n_crs=config.arguments.crs)
+    summary, records, engine = track(functools.partial(SyntheticSource, eye=eye, n_frames=SYNTHETIC_FRAMES),
+                                     eye.params(config.arguments.crs))
+    summary["accuracy"] = compare_tracks(engine.source.ground_truth(), track_arrays(records, config.arguments.crs))
+    return summary
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"time": time.time(), "commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "opencv": cv2.__version__, "machine": platform.machine(), "processor": platform.processor()}
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """
+    Relative change of every timing present in both runs; positive is slower.
+    """
+    rows = []
+    for video, entry in results["videos"].items():
+        old = baseline["videos"].get(video)
+        if old is None:
+            continue
+        for name, stats in entry["micro"].items():
+            if name in old["micro"]:
+                rows.append((f"{video} {name} p50", stats["p50_us"] / old["micro"][name]["p50_us"] - 1))
+        rows.append((f"{video} end-to-end ms/frame",
+                     entry["end_to_end"]["ms_per_frame"] / old["end_to_end"]["ms_per_frame"] - 1))
+    if "synthetic" in results and "synthetic" in baseline:
+        rows.append(("synthetic end-to-end ms/frame",
+                     results["synthetic"]["ms_per_frame"] / baseline["synthetic"]["ms_per_frame"] - 1))
+    return rows
+
+
+def print_accuracy(label: str, report: dict) -> None:
+    deviations = "  ".join(f"{key} p99 {value['p99']:.3f} px" for key, value in report.items()
+                           if key.endswith(("_center", "_axes")))
+    verdict = "same" if report["passed"] else f"DIFFERENT ({', '.join(report['failed']) or 'frame count'})"
+    print(f"{label:<47} {verdict}: {deviations}  fit mismatch {report['fit_mismatch'] * 100:.1f}%"
+          f"  blink mismatch {report['blink_mismatch'] * 100:.1f}%")
+
+
+def main(args: list = None) -> dict:
+    """
+    eyeloop benchmark [--repeat N] [--json path] [--compare baseline.json] [--variant "--roi 1"] [--record 1]
+                      [engine options, e.g. --model circular]
+    Micro-benchmarks the tracking stages on recorded frames and measures end-to-end frames per second
+    on the bundled videos, headless and unpaced. Every end-to-end run is checked frame by frame against the
+    reference tracks in tests/testdata/golden (--record 1 rewrites them); --variant also tracks each video
+    with the extra engine options and compares the two runs. With --synthetic WIDTHxHEIGHT@FPS, a rendered eye
+    is tracked as well and compared with its ground truth. Results are written as json.
+    """
+    parser = argparse.ArgumentParser(description="EyeLoop benchmark")
+    parser.add_argument("--repeat", default=3, type=int, help="Passes over the frames per micro-benchmark (default = 3)")
+    parser.add_argument("--json", default="", type=str, help="Output file (default = benchmark.json in the trial folder)")
+    parser.add_argument("--compare", default="", type=str, help="Baseline benchmark json to compare against")
+    parser.add_argument("--variant", default="", type=str,
+                        help="Engine options of a variant to compare frame by frame, e.g. \"--roi 1\"")
+    parser.add_argument("--record", default=0, type=int,
+                        help="Save the end-to-end tracks as the new reference (yes/no, 1/0; default = 0)")
+    parser.add_argument("--videos", default=",".join(BENCHMARK_VIDEOS), type=str,
+                        help=f"Comma-separated subset of {', '.join(BENCHMARK_VIDEOS)} (empty = none)")
+    options, engine_args = parser.parse_known_args(sys.argv[2:] if args is None else args)
+
+    set_arguments(engine_args)
+    config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format=config.arguments.img_format)
+    logging.getLogger("eyeloop").setLevel(logging.ERROR)
+
+    results = {"environment": environment(), "arguments": engine_args, "variant": options.variant, "videos": {}}
+    for name in filter(None, options.videos.split(",")):
+        video = BENCHMARK_VIDEOS[name]
+        frames = load_video(video["path"])
+        entry = results["videos"][name] = {"micro": micro_benchmarks(frames, video, options.repeat)}
+        entry["end_to_end"], records = end_to_end(video, engine_args)
+        tracks = track_arrays(records, config.arguments.crs)
+
+        for stage, stats in entry["micro"].items():
+            print(f"{name:<20} {stage:<26} p50 {stats['p50_us']:8.1f} us  p90 {stats['p90_us']:8.1f} us")
+        e2e = entry["end_to_end"]
+        print(f"{name:<20} {'end-to-end':<26} {e2e['fps']:8.1f} fps ({e2e['pupil_fits']}/{e2e['frames']} pupil fits)")
+
+        reference = video["reference"]
+        if options.record == 1:
+            save_tracks(reference, tracks)
+            print(f"{name:<20} reference saved to {reference}")
+        elif reference.exists():
+            entry["accuracy"] = compare_tracks(load_tracks(reference), tracks)
+            print_accuracy(f"{name:<20} vs reference", entry["accuracy"])
+
+        if options.variant:
+            entry["variant"], variant_records = end_to_end(video, engine_args + options.variant.split())
+            entry["variant"]["accuracy"] = compare_tracks(tracks, track_arrays(variant_records, config.arguments.crs))
+            variant = entry["variant"]
+            print(f"{name:<20} {options.variant:<26} {variant['fps']:8.1f} fps "
+                  f"({variant['fps'] / e2e['fps']:.2f}x)")
+            print_accuracy(f"{name:<20} {options.variant} vs base", variant["accuracy"])
+
+    if config.arguments.synthetic != "":
+        synthetic = results["synthetic"] = synthetic_end_to_end(engine_args)
+        label = f"synthetic {config.arguments.synthetic}"
+        print(f"{label:<47} {synthetic['fps']:8.1f} fps ({synthetic['pupil_fits']}/{synthetic['frames']} pupil fits)")
+        print_accuracy(f"{label} vs truth", synthetic["accuracy"])
+
+    path = Path(options.json) if options.json else Path(config.file_manager.new_folderpath, "benchmark.json")
+    with open(path, "w") as file:
+        json.dump(results, file, indent=1, default=float)
+    print(f"Benchmark saved to {path}")
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        for label, change in compare(results, baseline):
+            flag = "  <- slower" if change > REGRESSION else ""
+            print(f"{label:<60} {change * 100:+6.1f}%{flag}")
+
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
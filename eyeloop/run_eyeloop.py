@@ -8,14 +8,18 @@ import os
 import numpy as np
 
 import eyeloop.config as config
-from eyeloop.engine.engine import Engine
+from eyeloop.engine.engine import Engine, load_params
 from eyeloop.extractors.DAQ import DaqExtractor
 from eyeloop.extractors.fps import FpsExtractor
+from eyeloop.guis.headless.headless_gui import HeadlessGUI
 from eyeloop.guis.minimum.minimum_gui import GUI
 from eyeloop.sources.cv_offline import CvOfflineSource
 from eyeloop.sources.cv_stream import CvStreamSource
+from eyeloop.sources.raw import RawSource
+from eyeloop.sources.synthetic import SyntheticSource
 from eyeloop.utilities.argument_parser import Arguments
 from eyeloop.utilities.file_manager import File_Manager
+from eyeloop.utilities.frame_store import is_raw_stack
 from eyeloop.utilities.format_print import welcome
 from eyeloop.utilities.shared_logging import setup_logging
 
@@ -40,15 +44,19 @@ class EyeLoop:
         self.source = None
 
         config.arguments = Arguments(args)
-        config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format = config.arguments.img_format)
+        config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format = config.arguments.img_format,
+                                           save_format=config.arguments.save_format, quality=config.arguments.quality,
+                                           codec=config.arguments.codec, queue_size=config.arguments.queue_size,
+                                           drop_policy=config.arguments.drop_policy)
         if logger is None:
             logger, logger_filename = setup_logging(log_dir=config.file_manager.new_folderpath, module_name="run_eyeloop")
         
         self.init()
 
-    def load_extractors(self, file_path):
+    @staticmethod
+    def load_extractors(file_path):
         fps_counter = FpsExtractor()
-        data_acquisition = DaqExtractor(config.file_manager.new_folderpath)
+        data_acquisition = DaqExtractor(config.file_manager.new_folderpath, config.arguments.datalog)
         extractors = { "FpsExtractor": fps_counter, "DaqExtractor": data_acquisition }
 
         if file_path == "p":
@@ -76,14 +84,84 @@ class EyeLoop:
         #    config.blink = np.load(f"{EYELOOP_DIR}/blink_.npy")[0] * .8
         #except:
         #    print("\n(!) NO BLINK DETECTION. Run 'eyeloop --blink 1' to calibrate\n")
-        source = CvOfflineSource if config.arguments.video != "" else CvStreamSource
+        source = select_source()
+
+        if config.arguments.headless == 1:
+            self.run_headless(source)
+            return
+
         self.engine = Engine(source=source, gui=GUI)
         self.engine.load_extractors(self.load_extractors(config.arguments.extractors))
         self.engine.activate()
-        self.engine.run()
+        self.engine.gui.run(self.engine.run)
+
+    def run_headless(self, source):
+        """
+        Tracks without a display, see start_headless;
+        the engine is released when the source ends or on Ctrl+C.
+        """
+        self.engine = start_headless(source, self.load_extractors(config.arguments.extractors))
+
+        try:
+            self.engine.run()
+        except KeyboardInterrupt:
+            logger.info("headless tracking interrupted")
+        self.engine.release()
+
+
+def select_source():
+    """
+    The source class for the current arguments: a rendered eye (--synthetic), a raw frame stack or video (--video),
+    or the camera.
+    """
+    if config.arguments.synthetic != "":
+        return SyntheticSource
+    elif config.arguments.video == "":
+        return CvStreamSource
+    elif is_raw_stack(config.arguments.video):
+        return RawSource
+    return CvOfflineSource
+
+
+def start_headless(source, extractors: dict) -> Engine:
+    """
+    Builds and arms an engine without a display: thresholds, blur and centers come from --params (params_*.npy),
+    or from the rendered eye itself with --synthetic.
+    """
+    if config.arguments.params == "" and source is not SyntheticSource:
+        raise ValueError("Headless tracking needs --params (params_*.npy with a selected pupil center).")
+
+    engine = Engine(source=source, gui=HeadlessGUI)
+    engine.load_extractors(extractors)
+    engine.activate()
+
+    if config.arguments.params != "":
+        params = load_params(config.arguments.params)
+    else:
+        params = engine.source.eye.params(len(engine.cr_processors))
+        engine.apply_params(params)
+    engine.set_centers(params)
+    return engine
 
 
 def main():
+    if sys.argv[1:2] == ["batch"]:
+        from eyeloop import run_batch
+        run_batch.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["autotune"]:
+        from eyeloop import run_autotune
+        run_autotune.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["multi"]:
+        from eyeloop import run_multi
+        run_multi.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["benchmark"]:
+        from eyeloop import run_benchmark
+        run_benchmark.main(sys.argv[2:])
+        return
+
     app = EyeLoop(sys.argv[1:], logger=None)
 
 
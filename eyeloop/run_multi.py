@@ -0,0 +1,270 @@
+import argparse
+from collections import deque
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shlex
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.run_eyeloop import EyeLoop, select_source, start_headless
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+logger = logging.getLogger(__name__)
+
+COLLECT_BATCH = 32  # records per message from a stream worker to the merging process
+INTERVALS = 32  # reference frame intervals behind the default alignment tolerance
+START_TIMEOUT = 60  # seconds the armed streams wait for each other before giving up
+
+
+class StreamCollector:
+    """
+    Extractor that forwards the data output of every frame, with its frame number and capture time,
+    to the merging process in batches. Capture times (time.perf_counter(), shared by all processes on the
+    machine) are moved to the wall clock by one offset measured in the merging process. Frames of recordings
+    (Source.media_time) are stamped with their position in the recording from the shared origin instead,
+    so offline streams pair by content however fast each one is read.
+    """
+
+    def __init__(self, stream: int, messages, clock_offset: float, origin: float) -> None:
+        self.stream = stream
+        self.messages = messages
+        self.clock_offset = clock_offset
+        self.origin = origin
+        self.records = []
+
+    def activate(self) -> None:
+        return
+
+    def fetch(self, engine) -> None:
+        if engine.media_time is None:
+            capture = engine.capture_time + self.clock_offset
+        else:
+            capture = engine.media_time + self.origin
+        self.records.append(dict(engine.dataout, frame=engine.frame_i, capture=capture))
+        if len(self.records) >= COLLECT_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.records:
+            self.messages.put((self.stream, self.records))
+            self.records = []
+
+    def release(self, engine) -> None:
+        self.flush()
+
+
+class TimestampAligner:
+    """
+    Merges the records of n streams into rows aligned to the frames of stream 0, the reference, by capture time.
+    Every other stream contributes the record captured nearest to the reference frame if it lies within tolerance
+    (seconds; 0 = half the median of the recent reference frame intervals), and each record is used at most once.
+    A row is emitted once every other stream has delivered a record captured after it, or has ended.
+    """
+
+    def __init__(self, n_streams: int, tolerance: float = 0) -> None:
+        self.pending = [deque() for _ in range(n_streams)]
+        self.ended = [False] * n_streams
+        self.tolerance = tolerance
+        self.intervals = deque(maxlen=INTERVALS)
+        self.last = None
+        self.unmatched = [0] * n_streams  # records of each stream that no row took
+
+    def add(self, stream: int, records: list) -> None:
+        self.pending[stream].extend(records)
+
+    def end(self, stream: int) -> None:
+        self.ended[stream] = True
+
+    def ready(self, capture: float) -> bool:
+        return all(self.ended[stream] or (pending and pending[-1]["capture"] >= capture)
+                   for stream, pending in enumerate(self.pending[1:], 1))
+
+    def rows(self) -> list:
+        rows = []
+        reference = self.pending[0]
+        while reference and self.ready(reference[0]["capture"]):
+            record = reference.popleft()
+            capture = record["capture"]
+            if self.last is not None:
+                self.intervals.append(capture - self.last)
+            self.last = capture
+
+            tolerance = self.tolerance
+            if tolerance <= 0:
+                tolerance = np.median(self.intervals) / 2 if self.intervals else np.inf
+
+            row = {"time": capture, "stream_0": record}
+            for stream in range(1, len(self.pending)):
+                row[f"stream_{stream}"] = self.match(stream, capture, tolerance)
+            rows.append(row)
+        return rows
+
+    def match(self, stream: int, capture: float, tolerance: float):
+        pending = self.pending[stream]
+        while len(pending) > 1 and abs(pending[1]["capture"] - capture) <= abs(pending[0]["capture"] - capture):
+            pending.popleft()
+            self.unmatched[stream] += 1
+
+        if pending and abs(pending[0]["capture"] - capture) <= tolerance:
+            return pending.popleft()
+        if pending and pending[0]["capture"] < capture:  # too early for this row and every later one
+            pending.popleft()
+            self.unmatched[stream] += 1
+        return None
+
+    def finish(self) -> list:
+        """
+        Rows of the remaining reference frames once every stream has ended; counts the records left over.
+        """
+        self.ended = [True] * len(self.ended)
+        rows = self.rows()
+        for stream, pending in enumerate(self.pending):
+            self.unmatched[stream] += len(pending)
+            pending.clear()
+        return rows
+
+
+def core_groups(n: int, cores: list = None) -> list:
+    """
+    Splits the cores this process may run on into n contiguous groups, one per stream
+    (single cores, round-robin, when there are fewer cores than streams).
+    """
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    if len(cores) < n:
+        return [{cores[i % len(cores)]} for i in range(n)]
+    return [{int(core) for core in group} for group in np.array_split(cores, n)]
+
+
+def pin(cores: set) -> None:
+    """
+    Restricts the calling process, and OpenCV's thread pool, to the given cores.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    else:
+        logger.warning("core affinity is not supported on this platform")
+    cv2.setNumThreads(len(cores))
+
+
+def track_stream(stream: int, args: list, folder, cores: set, clock_offset: float, origin: float,
+                 start, messages) -> None:
+    """
+    Worker process of one stream: a headless engine with its own source and processors (see start_headless),
+    logging to <trial folder>/stream_<i> and forwarding every frame's data output to the merging process.
+    Once armed, it waits at the start barrier so that all streams begin tracking together;
+    a stream that fails before then breaks the barrier for the others.
+    """
+    try:
+        if cores:
+            pin(cores)
+
+        config.arguments = Arguments(args)
+        config.file_manager = File_Manager(output_root=folder, img_format=config.arguments.img_format,
+                                           save_format=config.arguments.save_format, quality=config.arguments.quality,
+                                           codec=config.arguments.codec, queue_size=config.arguments.queue_size,
+                                           drop_policy=config.arguments.drop_policy, folder_name=f"stream_{stream}")
+
+        extractors = EyeLoop.load_extractors(config.arguments.extractors)
+        extractors["StreamCollector"] = StreamCollector(stream, messages, clock_offset, origin)
+        engine = start_headless(select_source(), extractors)
+        start.wait()
+        logger.info(f"stream {stream} tracking on core(s) {sorted(cores) if cores else 'any'}")
+
+        try:
+            engine.run()
+        except KeyboardInterrupt:
+            logger.info(f"stream {stream} interrupted")
+        engine.release()
+
+    except Exception:
+        start.abort()
+        logger.exception(f"stream {stream} failed")
+
+    finally:
+        messages.put((stream, None))
+
+
+def main(args: list = None):
+    """
+    eyeloop multi --stream "[options of stream 0]" --stream "[options of stream 1]" ... [options shared by all streams]
+    Tracks several cameras, videos or eyes at once, headless: one worker process per stream, each with its own
+    source, processors, parameters (--params) and datalog (<trial folder>/stream_<i>), pinned to its own cores.
+    All streams start tracking together once every one is armed. The streams are merged into datalog_merged.json,
+    one line per frame of stream 0 with the nearest frame of every other stream by capture time
+    (videos: by position in the video). Ctrl+C stops all streams.
+    """
+    parser = argparse.ArgumentParser(description="EyeLoop multi-stream tracking")
+    parser.add_argument("--stream", action="append", default=[], type=str,
+                        help="Engine options of one stream, e.g. \"--device 1 --params params_right.npy\" (repeat per stream)")
+    parser.add_argument("--align_tolerance", default=0, type=float,
+                        help="Largest capture time difference of aligned frames in ms (default = 0, half the frame interval of stream 0)")
+    parser.add_argument("--affinity", default=1, type=int,
+                        help="Pin each stream's worker to its own cores (yes/no, 1/0; default = 1)")
+    options, shared = parser.parse_known_args(sys.argv[2:] if args is None else args)
+    if not options.stream:
+        raise ValueError("Multi-stream tracking needs at least one --stream.")
+
+    config.arguments = Arguments(shared)
+    config.file_manager = File_Manager(output_root=config.arguments.output_dir, img_format=config.arguments.img_format)
+    folder = config.file_manager.new_folderpath
+
+    n = len(options.stream)
+    groups = core_groups(n) if options.affinity == 1 else [set()] * n
+    clock_offset = time.time() - time.perf_counter()
+    origin = time.time()  # wall time of the first frame of every recording
+
+    messages = multiprocessing.Queue()
+    start = multiprocessing.Barrier(n, timeout=START_TIMEOUT)
+    workers = [multiprocessing.Process(target=track_stream, name=f"eyeloop-stream-{i}",
+                                       args=(i, shared + shlex.split(stream), folder, groups[i], clock_offset, origin,
+                                             start, messages))
+               for i, stream in enumerate(options.stream)]
+    for worker in workers:
+        worker.start()
+
+    aligner = TimestampAligner(n, options.align_tolerance / 1e3)
+    path = folder / "datalog_merged.json"
+    with open(path, "w") as file:
+        running = n
+        while running > 0:
+            try:
+                stream, records = messages.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            except KeyboardInterrupt:
+                logger.info("multi-stream tracking interrupted, waiting for the streams to stop")
+                continue
+
+            if records is None:
+                aligner.end(stream)
+                running -= 1
+            else:
+                aligner.add(stream, records)
+
+            for row in aligner.rows():
+                file.write(json.dumps(row) + "\n")
+
+        for row in aligner.finish():
+            file.write(json.dumps(row) + "\n")
+
+    for worker in workers:
+        worker.join()
+
+    logger.info(f"records without an aligned frame per stream: {aligner.unmatched}")
+    print(f"Merged datalog saved to {path}")
+    return folder
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,88 @@
+import logging
+import math
+from pathlib import Path
+import time
+
+import cv2
+
+import eyeloop.config as config
+from eyeloop.sources.source import Source
+from eyeloop.utilities.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkSource(Source):
+    """
+    Replays frames [first, last) of a video file or image-sequence directory as fast as possible.
+    Used by batch tracking, where each worker process owns one chunk.
+    Video seeks may land a frame or two off the requested frame (the capture still reports the requested position),
+    so frame numbers of a video chunk are nominal; timestamp (the container time of the frame, in ms) identifies it.
+    """
+
+    def __init__(self, on_frame = None, first: int = 0, last: int = None) -> None:
+        super().__init__(on_frame)
+        self.first = first
+        self.last = last
+        self.read = None
+        self.timestamp = None
+
+    def init(self) -> None:
+        self.vid_path = Path(config.arguments.video)
+
+        if self.vid_path.is_file():
+            self.capture = cv2.VideoCapture(str(self.vid_path))
+            if not self.capture.isOpened():
+                raise ValueError(f"Failed to open video at {self.vid_path}")
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.first)
+            self.read = self.read_video
+
+        elif self.vid_path.is_dir():
+            config.file_manager.input_folderpath = self.vid_path
+            self.read = self.read_sequence
+
+        else:
+            raise ValueError(f"Video path at {self.vid_path} is not a file or directory!")
+
+        self.frame = self.first
+        image = self.read()
+        if image is None:
+            raise ValueError(f"No frame {self.first} in {self.vid_path}")
+
+        # Rewind, so route() starts at the first frame of the chunk.
+        if self.capture is not None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.first)
+
+        height, width = image.shape
+        return (math.floor(width), math.floor(height)), image
+
+    def read_video(self):
+        _, image = self.capture.read()
+        if image is None:
+            return None
+        self.timestamp = self.capture.get(cv2.CAP_PROP_POS_MSEC)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def read_sequence(self):
+        try:
+            image = config.file_manager.read_image(self.frame)
+        except ValueError:
+            return None
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def route(self) -> None:
+        while self.last is None or self.frame < self.last:
+            start = profiler.start()
+            image = self.read()
+            if image is None:
+                break
+            self.capture_time = time.perf_counter()
+            profiler.stop("capture", start)
+            self.proceed(image)
+
+        self.release()
+
+    def release(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+        super().release()
@@ -8,17 +8,16 @@ import cv2
 
 import eyeloop.config as config
 from eyeloop.sources.source import Source
+from eyeloop.utilities.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
-FRAME_RATE_COEFF = 0.5
-
 class CvOfflineSource(Source):
     def __init__(self, on_frame) -> None:
         super().__init__(on_frame)
         self.route_frame: Optional[Callable] = None  # Dynamically assigned at runtime depending on input type
-        self.last_frame_time = time.time()
         self.fps = 30
+        self.playback = config.arguments.playback
     
     def init(self) -> None:
         self.vid_path = Path(config.arguments.video)
@@ -31,8 +30,11 @@ class CvOfflineSource(Source):
             height = self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
             self.fps = self.capture.get(cv2.CAP_PROP_FPS)
             logger.info(f"Video FPS: {self.fps}")
+            if self.fps > 0:
+                config.file_manager.fps = self.fps
 
             _, image = self.capture.read()
+            self.media_time = self.capture.get(cv2.CAP_PROP_POS_MSEC) / 1e3
             if self.capture.isOpened():
                 try:
                     image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -47,6 +49,7 @@ class CvOfflineSource(Source):
             config.file_manager.input_folderpath = self.vid_path
             config.file_manager.input_folderpath = self.vid_path
             image = config.file_manager.read_image(self.frame)
+            self.media_time = 0.
 
             try:
                 height, width, _ = image.shape
@@ -65,32 +68,38 @@ class CvOfflineSource(Source):
         return (width, height), image
 
     def route(self) -> None:
-        period = 1 / (self.fps * FRAME_RATE_COEFF)
-        while True:
-            now = time.time()
-            if (now - self.last_frame_time < period):
-                continue
-
-            self.last_frame_time = now
-            if self.route_frame is not None:
-                self.route_frame()
-            
-            else:
-                break
+        """
+        Plays the sequence back at --playback times its recorded frame rate (0 = as fast as possible).
+        Frames are paced against a deadline schedule with sleep; a late frame resets the schedule instead of bursting.
+        """
+        period = 1 / (self.fps * self.playback) if self.playback > 0 and self.fps > 0 else 0
+        deadline = time.perf_counter()
+
+        while self.route_frame is not None:
+            if period:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    deadline = time.perf_counter()
 
-    def proceed(self, image) -> None:
-        image = self.resize(image)
-        self.rotate_(image, self.angle)
-        self.on_frame(image)
-        self.save_(image)
-        self.frame += 1
+            self.route_frame()
 
     def route_sequence_sing(self) -> None:
+        start = profiler.start()
         image = config.file_manager.read_image(self.frame)
+        self.capture_time = time.perf_counter()
+        self.media_time = self.frame / self.fps
+        profiler.stop("capture", start)
         self.proceed(image[..., 0])
 
     def route_sequence_flat(self) -> None:
+        start = profiler.start()
         image = config.file_manager.read_image(self.frame)
+        self.capture_time = time.perf_counter()
+        self.media_time = self.frame / self.fps
+        profiler.stop("capture", start)
         self.proceed(image)
 
     def route_cam(self) -> None:
@@ -99,9 +108,13 @@ class CvOfflineSource(Source):
         1: eyeloop for online processing
         2: frame save for offline processing
         """
+        start = profiler.start()
         _, image = self.capture.read()
+        self.capture_time = time.perf_counter()
+        self.media_time = self.capture.get(cv2.CAP_PROP_POS_MSEC) / 1e3
         if image is not None:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            profiler.stop("capture", start)
             self.proceed(image)
         else:
             logger.info("No more frames to process, exiting.")
@@ -112,5 +125,4 @@ class CvOfflineSource(Source):
             self.capture.release()
 
         self.route_frame = None
-        cv2.destroyAllWindows()
         super().release()
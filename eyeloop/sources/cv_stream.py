@@ -9,6 +9,7 @@ import numpy as np
 
 import eyeloop.config as config
 from eyeloop.sources.source import Source
+from eyeloop.utilities.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
@@ -57,13 +58,6 @@ class CvStreamSource(Source):
             else:
                 break
 
-    def proceed(self, image) -> None:
-        image = self.resize(image)
-        self.rotate_(image, self.angle)
-        self.on_frame(image)
-        self.save_(image)
-        self.frame += 1
-
     def route_frame(self) -> None:
         """
         Routes the capture frame to:
@@ -71,8 +65,11 @@ class CvStreamSource(Source):
         2: frame save for offline processing
         """
 
+        start = profiler.start()
         _, image = self.capture.read()
+        self.capture_time = time.perf_counter()
         image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        profiler.stop("capture", start)
         self.proceed(image)
 
     def release(self) -> None:
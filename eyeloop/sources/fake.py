@@ -0,0 +1,54 @@
+import time
+
+import cv2
+import numpy as np
+
+from eyeloop.sources.source import Source
+
+FAKE_SIZE = (640, 480)
+FAKE_PUPIL = {"center": (320, 240), "axes": (60, 45), "angle": 20}
+FAKE_CR = {"center": (340, 230), "radius": 6}
+
+
+def fake_eye(size: tuple = FAKE_SIZE) -> np.ndarray:
+    """
+    A static grayscale eye: dark elliptic pupil with one bright corneal reflection.
+    """
+    width, height = size
+    image = np.full((height, width), 180, dtype=np.uint8)
+    cv2.ellipse(image, FAKE_PUPIL["center"], FAKE_PUPIL["axes"], FAKE_PUPIL["angle"], 0, 360, 30, -1)
+    cv2.circle(image, FAKE_CR["center"], FAKE_CR["radius"], 250, -1)
+    return image
+
+
+class FakeSource(Source):
+    """
+    Emits n_frames copies of an image (by default fake_eye()) at fps (0 = as fast as possible),
+    stamping each with its capture time. Makes engine runs and latency measurements reproducible without a camera.
+    """
+
+    def __init__(self, on_frame = None, n_frames: int = 100, fps: float = 0, image: np.ndarray = None) -> None:
+        super().__init__(on_frame)
+        self.n_frames = n_frames
+        self.fps = fps
+        self.image = fake_eye() if image is None else image
+
+    def init(self) -> None:
+        height, width = self.image.shape[:2]
+        return (width, height), self.image
+
+    def route(self) -> None:
+        period = 1 / self.fps if self.fps > 0 else 0
+        deadline = time.perf_counter()
+
+        while self.frame < self.n_frames:
+            if period:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            self.capture_time = time.perf_counter()
+            self.proceed(self.image.copy())
+
+        self.release()
@@ -0,0 +1,102 @@
+import logging
+import time
+
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.sources.source import Source
+from eyeloop.utilities.frame_store import RawFrameStore
+from eyeloop.utilities.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class RawSource(Source):
+    """
+    Replays a raw frame stack (--save_format raw) from a memory map, without decoding.
+    Frames keep their recorded frame numbers; first/last select a range of them, as for ChunkSource.
+    """
+
+    def __init__(self, on_frame = None, first: int = None, last: int = None) -> None:
+        super().__init__(on_frame)
+        self.first = first
+        self.last = last
+        self.store = None
+        self.position = 0
+        self.playback = config.arguments.playback
+
+    def init(self) -> None:
+        self.store = RawFrameStore(config.arguments.video)
+        self.fps = self.store.fps()
+        logger.info(f"Raw frame stack: {len(self.store)} frames at {self.fps:.1f} fps")
+
+        self.seek(self.store.first if self.first is None else self.first)
+        if self.position == len(self.store):
+            raise ValueError(f"No frame {self.first} in {self.store.path}")
+        image = self.store.frames[self.position]
+        self.media_time = self.recorded_time()
+
+        height, width = image.shape[:2]
+        return (width, height), image
+
+    def seek(self, frame: int) -> None:
+        """
+        Continues playback from the given frame number, or the next recorded frame if it was dropped.
+        """
+        try:
+            self.position = self.store.position(frame)
+        except KeyError:
+            self.position = int(np.searchsorted(self.store.frame_numbers, frame))
+        self.frame = frame
+
+    def recorded_time(self) -> float:
+        """
+        Capture time of the current frame in the recording, relative to its first frame.
+        """
+        return float(self.store.times[self.position] - self.store.times[0])
+
+    def route(self) -> None:
+        """
+        Plays the stack back at --playback times its recorded frame rate (0 = as fast as possible).
+        """
+        period = 1 / (self.fps * self.playback) if self.playback > 0 and self.fps > 0 else 0
+        deadline = time.perf_counter()
+
+        while self.store is not None and self.position < len(self.store):
+            self.frame = int(self.store.frame_numbers[self.position])
+            if self.last is not None and self.frame >= self.last:
+                break
+
+            if period:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    deadline = time.perf_counter()
+
+            self.capture_time = time.perf_counter()
+            self.media_time = self.recorded_time()
+            self.proceed(self.store.frames[self.position])
+            self.position += 1
+
+        logger.info("No more frames to process, exiting.")
+        self.release()
+
+    def proceed(self, image) -> None:
+        start = profiler.start()
+        image = self.resize(image)
+        if self.angle != 0:
+            image = image.copy()  # memory-mapped frames are read-only
+        self.rotate_(image, self.angle)
+        profiler.stop("resize_rotate", start)
+
+        self.on_frame(image)
+
+        start = profiler.start()
+        self.save_(image)
+        profiler.stop("save", start)
+
+    def release(self) -> None:
+        self.store = None
+        super().release()
@@ -3,6 +3,7 @@ import numpy as np
 
 import eyeloop.config as config
 from eyeloop.utilities.general_operations import tuple_int
+from eyeloop.utilities.profiler import profiler
 
 
 class Source:
@@ -11,6 +12,8 @@ class Source:
         self.scale = config.arguments.scale
 
         self.frame = 0
+        self.capture_time = 0.  # time.perf_counter() when the current frame was acquired
+        self.media_time = None  # position of the current frame in its recording (s); None for live sources
         self.vid_path = config.arguments.video
         self.capture = None
         self.angle = 0
@@ -59,8 +62,22 @@ class Source:
 
         return cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_NEAREST)
 
+    def proceed(self, image: np.ndarray) -> None:
+        start = profiler.start()
+        image = self.resize(image)
+        self.rotate_(image, self.angle)
+        profiler.stop("resize_rotate", start)
+
+        self.on_frame(image)
+
+        start = profiler.start()
+        self.save_(image)
+        profiler.stop("save", start)
+        self.frame += 1
+
     def save(self, image: np.ndarray) -> None:
         config.file_manager.save_image(image, self.frame)
 
     def release(self):
+        config.file_manager.release()
         self.release = lambda:None
@@ -0,0 +1,388 @@
+import logging
+import os
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.sources.source import Source
+from eyeloop.utilities.accuracy import save_tracks
+from eyeloop.utilities.profiler import profiler
+from eyeloop.utilities.ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_FPS = 120  # frame rate of the eye's motion when --synthetic gives none
+SYNTHETIC_LEVELS = {"background": 185, "iris": 110, "pupil": 25, "cr": 255, "lid": 205}  # at unit illumination
+# corneal reflection centers relative to the pupil center at the primary position, in units of the pupil radius
+# (one per LED, n_crs takes the first ones)
+CR_LAYOUT = ((.45, -.25), (-.45, -.25), (.45, .25), (-.45, .25), (0., -.55), (0., .55), (.75, 0.), (-.75, 0.))
+BATCH_PIXELS = 8 << 20  # frames are rendered in batches of about this many pixels (at most 64 frames)
+
+
+def parse_synthetic(spec: str) -> dict:
+    """
+    "WIDTHxHEIGHT[@FPS]", e.g. "1920x1080@1000", as SyntheticEye keyword arguments.
+    """
+    match = re.fullmatch(r"(\d+)x(\d+)(?:@(\d+(?:\.\d*)?))?", spec.strip())
+    if match is None:
+        raise ValueError(f"--synthetic {spec}: expected WIDTHxHEIGHT[@FPS], e.g. 1920x1080@1000")
+    width, height, fps = match.groups()
+    return {"size": (int(width), int(height)), "fps": float(fps) if fps else SYNTHETIC_FPS}
+
+
+def minimum_jerk(tau: np.ndarray) -> np.ndarray:
+    return tau ** 3 * (10 - 15 * tau + 6 * tau ** 2)
+
+
+def ellipse_coverage(centers: np.ndarray, axes: np.ndarray, angles: np.ndarray, origins: np.ndarray,
+                     side: int) -> np.ndarray:
+    """
+    Anti-aliased coverage (0-1) of n ellipses, each on a side x side patch with the given top-left pixel origin.
+    The signed distance to the edge is approximated to first order, exact on the edge itself.
+    Returns (n, side, side) float32.
+    """
+    grid = np.arange(side, dtype=np.float32)
+    x = grid[None, None, :] + (origins[:, 0] - centers[:, 0]).astype(np.float32)[:, None, None]
+    y = grid[None, :, None] + (origins[:, 1] - centers[:, 1]).astype(np.float32)[:, None, None]
+
+    radians = np.radians(angles).astype(np.float32)[:, None, None]
+    cos, sin = np.cos(radians), np.sin(radians)
+    a, b = (axes.astype(np.float32)[:, i, None, None] for i in range(2))
+
+    # normalized coordinates along the axes; the rotation is applied to the rows and columns before broadcasting
+    u = x * (cos / a) + y * (sin / a)
+    v = y * (cos / b) - x * (sin / b)
+    u *= u
+    v *= v
+    gradient = u / (a * a)  # |grad(u^2 + v^2)|^2 / 4
+    gradient += v / (b * b)
+    np.sqrt(gradient, out=gradient)
+    gradient *= 2
+    np.maximum(gradient, 1e-6, out=gradient)
+
+    distance = u
+    distance += v
+    distance -= 1
+    distance /= gradient
+    np.subtract(.5, distance, out=distance)
+    return np.clip(distance, 0, 1, out=distance)
+
+
+def circle_coverage(centers: np.ndarray, radius: float, origins: np.ndarray, side: int) -> np.ndarray:
+    grid = np.arange(side, dtype=np.float32)
+    x = grid[None, None, :] + (origins[:, 0] - centers[:, 0]).astype(np.float32)[:, None, None]
+    y = grid[None, :, None] + (origins[:, 1] - centers[:, 1]).astype(np.float32)[:, None, None]
+    return np.clip(.5 + radius - np.sqrt(x * x + y * y), 0, 1)
+
+
+class SyntheticEye:
+    """
+    Procedurally rendered eye video with known ground truth: a dark elliptic pupil inside a darker iris,
+    foreshortened as the eye turns, one or two corneal reflections, saccades between fixations, blinks
+    (a lid sweeping down), sensor noise and slow illumination drift.
+    Every frame is a deterministic function of the seed and its frame number.
+    """
+
+    def __init__(self, size: tuple = (640, 480), fps: float = SYNTHETIC_FPS, n_crs: int = 1, seed: int = 0,
+                 noise: float = 4., drift: float = .1, pupil_radius: float = None, saccade_rate: float = 2.,
+                 blink_rate: float = .25) -> None:
+        self.width, self.height = size
+        self.fps = fps
+        if n_crs > len(CR_LAYOUT):
+            raise ValueError(f"At most {len(CR_LAYOUT)} corneal reflections can be rendered.")
+        self.n_crs = n_crs
+        self.drift = drift
+        self.saccade_rate = saccade_rate
+        self.blink_rate = blink_rate
+
+        # geometry in units of the pupil radius, around the frame center
+        self.radius = min(45., min(size) * .09) if pupil_radius is None else pupil_radius
+        self.iris_radius = 2.4 * self.radius
+        self.gaze_range = 1.3 * self.radius  # largest pupil displacement from the primary position
+        self.eye_radius = 3.5 * self.radius  # sets the foreshortening of pupil and iris off-axis
+        self.cr_radius = max(2., .13 * self.radius)
+        self.cr_offsets = np.array(CR_LAYOUT[:n_crs]).reshape(n_crs, 2) * self.radius
+        self.center = np.array(((self.width - 1) / 2, (self.height - 1) / 2))
+
+        if self.iris_radius + self.gaze_range * 1.1 + 4 > min(size) / 2:
+            raise ValueError(f"A {self.radius:.0f} px pupil does not fit a {self.width}x{self.height} frame.")
+
+        # patch sides: the iris and pupil at their largest, a corneal reflection
+        self.iris_side = 2 * int(np.ceil(self.iris_radius * 1.15)) + 4
+        self.pupil_side = 2 * int(np.ceil(self.radius * 1.15)) + 4
+        self.cr_side = 2 * int(np.ceil(self.cr_radius)) + 4
+        self.iris_mask = np.zeros((self.iris_side, self.iris_side), dtype=np.uint8)
+
+        # Sensor noise: frames are windows at shifting offsets into one noisy background buffer.
+        rng = np.random.default_rng([seed, 0])
+        self.span = max(self.width * self.height // 4, 1)
+        background = rng.normal(SYNTHETIC_LEVELS["background"], noise, self.width * self.height + self.span)
+        self.noise = np.clip(background.round(), 0, 255).astype(np.uint8)
+
+        # saccades: fixation k lasts until onset k, then the eye moves to fixation k + 1
+        self.saccade_rng = np.random.default_rng([seed, 1])
+        self.fixations, self.saccade_onsets, self.saccade_durations = [(0., 0.)], [], []
+        self.blink_rng = np.random.default_rng([seed, 2])
+        self.blink_onsets, self.blink_durations = [], []
+
+    def draw_events(self, end: float) -> None:
+        """
+        Extends the saccade and blink trains past end (seconds). Each train draws from its own generator,
+        so the events do not depend on how frames are batched.
+        """
+        while not self.saccade_onsets or self.saccade_onsets[-1] < end:
+            last = self.saccade_onsets[-1] + self.saccade_durations[-1] if self.saccade_onsets else 0.
+            distance = self.gaze_range * np.sqrt(self.saccade_rng.random())
+            direction = self.saccade_rng.random() * 2 * np.pi
+            target = (distance * np.cos(direction), distance * np.sin(direction))
+            amplitude = np.hypot(target[0] - self.fixations[-1][0], target[1] - self.fixations[-1][1])
+
+            self.saccade_onsets.append(last + .15 + self.saccade_rng.exponential(1 / self.saccade_rate))
+            self.saccade_durations.append(.02 + .03 * amplitude / self.gaze_range)
+            self.fixations.append(target)
+
+        while not self.blink_onsets or self.blink_onsets[-1] < end:
+            last = self.blink_onsets[-1] + self.blink_durations[-1] if self.blink_onsets else 0.
+            self.blink_onsets.append(last + .5 + self.blink_rng.exponential(1 / self.blink_rate))
+            self.blink_durations.append(.15 + .15 * self.blink_rng.random())
+
+    def state(self, frames: np.ndarray) -> dict:
+        """
+        Vectorized scene parameters of the given frame numbers.
+        """
+        t = frames / self.fps
+        self.draw_events(t[-1])
+
+        # gaze: minimum-jerk saccades plus a slow fixational drift
+        onsets, durations = np.array(self.saccade_onsets), np.array(self.saccade_durations)
+        fixations = np.array(self.fixations)
+        i = np.searchsorted(onsets, t, side="right") - 1
+        j = np.maximum(i, 0)
+        tau = np.where(i < 0, 0, np.clip((t - onsets[j]) / durations[j], 0, 1))
+        start = np.where(i[:, None] < 0, fixations[0], fixations[j])
+        gaze = start + (fixations[j + 1] - start) * np.where(i < 0, 0, minimum_jerk(tau))[:, None]
+        gaze += self.radius * .04 * np.stack((np.sin(2 * np.pi * .31 * t) + .5 * np.sin(2 * np.pi * 1.7 * t),
+                                              np.sin(2 * np.pi * .23 * t) + .5 * np.sin(2 * np.pi * 1.3 * t)), axis=1)
+
+        # pupil and iris appear shortened along the direction the eye turns to
+        eccentricity = np.linalg.norm(gaze, axis=1)
+        foreshortening = np.sqrt(1 - (eccentricity / self.eye_radius) ** 2)
+        angle = (np.degrees(np.arctan2(gaze[:, 1], gaze[:, 0])) + 90) % 180
+        radius = self.radius * (1 + .1 * np.sin(2 * np.pi * t / 6.3) + .04 * np.sin(2 * np.pi * t / 1.7 + 1))
+        center = self.center + gaze
+
+        # blinks: the lid closes within 30% of the blink, stays shut and reopens over the last half
+        onsets, durations = np.array(self.blink_onsets), np.array(self.blink_durations)
+        i = np.searchsorted(onsets, t, side="right") - 1
+        tau = np.where(i < 0, -1, (t - onsets[np.maximum(i, 0)]) / durations[np.maximum(i, 0)])
+        closure = np.clip(np.minimum(tau / .3, (1 - tau) / .5), 0, 1)
+
+        return {
+            "pupil": np.column_stack((center, radius, radius * foreshortening, angle)),
+            "iris": np.column_stack((center, np.full_like(radius, self.iris_radius),
+                                     self.iris_radius * foreshortening, angle)),
+            "crs": self.center + self.cr_offsets[None] + .45 * gaze[:, None],
+            "lid": np.round(closure * self.height).astype(int),
+            "gain": 1 + self.drift * np.sin(2 * np.pi * t / 23.),
+        }
+
+    def truth(self, state: dict) -> dict:
+        """
+        Ground truth in the track format of eyeloop.utilities.accuracy: pupil [x, y, width, height, angle]
+        (semi-axes, width along angle in degrees), cr_i [x, y, radius] and blink flags. A shape is NaN where
+        the lid covers its center, and the lid covering the pupil center counts as a blink.
+        """
+        pupil = state["pupil"].copy()
+        blink = state["lid"] > pupil[:, 1]
+        pupil[blink] = np.nan
+
+        tracks = {"pupil": pupil, "blink": blink, "gain": state["gain"]}
+        for i in range(self.n_crs):
+            cr = np.column_stack((state["crs"][:, i], np.full(len(blink), self.cr_radius)))
+            cr[state["lid"] > cr[:, 1]] = np.nan
+            tracks[f"cr_{i}"] = cr
+        return tracks
+
+    def render(self, first: int, n: int) -> tuple:
+        """
+        Renders frames first..first + n - 1. Shape edges are computed for the whole batch at once;
+        each frame then takes one pass over its pixels plus patch updates.
+        Returns the (n, height, width) uint8 frames and their ground truth.
+        """
+        frames = np.arange(first, first + n)
+        state = self.state(frames)
+        gain = state["gain"]
+        levels = SYNTHETIC_LEVELS
+
+        pupil = state["pupil"]
+        pupil_origins = np.round(pupil[:, :2]).astype(int) - self.pupil_side // 2
+        darken = ellipse_coverage(pupil[:, :2], pupil[:, 2:4], pupil[:, 4], pupil_origins, self.pupil_side)
+        darken *= ((levels["iris"] - levels["pupil"]) * gain).astype(np.float32)[:, None, None]
+        darken = darken.round().astype(np.uint8)
+
+        crs = state["crs"].reshape(-1, 2)
+        cr_origins = np.round(crs).astype(int) - self.cr_side // 2
+        brighten = circle_coverage(crs, self.cr_radius, cr_origins, self.cr_side) * levels["cr"]
+        brighten = brighten.round().astype(np.uint8).reshape(n, self.n_crs, self.cr_side, self.cr_side)
+        cr_origins = cr_origins.reshape(n, self.n_crs, 2)
+
+        iris = state["iris"]
+        iris_origins = np.round(iris[:, :2]).astype(int) - self.iris_side // 2
+
+        images = np.empty((n, self.height, self.width), dtype=np.uint8)
+        pixels = self.width * self.height
+        for k in range(n):
+            image = images[k]
+            offset = frames[k] * 7919 % self.span
+            noise = self.noise[offset:offset + pixels].reshape(self.height, self.width)
+            cv2.convertScaleAbs(noise, dst=image, alpha=gain[k])
+
+            self.iris_mask[:] = 0
+            x, y = iris_origins[k]
+            cv2.ellipse(self.iris_mask, tuple(np.round((iris[k, :2] - (x, y)) * 16).astype(int)),
+                        tuple(np.round(iris[k, 2:4] * 16).astype(int)), iris[k, 4], 0, 360,
+                        int(round((levels["background"] - levels["iris"]) * gain[k])), -1, cv2.LINE_AA, 4)
+            subtract(image[y:y + self.iris_side, x:x + self.iris_side], self.iris_mask)
+
+            x, y = pupil_origins[k]
+            subtract(image[y:y + self.pupil_side, x:x + self.pupil_side], darken[k])
+
+            for i in range(self.n_crs):
+                x, y = cr_origins[k, i]
+                patch = image[y:y + self.cr_side, x:x + self.cr_side]
+                patch += np.minimum(255 - patch, brighten[k, i])
+
+            lid = state["lid"][k]
+            if lid > 0:
+                cv2.convertScaleAbs(noise[:lid], dst=image[:lid], alpha=gain[k],
+                                    beta=(levels["lid"] - levels["background"]) * gain[k])
+
+        return images, self.truth(state)
+
+    def params(self, n_crs: int = 2) -> dict:
+        """
+        Tracking parameters as saved by the engine (params_*.npy), seeded with the centers of frame 0:
+        thresholds halfway between the gray levels on either side of each edge. Corneal reflection processors
+        beyond the rendered reflections get no center.
+        """
+        levels = SYNTHETIC_LEVELS
+        state = self.state(np.zeros(1))
+        params = {"pupil": [(levels["pupil"] + levels["iris"]) / 2, [3, 3],
+                            tuple(int(round(v)) for v in state["pupil"][0, :2])]}
+        for i in range(n_crs):
+            center = tuple(int(round(v)) for v in state["crs"][0, i]) if i < self.n_crs else -1
+            params[f"cr_{i}"] = [(levels["lid"] + levels["cr"]) / 2, [3, 3], center]
+        return params
+
+
+def subtract(patch: np.ndarray, amount: np.ndarray) -> None:
+    patch -= np.minimum(patch, amount)
+
+
+class SyntheticSource(Source):
+    """
+    Renders a SyntheticEye instead of reading a camera or video (--synthetic WIDTHxHEIGHT@FPS): n_frames frames
+    (None = until released), played at --playback times the eye's frame rate (0 = as fast as possible).
+    On machines with more than one core, batches are rendered ahead on their own thread, overlapping tracking.
+    The ground truth of the emitted frames is saved as synthetic_truth.npz in the trial folder on release.
+    """
+
+    def __init__(self, on_frame = None, eye: SyntheticEye = None, n_frames: int = None) -> None:
+        super().__init__(on_frame)
+        if eye is None:
+            eye = SyntheticEye(**parse_synthetic(config.arguments.synthetic), n_crs=config.arguments.crs)
+        self.eye = eye
+        self.n_frames = n_frames
+        self.playback = config.arguments.playback
+        self.batch = max(1, min(64, BATCH_PIXELS // (self.eye.width * self.eye.height)))
+        self.batches = RingBuffer(2)
+        self.thread = None
+        self.truths = []
+
+    def init(self) -> None:
+        images, _ = self.eye.render(0, 1)
+        logger.info(f"Synthetic eye: {self.eye.width}x{self.eye.height} at {self.eye.fps:g} fps")
+        return (self.eye.width, self.eye.height), images[0]
+
+    def render_batches(self, eye: SyntheticEye):
+        first = 0
+        while self.n_frames is None or first < self.n_frames:
+            n = self.batch if self.n_frames is None else min(self.batch, self.n_frames - first)
+            yield eye.render(first, n)
+            first += n
+
+    def render_loop(self, eye: SyntheticEye) -> None:
+        for batch in self.render_batches(eye):
+            if not self.batches.put(batch):
+                return
+        self.batches.close()
+
+    def rendered(self):
+        """
+        Yields (images, truth) batches; with a core to spare, they are rendered ahead on their own thread.
+        """
+        if (os.cpu_count() or 1) == 1:
+            yield from self.render_batches(self.eye)
+            return
+
+        self.thread = threading.Thread(target=self.render_loop, args=(self.eye,), name="eyeloop-synthetic", daemon=True)
+        self.thread.start()
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            yield batch
+
+    def route(self) -> None:
+        period = 1 / (self.eye.fps * self.playback) if self.playback > 0 else 0
+        deadline = time.perf_counter()
+
+        batches = self.rendered()
+        while self.eye is not None:
+            start = profiler.start()
+            batch = next(batches, None)
+            profiler.stop("capture", start)
+            if batch is None:
+                break
+
+            images, truth = batch
+            self.truths.append(truth)
+            for image in images:
+                if self.eye is None:
+                    break
+
+                if period:
+                    deadline += period
+                    delay = deadline - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        deadline = time.perf_counter()
+
+                self.capture_time = time.perf_counter()
+                self.proceed(image)
+
+        self.release()
+
+    def ground_truth(self) -> dict:
+        """
+        Ground truth of every frame emitted so far, see SyntheticEye.truth.
+        """
+        if not self.truths:
+            return {}
+        return {key: np.concatenate([truth[key] for truth in self.truths])[:self.frame] for key in self.truths[0]}
+
+    def release(self) -> None:
+        self.eye = None
+        self.batches.close()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+        truth = self.ground_truth()
+        if truth:
+            save_tracks(f"{config.file_manager.new_folderpath}/synthetic_truth.npz", truth)
+        super().release()
@@ -38,6 +38,7 @@ class VimbaSource(Source):
         """
 
         image = frame.buffer_data_numpy()
+        self.capture_time = time.perf_counter()
 
         # image = cv2.cvtColor(image,cv2.COLOR_GRAY2RGB)
 
@@ -50,6 +51,7 @@ class VimbaSource(Source):
 
     def release(self) -> None:
         self.live = False
+        super().release()
 
     def route(self) -> None:
         self.first_frame()
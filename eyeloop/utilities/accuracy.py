@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+# Largest deviation (p99 over frames fitted in both runs) and share of frames with disagreeing fits/blinks
+# that still count as tracking the same.
+TOLERANCES = {
+    "pupil_center": .5,  # px
+    "pupil_axes": .5,    # px
+    "cr_center": .5,     # px
+    "fit_mismatch": .01,
+    "blink_mismatch": 0.,
+}
+
+
+def track_arrays(records: list, n_crs: int = 1) -> dict:
+    """
+    Per-frame arrays from datalog records: pupil [x, y, width, height, angle] and cr_i [x, y, radius]
+    (NaN without a fit), and blink flags.
+    """
+    n = len(records)
+    tracks = {"pupil": np.full((n, 5), np.nan), "blink": np.zeros(n, dtype=bool)}
+    for i in range(n_crs):
+        tracks[f"cr_{i}"] = np.full((n, 3), np.nan)
+
+    for frame, record in enumerate(records):
+        tracks["blink"][frame] = bool(record.get("blink"))
+        if record.get("pupil"):
+            center, width, height, angle = record["pupil"]
+            tracks["pupil"][frame] = center[0], center[1], width, height, angle
+        for i in range(n_crs):
+            if record.get(f"cr_{i}"):
+                center, radius, _, _ = record[f"cr_{i}"]
+                tracks[f"cr_{i}"][frame] = center[0], center[1], radius
+    return tracks
+
+
+def save_tracks(path: Union[Path, str], tracks: dict) -> None:
+    np.savez_compressed(path, **tracks)
+
+
+def load_tracks(path: Union[Path, str]) -> dict:
+    with np.load(path) as reference:
+        return {key: reference[key] for key in reference.files}
+
+
+def compare_tracks(reference: dict, tracks: dict, tolerances: dict = TOLERANCES) -> dict:
+    """
+    Frame-by-frame agreement of two runs on the same frames.
+    Deviations of the pupil and every corneal reflection tracked by both runs are reported as p99 and max over the
+    frames fitted in both runs (in px); mismatches as the share of frames where only one run has a fit (or a blink).
+    "passed" is False if a p99 deviation or a mismatch share exceeds its tolerance.
+    """
+    n = min(len(reference["blink"]), len(tracks["blink"]))
+    report = {"frames": n, "frame_count_match": len(reference["blink"]) == len(tracks["blink"])}
+
+    blink = reference["blink"][:n] != tracks["blink"][:n]
+    report["blink_mismatch"] = blink.mean()
+
+    crs = sorted((key for key in reference if key.startswith("cr_") and key in tracks), key=lambda key: int(key[3:]))
+    mismatches = []
+    for key in ["pupil"] + crs:
+        if key not in reference or key not in tracks:
+            continue
+        old, new = reference[key][:n], tracks[key][:n]
+        fitted_old, fitted_new = ~np.isnan(old[:, 0]), ~np.isnan(new[:, 0])
+        both = fitted_old & fitted_new
+        mismatches.append((fitted_old != fitted_new).mean())
+
+        center = np.linalg.norm(old[both, :2] - new[both, :2], axis=1)
+        report[f"{key}_center"] = stats(center)
+        if key == "pupil":
+            # ellipse axes may swap along with a 90 degree rotation
+            axes = np.abs(np.sort(old[both, 2:4], axis=1) - np.sort(new[both, 2:4], axis=1)).max(axis=1)
+            report["pupil_axes"] = stats(axes)
+
+    report["fit_mismatch"] = max(mismatches) if mismatches else 0.
+
+    failed = []
+    for key, value in report.items():
+        limit = tolerances.get("cr_center" if key.startswith("cr_") else key)  # cr_center applies to every cr_i
+        if limit is not None and (value["p99"] if isinstance(value, dict) else value) > limit:
+            failed.append(key)
+    report["failed"] = failed
+    report["passed"] = report["frame_count_match"] and not failed
+    return report
+
+
+def stats(deviations: np.ndarray) -> dict:
+    if len(deviations) == 0:
+        return {"n": 0, "p99": 0., "max": 0.}
+    return {"n": len(deviations), "p99": float(np.percentile(deviations, 99)), "max": float(deviations.max())}
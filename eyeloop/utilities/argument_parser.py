@@ -1,9 +1,12 @@
 import argparse
 from pathlib import Path
 
+from eyeloop.constants.processor_constants import pupil_rays
+
 EYELOOP_DIR = Path(__file__).parent.parent
 PROJECT_DIR = EYELOOP_DIR.parent
 DEFAULT_FPS = 100
+DEFAULT_PLAYBACK = 0.5
 
 
 class Arguments:
@@ -20,6 +23,12 @@ class Arguments:
         self.scale = None
         self.tracking = None
         self.model = None
+        self.rays = None
+        self.roi = None
+        self.subpixel = None
+        self.synthetic = None
+        self.motion = None
+        self.crs = None
 
         self.parsed_args = self.parse_args(args)
         self.build_config(parsed_args=self.parsed_args)
@@ -51,18 +60,62 @@ class Arguments:
         parser.add_argument("-x", "--extractors", default="", type=str,
                             help="Set file-path of extractor Python file. p = start file prompt.")
 
+        parser.add_argument("--chunk_size", default=1000, type=int,
+                            help="Batch mode: frames per worker chunk (default = 1000)")
         parser.add_argument("--clear", default=0, type=float,
                             help="Clear parameters (yes/no, 1/0) - default = 0")
+        parser.add_argument("--codec", default="FFV1", type=str,
+                            help="FourCC codec of saved videos, see --save_format (default = FFV1, lossless)")
+        parser.add_argument("--crs", default=2, type=int,
+                            help="Number of corneal reflections (glints) tracked (default = 2)")
+        parser.add_argument("--datalog", default="json", type=str, choices=["json", "npy"],
+                            help="Datalog format (json = one line per frame/default; npy = chunked binary columns)")
+        parser.add_argument("--drop_policy", default="block", type=str, choices=["block", "oldest", "newest"],
+                            help="Pipeline/frame writer behaviour when a stage falls behind (block = backpressure/default; oldest/newest = drop)")
+        parser.add_argument("--headless", default=0, type=int,
+                            help="Track without any windows, seeded by --params (yes/no, 1/0; default = 0)")
         parser.add_argument("--img_format", default="frame_$.jpg", type=str,
                             help="Set img format for import (default: frame_$.jpg where $ = 1, 2,...)")
+        parser.add_argument("--latency", default=0, type=int,
+                            help="Save the frame-to-output latency of every extractor to latency.json (yes/no, 1/0; default = 0)")
         parser.add_argument("--markers", default=0, type=int,
                             help="Enable/disable artifact removing markers (0: disable/default; 1: enable)")
+        parser.add_argument("--motion", default=0, type=int,
+                            help="Seed tracking with centers predicted from pupil/cr velocity (yes/no, 1/0; default = 0)")
+        parser.add_argument("--overlap", default=30, type=int,
+                            help="Batch mode: warm-start frames tracked before each chunk (default = 30)")
+        parser.add_argument("--pipeline", default=0, type=int,
+                            help="Run capture, tracking, logging and saving on separate threads (yes/no, 1/0; default = 0)")
+        parser.add_argument("--playback", default=DEFAULT_PLAYBACK, type=float,
+                            help=f"Offline playback speed relative to the recorded frame rate (0 = unthrottled; 1 = real-time; default = {DEFAULT_PLAYBACK})")
+        parser.add_argument("--preview", default="", type=str,
+                            help="Headless mode: write an annotated preview at --framerate to a video file or udp://host:port (default = none)")
+        parser.add_argument("--profile", default=0, type=float,
+                            help="Log per-stage latency histograms to profile.json every N seconds (default = 0, off)")
+        parser.add_argument("--quality", default=95, type=int,
+                            help="Quality of saved jpg frames and lossy video codecs (0-100; default = 95)")
+        parser.add_argument("--queue_size", default=8, type=int,
+                            help="Frames buffered between pipeline stages and before the frame writer (default = 8)")
+        parser.add_argument("--rays", default=pupil_rays, type=int,
+                            help=f"Number of walkout rays cast from the pupil center (default = {pupil_rays})")
+        parser.add_argument("--roi", default=0, type=int,
+                            help="Process only a window around the last pupil/cr fit (yes/no, 1/0; default = 0)")
         parser.add_argument("--save", default=1, type=int,
                             help="Save video feed or not (yes/no, 1/0; default = 1)")
+        parser.add_argument("--save_format", default="jpg", type=str, choices=["jpg", "video", "raw"],
+                            help="Saved frame format (jpg = image sequence/default; video = one video file, see --codec; raw = uncompressed frame stack)")
         parser.add_argument("--source", default="cv", type=str,
                             help="Set source stream (cv, vimba, ...)")
+        parser.add_argument("--subpixel", default=0, type=int,
+                            help="Refine walkout edges to sub-pixel precision on the blurred image (yes/no, 1/0; default = 0)")
+        parser.add_argument("--synthetic", default="", type=str,
+                            help="Track a rendered eye with known ground truth instead of a camera or --video: WIDTHxHEIGHT[@FPS], e.g. 1920x1080@1000 (default = none)")
         parser.add_argument("--tracking", default=1, type=int,
                             help="Enable/disable tracking (1/enabled: default).")
+        parser.add_argument("--tune_frames", default=100, type=int,
+                            help="Auto-tune mode: calibration frames from the start of the video (default = 100)")
+        parser.add_argument("--workers", default=0, type=int,
+                            help="Batch/auto-tune mode: number of worker processes (default = 0, one per CPU)")
 
 
         return parser.parse_args(args)
@@ -81,9 +134,31 @@ class Arguments:
         self.scale = parsed_args.scale
         self.tracking = parsed_args.tracking
         self.model = parsed_args.model.lower()
+        self.rays = parsed_args.rays
+        self.roi = parsed_args.roi
+        self.subpixel = parsed_args.subpixel
+        self.synthetic = parsed_args.synthetic
+        self.motion = parsed_args.motion
+        self.crs = parsed_args.crs
+        self.playback = parsed_args.playback
+        self.datalog = parsed_args.datalog
+        self.pipeline = parsed_args.pipeline
+        self.headless = parsed_args.headless
+        self.preview = parsed_args.preview
+        self.profile = parsed_args.profile
+        self.latency = parsed_args.latency
+        self.queue_size = parsed_args.queue_size
+        self.drop_policy = parsed_args.drop_policy
+        self.workers = parsed_args.workers
+        self.tune_frames = parsed_args.tune_frames
+        self.chunk_size = parsed_args.chunk_size
+        self.overlap = parsed_args.overlap
         self.extractors = parsed_args.extractors
         self.img_format = parsed_args.img_format
         self.save = parsed_args.save
+        self.save_format = parsed_args.save_format
+        self.quality = parsed_args.quality
+        self.codec = parsed_args.codec
         self.rotation = parsed_args.rotation
         self.fps = parsed_args.framerate
         self.clear = parsed_args.clear
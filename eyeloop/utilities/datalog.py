@@ -0,0 +1,147 @@
+import glob
+import json
+from pathlib import Path
+import queue
+import threading
+from typing import Union
+
+import numpy as np
+
+# Shape parameters per row: center_x, center_y, width, height, angle
+SHAPE_FIELDS = 5
+CHUNK_SIZE = 1000
+
+
+class JsonDatalog:
+    """
+    Text backend: one json.dumps(dataout) line per frame (datalog.json).
+    """
+
+    def __init__(self, output_dir: Union[Path, str], n_cr: int = None) -> None:
+        self.path = Path(output_dir, "datalog.json")
+        self.file = open(self.path, "a")
+
+    def write(self, dataout: dict, frame: int) -> None:
+        self.file.write(json.dumps(dataout) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class NpyDatalog:
+    """
+    Fixed-schema binary backend. Frames are packed into preallocated columns
+    (time, frame, blink, pupil (n, 5), cr (n, n_cr, 5); NaN = not tracked).
+    Every chunk_size frames the columns are handed to a background thread,
+    which appends them to the output folder as datalog_<chunk>.npz.
+    """
+
+    def __init__(self, output_dir: Union[Path, str], n_cr: int, chunk_size: int = CHUNK_SIZE) -> None:
+        self.output_dir = Path(output_dir)
+        self.n_cr = n_cr
+        self.chunk_size = chunk_size
+        self.chunk_i = 0
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.flush_loop, name="eyeloop-datalog", daemon=True)
+        self.thread.start()
+
+        self.allocate()
+
+    def allocate(self) -> None:
+        self.row = 0
+        self.columns = {
+            "time": np.empty(self.chunk_size, dtype=np.float64),
+            "frame": np.empty(self.chunk_size, dtype=np.int64),
+            "blink": np.empty(self.chunk_size, dtype=np.uint8),
+            "pupil": np.empty((self.chunk_size, SHAPE_FIELDS), dtype=np.float64),
+            "cr": np.empty((self.chunk_size, self.n_cr, SHAPE_FIELDS), dtype=np.float64),
+        }
+
+    @staticmethod
+    def pack(params, out: np.ndarray) -> None:
+        try:
+            (center_x, center_y), width, height, angle = params
+            out[:] = center_x, center_y, width, height, angle
+        except (TypeError, ValueError):
+            out[:] = np.nan
+
+    def write(self, dataout: dict, frame: int) -> None:
+        row = self.row
+        columns = self.columns
+        columns["time"][row] = dataout.get("time", np.nan)
+        columns["frame"][row] = frame
+        columns["blink"][row] = dataout.get("blink", 0)
+        self.pack(dataout.get("pupil"), columns["pupil"][row])
+        for i in range(self.n_cr):
+            self.pack(dataout.get(f"cr_{i}"), columns["cr"][row, i])
+
+        self.row += 1
+        if self.row == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.row == 0:
+            return
+
+        self.queue.put((self.chunk_i, {key: column[:self.row] for key, column in self.columns.items()}))
+        self.chunk_i += 1
+        self.allocate()
+
+    def flush_loop(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            chunk_i, columns = item
+            np.savez(self.output_dir / f"datalog_{chunk_i:06d}.npz", **columns)
+
+    def close(self) -> None:
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+
+DATALOGS = {
+    "json": JsonDatalog,
+    "npy": NpyDatalog,
+}
+
+
+def load_datalog(output_dir: Union[Path, str]) -> dict:
+    """
+    Concatenates the datalog_*.npz chunks of a session into one dict of columns.
+    """
+    paths = sorted(glob.glob(str(Path(output_dir, "datalog_*.npz"))))
+    if not paths:
+        raise ValueError(f"No binary datalog chunks in {output_dir}")
+
+    chunks = [np.load(path) for path in paths]
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0].files}
+
+
+def export_json(output_dir: Union[Path, str], path: Union[Path, str] = None) -> Path:
+    """
+    Converts a binary datalog to the json-lines format of JsonDatalog.
+    """
+    columns = load_datalog(output_dir)
+    path = Path(output_dir, "datalog.json") if path is None else Path(path)
+
+    def unpack(row):
+        if np.isnan(row[0]):
+            return None
+        return [[row[0], row[1]], row[2], row[3], row[4]]
+
+    with open(path, "w") as file:
+        for i in range(len(columns["time"])):
+            dataout = {"time": columns["time"][i], "frame": int(columns["frame"][i])}
+            if columns["blink"][i]:
+                dataout["blink"] = 1
+            else:
+                dataout["pupil"] = unpack(columns["pupil"][i])
+                for j, cr in enumerate(columns["cr"][i]):
+                    dataout[f"cr_{j}"] = unpack(cr)
+            file.write(json.dumps(dataout) + "\n")
+
+    return path
@@ -1,3 +1,4 @@
+import logging
 import time
 from pathlib import Path
 from typing import Union
@@ -5,35 +6,73 @@ from typing import Union
 import cv2
 import numpy as np
 
+from eyeloop.utilities.frame_writer import AsyncFrameWriter, ImageSequenceWriter, RawStackWriter, VideoFrameWriter
+from eyeloop.utilities.ring_buffer import DropPolicy
+
+logger = logging.getLogger(__name__)
+
 
 class File_Manager:
     """
     The file manager...
-    - Generates a unique, time-stamped folder
+    - Generates a unique, time-stamped folder (or the given folder_name)
     which extractors may access via file_manager.new_folderpath.
     - Reads image sequences for offline analysis.
-    - Saves images from camera streams.
+    - Saves images from camera streams on a background writer thread,
+    as an image sequence (jpg), a video container (video) or a raw frame stack (raw).
     """
 
-    def __init__(self, output_root: Union[Path, str], img_format:str) -> None:
+    def __init__(self, output_root: Union[Path, str], img_format:str, save_format: str = "jpg", quality: int = 95,
+                 codec: str = "FFV1", queue_size: int = 8, drop_policy: str = "block", folder_name: str = None) -> None:
         self.output_root = output_root
         self.input_folderpath = ""
         self.img_format = img_format
 
+        self.save_format = save_format
+        self.quality = quality
+        self.codec = codec
+        self.queue_size = queue_size
+        self.drop_policy = DropPolicy(drop_policy)
+        self.fps = 30  # frame rate of saved videos, set by the source when known
+        self.writer = None  # started by the first save_image() call
+
 
         self.output_root.mkdir(exist_ok=True, parents=True)
 
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        self.new_folderpath = self.output_root / f"trial_{timestamp}"
+        if folder_name is None:
+            folder_name = f"trial_{time.strftime('%Y%m%d-%H%M%S')}"
+        self.new_folderpath = self.output_root / folder_name
         self.new_folderpath.mkdir(exist_ok=True)
         print(f"Outputting data to {self.new_folderpath}")  # TODO convert to logging call
 
+    def create_writer(self):
+        if self.save_format == "video":
+            return VideoFrameWriter(self.new_folderpath, self.codec, self.fps, self.quality)
+        elif self.save_format == "raw":
+            return RawStackWriter(self.new_folderpath)
+        return ImageSequenceWriter(self.new_folderpath, self.img_format, self.quality)
+
     def save_image(self, image: np.ndarray, frame: int) -> None:
         """
-        Saves video sequence to new folderpath.
+        Queues a copy of the frame for saving to new folderpath and returns immediately.
+        Raises once the writer has failed.
         """
-        img_pth = Path(self.new_folderpath, self.img_format.replace("$", str(frame), 1))
-        cv2.imwrite(str(img_pth), image)
+        if self.writer is None:
+            self.writer = AsyncFrameWriter(self.create_writer(), self.queue_size, self.drop_policy)
+
+        self.writer.put(image, frame, time.time())
+
+    def release(self) -> None:
+        """
+        Writes out all queued frames and closes the writer; raises if the writer failed.
+        """
+        if self.writer is None:
+            return
+
+        writer, self.writer = self.writer, None
+        writer.close()
+        if writer.dropped > 0:
+            logger.warning(f"frame writer dropped {writer.dropped} frame(s)")
 
     def read_image(self, frame: int) -> np.ndarray:
         """
@@ -47,4 +86,4 @@ class File_Manager:
         if image is None:
             raise ValueError("No more frames.")
 
-        return np.array(image)
+        return image
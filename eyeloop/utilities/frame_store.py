@@ -0,0 +1,75 @@
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from eyeloop.utilities.frame_writer import (RAW_FILENAME, RAW_HEADER, RAW_HEADER_SIZE, RAW_INDEX_DTYPE,
+                                            RAW_INDEX_FILENAME, RAW_MAGIC)
+
+
+def is_raw_stack(path: Union[Path, str]) -> bool:
+    path = Path(path)
+    return path.suffix == ".raw" and path.is_file() or Path(path, RAW_FILENAME).is_file()
+
+
+class RawFrameStore:
+    """
+    Read-only memory map of a raw frame stack written by RawStackWriter (--save_format raw).
+    Frames are returned as zero-copy views; lookup by frame number is O(1) for gap-free recordings.
+    """
+
+    def __init__(self, path: Union[Path, str]) -> None:
+        self.path = Path(path)
+        if self.path.is_dir():
+            self.path = self.path / RAW_FILENAME
+
+        with open(self.path, "rb") as file:
+            magic, height, width, channels = RAW_HEADER.unpack(file.read(RAW_HEADER.size))
+        if magic != RAW_MAGIC:
+            raise ValueError(f"{self.path} is not a raw frame stack")
+
+        self.shape = (height, width) if channels == 1 else (height, width, channels)
+        frame_size = height * width * channels
+
+        # An interrupted recording may end with a torn frame or index row; only complete pairs are kept.
+        index = np.fromfile(self.path.with_name(RAW_INDEX_FILENAME), dtype=RAW_INDEX_DTYPE)
+        n_frames = min((self.path.stat().st_size - RAW_HEADER_SIZE) // frame_size, len(index))
+        if n_frames == 0:
+            raise ValueError(f"{self.path} holds no frames")
+
+        self.index = index[:n_frames]
+        self.frames = np.memmap(self.path, dtype=np.uint8, mode="r", offset=RAW_HEADER_SIZE,
+                                shape=(n_frames,) + self.shape)
+
+        self.frame_numbers = self.index["frame"]
+        self.times = self.index["time"]
+        self.first = int(self.frame_numbers[0])
+        self.contiguous = int(self.frame_numbers[-1]) - self.first + 1 == n_frames
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def position(self, frame: int) -> int:
+        """
+        Position in the stack of the given frame number.
+        """
+        if self.contiguous:
+            position = frame - self.first
+        else:
+            position = int(np.searchsorted(self.frame_numbers, frame))
+
+        if not 0 <= position < len(self) or self.frame_numbers[position] != frame:
+            raise KeyError(f"Frame {frame} is not in {self.path}")
+        return position
+
+    def get_frame(self, frame: int) -> np.ndarray:
+        return self.frames[self.position(frame)]
+
+    def fps(self) -> float:
+        """
+        Recorded frame rate, estimated from the capture times (0 if unknown).
+        """
+        if len(self) < 2:
+            return 0
+        period = np.median(np.diff(self.times))
+        return 1 / period if period > 0 else 0
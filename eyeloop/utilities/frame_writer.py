@@ -0,0 +1,171 @@
+import logging
+from pathlib import Path
+import struct
+import threading
+from typing import Union
+
+import cv2
+import numpy as np
+
+from eyeloop.utilities.ring_buffer import DropPolicy, RingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Raw frame stack: fixed-size header, then contiguous uint8 frames; the index file holds one row per frame.
+RAW_MAGIC = b"EYELOOP1"
+RAW_HEADER = struct.Struct("<8sIII")  # magic, height, width, channels
+RAW_HEADER_SIZE = 64
+RAW_INDEX_DTYPE = np.dtype([("frame", "<i8"), ("time", "<f8")])
+RAW_FILENAME = "frames.raw"
+RAW_INDEX_FILENAME = "frames_index.bin"
+
+VIDEO_FILENAME = "frames.avi"
+WRITE_BATCH = 32
+
+
+class ImageSequenceWriter:
+    """
+    One image file per frame, named by img_format (frame_$.jpg: $ = frame number).
+    """
+
+    def __init__(self, output_dir: Union[Path, str], img_format: str, quality: int = 95) -> None:
+        self.output_dir = Path(output_dir)
+        self.img_format = img_format
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+    def write(self, image: np.ndarray, frame: int, timestamp: float) -> None:
+        img_pth = Path(self.output_dir, self.img_format.replace("$", str(frame), 1))
+        cv2.imwrite(str(img_pth), image, self.params)
+
+    def flush(self) -> None:
+        return
+
+    def close(self) -> None:
+        return
+
+
+class VideoFrameWriter:
+    """
+    A single video container (frames.avi). The default FFV1 codec is lossless;
+    quality is passed on to codecs that support it.
+    """
+
+    def __init__(self, output_dir: Union[Path, str], codec: str = "FFV1", fps: float = 30, quality: int = 95) -> None:
+        self.path = Path(output_dir, VIDEO_FILENAME)
+        self.codec = codec
+        self.fps = fps
+        self.quality = quality
+        self.video = None
+
+    def open(self, image: np.ndarray) -> None:
+        height, width = image.shape[:2]
+        self.video = cv2.VideoWriter(str(self.path), cv2.VideoWriter_fourcc(*self.codec), self.fps, (width, height),
+                                     image.ndim == 3)
+        if not self.video.isOpened():
+            raise ValueError(f"Failed to open a {self.codec} video writer at {self.path}")
+        self.video.set(cv2.VIDEOWRITER_PROP_QUALITY, self.quality)
+
+    def write(self, image: np.ndarray, frame: int, timestamp: float) -> None:
+        if self.video is None:
+            self.open(image)
+        self.video.write(image)
+
+    def flush(self) -> None:
+        return
+
+    def close(self) -> None:
+        if self.video is not None:
+            self.video.release()
+
+
+class RawStackWriter:
+    """
+    Uncompressed frame stack (frames.raw) that can be memory-mapped for replay,
+    plus an append-only index (frames_index.bin) of frame numbers and capture times.
+    """
+
+    def __init__(self, output_dir: Union[Path, str]) -> None:
+        self.path = Path(output_dir, RAW_FILENAME)
+        self.index_path = Path(output_dir, RAW_INDEX_FILENAME)
+        self.file = None
+        self.index = None
+        self.shape = None
+
+    def open(self, image: np.ndarray) -> None:
+        self.shape = image.shape
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+
+        self.file = open(self.path, "wb")
+        self.file.write(RAW_HEADER.pack(RAW_MAGIC, height, width, channels).ljust(RAW_HEADER_SIZE, b"\0"))
+        self.index = open(self.index_path, "wb")
+
+    def write(self, image: np.ndarray, frame: int, timestamp: float) -> None:
+        if self.file is None:
+            self.open(image)
+        elif image.shape != self.shape:
+            raise ValueError(f"Raw frame stack expects {self.shape} frames, got {image.shape}")
+
+        self.file.write(np.ascontiguousarray(image, dtype=np.uint8).data)
+        self.index.write(np.array((frame, timestamp), dtype=RAW_INDEX_DTYPE).tobytes())
+
+    def flush(self) -> None:
+        if self.file is not None:
+            self.file.flush()
+            self.index.flush()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+
+
+class AsyncFrameWriter:
+    """
+    Hands frames to a writer on a background thread through a bounded ring buffer,
+    so the capture loop never waits on disk I/O (unless the drop policy is block and the buffer is full).
+    Frames are written in batches of whatever has queued up since the last wake. Frames are copied when queued:
+    sources may reuse their buffers, and Source.proceed rotates in place.
+    If the writer fails (disk full, codec error), put() and close() raise, rather than dropping frames silently.
+    """
+
+    def __init__(self, writer, size: int = 8, policy: DropPolicy = DropPolicy.BLOCK) -> None:
+        self.writer = writer
+        self.buffer = RingBuffer(size, policy)
+        self.error = None
+
+        self.thread = threading.Thread(target=self.write_loop, name="eyeloop-frame-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def dropped(self) -> int:
+        return self.buffer.dropped
+
+    def put(self, image: np.ndarray, frame: int, timestamp: float) -> bool:
+        self.check()
+        return self.buffer.put((image.copy(), frame, timestamp))
+
+    def check(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"frame writer failed: {self.error!r}") from self.error
+
+    def write_loop(self) -> None:
+        try:
+            while True:
+                batch = self.buffer.get_batch(WRITE_BATCH)
+                if not batch:
+                    break
+
+                for image, frame, timestamp in batch:
+                    self.writer.write(image, frame, timestamp)
+                self.writer.flush()
+        except Exception as e:
+            logger.exception("frame writer failed: ")
+            self.error = e
+            self.buffer.close()
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.thread.join()
+        self.writer.close()
+        self.check()
@@ -0,0 +1,62 @@
+from array import array
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Union
+
+import numpy as np
+
+from eyeloop.utilities.profiler import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyRecorder:
+    """
+    Frame-to-output latency per extractor: the time from the capture of a frame (Source.capture_time)
+    until the extractor's fetch() for that frame returned, i.e., its output (stimulus, DAQ line, log) was issued.
+    Only the histograms are kept by default; with keep_samples (--latency 1) every sample is kept as well,
+    so the full distribution can be saved or inspected.
+    """
+
+    def __init__(self, keep_samples: bool = False) -> None:
+        self.keep_samples = keep_samples
+        self.histograms = {}
+        self.samples = {}
+
+    def issued(self, key: str, capture_time: float, issue_time: float = None) -> None:
+        if issue_time is None:
+            issue_time = time.perf_counter()
+        latency = issue_time - capture_time
+
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(key)
+            self.samples[key] = array("d")
+        histogram.add(latency)
+        if self.keep_samples:
+            self.samples[key].append(latency)
+
+    def latencies(self, key: str) -> np.ndarray:
+        """
+        All samples of an extractor, in seconds (empty without keep_samples).
+        A copy: a view would keep the sample buffer from growing.
+        """
+        return np.array(self.samples[key])
+
+    def summary(self) -> dict:
+        return {key: histogram.summary() for key, histogram in self.histograms.items()}
+
+    def save(self, path: Union[Path, str]) -> None:
+        """
+        Writes the summary (milliseconds) and the samples (seconds) of every extractor as json.
+        """
+        report = {key: dict(histogram.summary(), samples=self.latencies(key).tolist())
+                  for key, histogram in self.histograms.items()}
+        with open(path, "w") as file:
+            json.dump(report, file)
+
+    def log(self) -> None:
+        for histogram in self.histograms.values():
+            logger.info(f"frame-to-output latency {histogram}")
@@ -0,0 +1,78 @@
+from collections import deque
+from enum import Enum
+import threading
+
+
+class DropPolicy(Enum):
+    BLOCK = "block"     # backpressure: the producer waits for a free slot
+    OLDEST = "oldest"   # ring buffer: the oldest queued frame is overwritten
+    NEWEST = "newest"   # the incoming frame is discarded
+
+
+class RingBuffer:
+    """
+    Bounded, thread-safe frame queue between two pipeline stages (or a source and the frame writer).
+    get() returns None once the buffer is closed and drained.
+    """
+
+    def __init__(self, size: int, policy: DropPolicy = DropPolicy.BLOCK) -> None:
+        self.size = size
+        self.policy = policy
+        self.items = deque()
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, item) -> bool:
+        with self.condition:
+            if self.closed:
+                return False
+
+            if len(self.items) >= self.size:
+                if self.policy == DropPolicy.NEWEST:
+                    self.dropped += 1
+                    return False
+                elif self.policy == DropPolicy.OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self.items) >= self.size and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return False
+
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout: float = None):
+        """
+        Waits for the next item; returns None once closed and drained, or when nothing arrived within timeout seconds.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+
+            if not self.items:
+                return None
+
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def get_batch(self, limit: int) -> list:
+        """
+        Waits for at least one item and returns up to limit queued items; an empty list once closed and drained.
+        """
+        with self.condition:
+            while not self.items and not self.closed:
+                self.condition.wait()
+
+            batch = [self.items.popleft() for _ in range(min(limit, len(self.items)))]
+            self.condition.notify_all()
+            return batch
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
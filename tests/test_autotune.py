@@ -0,0 +1,52 @@
+# Unit tests for the threshold/blur auto-tuning
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+
+ARGS = ["--clear", "1"]
+
+
+def noisy_eyes(n, seed=0):
+    from eyeloop.sources.fake import fake_eye
+
+    rng = np.random.default_rng(seed)
+    eye = fake_eye().astype(np.int16)
+    frames = [np.clip(eye + rng.normal(0, 4, eye.shape), 0, 255).astype(np.uint8) for _ in range(n)]
+    return np.stack(frames)
+
+
+class TestAutotune:
+    def setup_method(self):
+        config.arguments = Arguments(ARGS)
+
+    def test_tune_synthetic_eye(self):
+        from eyeloop.engine.autotune import tune
+        from eyeloop.sources.fake import FAKE_CR, FAKE_PUPIL
+
+        frames = noisy_eyes(8)
+        params = tune(ARGS, frames, {"pupil": (315, 245), "cr_0": FAKE_CR["center"]})
+
+        # pupil is drawn at 30 on a 180 background, the cr at 250
+        threshold, blur, center = params["pupil"]
+        assert 30 < threshold < 180
+        assert blur[0] == blur[1] and blur[0] % 2 == 1
+        assert center == (315, 245)
+        assert 180 <= params["cr_0"][0] < 250
+
+    def test_blinks_are_excluded(self):
+        from eyeloop.engine.autotune import open_frames
+
+        frames = noisy_eyes(6)
+        frames[2:4] = 200  # closed lid
+        assert len(open_frames(frames)) == 4
+
+    def test_candidates_bracket_the_edge(self):
+        from eyeloop.engine.autotune import threshold_candidates
+
+        frames = noisy_eyes(2)
+        pupil = threshold_candidates(frames, "pupil")
+        cr = threshold_candidates(frames, "cr_0")
+
+        assert pupil.min() < 60 and pupil.max() <= 181
+        assert cr.min() >= 179 and cr.max() < 255
@@ -0,0 +1,56 @@
+# Batch tracking: chunks tracked in a process pool must merge into the datalog of a single-process run
+import json
+from pathlib import Path
+
+import pytest
+
+from eyeloop import run_batch
+from eyeloop.utilities.accuracy import compare_tracks, track_arrays
+
+GOLDEN_DIR = Path(__file__).parent / "testdata" / "golden"
+VIDEOS = {
+    "short_human_3blink": Path(__file__).parent / "testdata" / "short_human_3blink.mp4",
+    "short_mouse_noblink": Path(__file__).parent / "testdata" / "short_mouse_noblink.m4v",
+}
+
+
+def batch(tmpdir, name: str, *args) -> list:
+    """
+    Tracks a bundled video with run_batch.main; returns the records of its json datalog.
+    """
+    output_dir = Path(tmpdir, "_".join(args) or "single")
+    folder = run_batch.main(["--video", str(VIDEOS[name]),
+                             "--params", str(GOLDEN_DIR / f"params_{name}.npy"),
+                             "--blink", str(GOLDEN_DIR / f"blinkcalibration_{name}.npy"),
+                             "--output_dir", str(output_dir), "--datalog", "json", *args])
+    with open(Path(folder, "datalog.json")) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_frame_offset():
+    times = {0.: 0, 66.7: 2, 133.3: 3}  # frames 0 and 1 share a timestamp
+    records = [{"frame": frame} for frame in (1, 2, 3, 4)]
+    assert run_batch.frame_offset(records, [0., 0., 66.7, 133.3], times) == -1
+    assert run_batch.frame_offset(records, [None] * 4, times) == 0
+    assert run_batch.frame_offset(records, [200., 266.7, 333.3, 400.], {}) == 0
+
+
+def test_same_track():
+    record = {"frame": 3, "pupil": [[100., 80.], 20., 18., 5.], "cr_0": [[110., 85.], 2., 2., 0], "cr_1": None}
+    assert run_batch.same_track(record, dict(record, pupil=[[100.3, 80.], 21., 18., 5.]))
+    assert not run_batch.same_track(record, dict(record, pupil=[[101., 80.], 20., 18., 5.]))
+    assert not run_batch.same_track(record, dict(record, cr_1=[[90., 85.], 2., 2., 0]))
+    assert not run_batch.same_track(record, {"frame": 3, "blink": 1})
+
+
+@pytest.mark.parametrize("name", list(VIDEOS))
+def test_chunks_match_single_process(tmpdir, name):
+    # the human video has chunks whose warm start falls in a blink, and a blink decided by the drifted baseline
+    single = batch(tmpdir, name, "--workers", "1", "--chunk_size", "100000")
+    chunked = batch(tmpdir, name, "--workers", "2", "--chunk_size", "50", "--overlap", "10")
+
+    assert [record["frame"] for record in single] == list(range(len(single)))
+    assert [record["frame"] for record in chunked] == list(range(len(single)))
+
+    report = compare_tracks(track_arrays(single, 2), track_arrays(chunked, 2))
+    assert report["passed"], report
@@ -0,0 +1,24 @@
+# Smoke test of the benchmark suite on one bundled video
+import json
+from pathlib import Path
+
+from eyeloop import run_benchmark
+
+
+class TestBenchmark:
+    def test_mouse_video(self, tmpdir):
+        path = Path(tmpdir, "benchmark.json")
+        results = run_benchmark.main(["--videos", "short_mouse_noblink", "--repeat", "1", "--json", str(path),
+                                      "--output_dir", str(tmpdir)])
+
+        saved = json.loads(path.read_text())
+        entry = saved["videos"]["short_mouse_noblink"]
+        assert set(entry["micro"]) == {"Pupil.walkout", "GlintTracker.track",
+                                       "Ellipse.fit", "Circle.hyper_fit", "BlinkDetector.update"}
+        assert all(stats["n"] > 0 and stats["p50_us"] > 0 for stats in entry["micro"].values())
+        assert entry["end_to_end"]["frames"] == 309
+        assert entry["end_to_end"]["pupil_fits"] == 309
+
+        rows = run_benchmark.compare(results, saved)
+        assert len(rows) == 6
+        assert all(abs(change) < 1e-9 for _, change in rows)
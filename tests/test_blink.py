@@ -0,0 +1,42 @@
+# Unit tests for the streaming blink detector
+import numpy as np
+
+from eyeloop.engine.blink import BlinkDetector
+
+
+def frame(brightness: float) -> np.ndarray:
+    return np.full((60, 80), brightness, dtype=np.uint8)
+
+
+class TestBlinkDetector:
+    def test_calibration(self):
+        detector = BlinkDetector(calibration_frames=10)
+        values = [100, 102, 98, 101, 99, 100, 103, 97, 100, 100]
+        for value in values:
+            assert not detector.update(frame(value))
+
+        assert not detector.calibrating
+        assert np.isclose(detector.mean, np.mean(values))
+        assert np.isclose(detector.var, np.var(values))
+
+    def test_hysteresis_events(self):
+        detector = BlinkDetector(calibration_frames=10, onset=10, offset=5)
+        detector.load(np.full(10, 100.))
+
+        states, onsets, offsets = [], [], []
+        for value in [101, 115, 108, 103, 100]:
+            states.append(detector.update(frame(value)))
+            onsets.append(detector.onset)
+            offsets.append(detector.offset)
+
+        assert states == [False, True, True, False, False]
+        assert onsets == [False, True, False, False, False]
+        assert offsets == [False, False, False, True, False]
+
+    def test_blinks_do_not_move_baseline(self):
+        detector = BlinkDetector(calibration_frames=10)
+        detector.load(np.full(10, 100.))
+        for _ in range(50):
+            detector.update(frame(30))
+
+        assert detector.mean == 100.
@@ -0,0 +1,35 @@
+# Unit tests for the datalog backends
+import json
+
+import numpy as np
+
+from eyeloop.utilities.datalog import NpyDatalog, export_json, load_datalog
+
+
+class TestNpyDatalog:
+    def test_round_trip(self, tmpdir):
+        datalog = NpyDatalog(tmpdir, n_cr=2, chunk_size=4)
+        for frame in range(10):
+            if frame == 3:
+                dataout = {"time": frame * .1, "blink": 1}
+            else:
+                dataout = {"time": frame * .1,
+                           "pupil": ((10. + frame, 20.), 5., 4., 30.),
+                           "cr_0": ((12., 21.), 1., 1., 0),
+                           "cr_1": None}
+            datalog.write(dataout, frame)
+        datalog.close()
+
+        assert len(list(tmpdir.listdir("datalog_*.npz"))) == 3
+
+        columns = load_datalog(tmpdir)
+        assert np.array_equal(columns["frame"], np.arange(10))
+        assert columns["blink"].tolist() == [0, 0, 0, 1, 0, 0, 0, 0, 0, 0]
+        assert columns["pupil"][5].tolist() == [15., 20., 5., 4., 30.]
+        assert np.all(np.isnan(columns["pupil"][3]))
+        assert np.all(np.isnan(columns["cr"][:, 1]))
+
+        lines = [json.loads(line) for line in open(export_json(tmpdir))]
+        assert lines[3] == {"time": 3 * .1, "frame": 3, "blink": 1}
+        assert lines[5]["pupil"] == [[15., 20.], 5., 4., 30.]
+        assert lines[5]["cr_1"] is None
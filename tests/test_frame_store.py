@@ -0,0 +1,43 @@
+# Unit tests for the memory-mapped raw frame store
+import numpy as np
+import pytest
+
+from eyeloop.utilities.frame_store import RawFrameStore, is_raw_stack
+from eyeloop.utilities.frame_writer import RawStackWriter
+
+
+def write_stack(path, frames: list) -> None:
+    writer = RawStackWriter(path)
+    for frame in frames:
+        writer.write(np.full((24, 32), frame % 256, dtype=np.uint8), frame, frame / 30)
+    writer.close()
+
+
+class TestRawFrameStore:
+    def test_views_and_seek(self, tmpdir):
+        write_stack(tmpdir, list(range(5, 25)))
+        store = RawFrameStore(tmpdir)
+
+        assert is_raw_stack(tmpdir)
+        assert len(store) == 20 and store.contiguous
+        assert store.get_frame(12)[0, 0] == 12
+        assert isinstance(store.get_frame(12), np.memmap)
+        assert store.fps() == pytest.approx(30)
+        with pytest.raises(KeyError):
+            store.position(25)
+
+    def test_dropped_frames(self, tmpdir):
+        write_stack(tmpdir, [0, 1, 2, 5, 6, 9])
+        store = RawFrameStore(tmpdir)
+
+        assert not store.contiguous
+        assert store.position(6) == 4
+        with pytest.raises(KeyError):
+            store.position(3)
+
+    def test_torn_frame_is_ignored(self, tmpdir):
+        write_stack(tmpdir, list(range(4)))
+        with open(tmpdir / "frames.raw", "ab") as file:
+            file.write(b"\0" * 100)
+
+        assert len(RawFrameStore(tmpdir)) == 4
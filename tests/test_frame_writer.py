@@ -0,0 +1,83 @@
+# Unit tests for the background frame writers
+import threading
+
+import numpy as np
+import pytest
+
+from eyeloop.utilities.frame_writer import (RAW_HEADER, RAW_HEADER_SIZE, RAW_INDEX_DTYPE, AsyncFrameWriter,
+                                            ImageSequenceWriter, RawStackWriter)
+
+
+def make_frames(n: int) -> list:
+    return [np.full((48, 64), i, dtype=np.uint8) for i in range(n)]
+
+
+class TestFrameWriter:
+    def test_raw_stack(self, tmpdir):
+        writer = AsyncFrameWriter(RawStackWriter(tmpdir), size=4)
+        for i, image in enumerate(make_frames(20)):
+            assert writer.put(image, i, i * .01)
+        writer.close()
+
+        data = open(tmpdir / "frames.raw", "rb").read()
+        assert RAW_HEADER.unpack(data[:RAW_HEADER.size])[1:] == (48, 64, 1)
+
+        frames = np.frombuffer(data[RAW_HEADER_SIZE:], dtype=np.uint8).reshape(-1, 48, 64)
+        index = np.fromfile(tmpdir / "frames_index.bin", dtype=RAW_INDEX_DTYPE)
+        assert len(frames) == len(index) == 20
+        assert np.array_equal(frames[:, 0, 0], index["frame"])
+        assert writer.dropped == 0
+
+    def test_image_sequence(self, tmpdir):
+        writer = AsyncFrameWriter(ImageSequenceWriter(tmpdir, "frame_$.png"), size=2)
+        for i, image in enumerate(make_frames(5)):
+            writer.put(image, i, 0)
+        writer.close()
+
+        assert sorted(path.basename for path in tmpdir.listdir("frame_*.png")) == [f"frame_{i}.png" for i in range(5)]
+
+    def test_queued_frames_are_copies(self):
+        class GatedWriter:
+            def __init__(self):
+                self.go, self.images = threading.Event(), []
+
+            def write(self, image, frame, timestamp):
+                self.go.wait()
+                self.images.append(image)
+
+            def flush(self):
+                return
+
+            def close(self):
+                return
+
+        gated = GatedWriter()
+        writer = AsyncFrameWriter(gated, size=4)
+        buffer = np.zeros((48, 64), dtype=np.uint8)
+        for i in range(3):
+            buffer[:] = i  # a source refilling the same buffer
+            writer.put(buffer, i, 0)
+        gated.go.set()
+        writer.close()
+
+        assert [image[0, 0] for image in gated.images] == [0, 1, 2]
+
+    def test_failure_is_raised(self):
+        class FullDisk:
+            def write(self, image, frame, timestamp):
+                raise OSError(28, "No space left on device")
+
+            def flush(self):
+                return
+
+            def close(self):
+                return
+
+        writer = AsyncFrameWriter(FullDisk(), size=4)
+        writer.put(make_frames(1)[0], 0, 0)
+        writer.thread.join(timeout=5)
+
+        with pytest.raises(RuntimeError, match="No space left"):
+            writer.put(make_frames(1)[0], 1, 0)
+        with pytest.raises(RuntimeError):
+            writer.close()
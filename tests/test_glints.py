@@ -0,0 +1,70 @@
+# Corneal reflection tracking in one pass: glint labelling, identity matching and the tracker on a rendered eye
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.engine.glints import GlintTracker, label_glints, match_glints, register
+from eyeloop.utilities.argument_parser import Arguments
+
+# four glints in a square, as [x, y, radius]
+GLINTS = np.array([[100., 100., 3.], [130., 100., 3.], [100., 130., 3.], [130., 130., 3.]])
+
+
+class TestMatching:
+    def test_closest_pairs_within_reach(self):
+        centers = GLINTS[[2, 0, 3], :2] + 1
+        assert match_glints(centers, GLINTS, reach=4).tolist() == [2, 0, 3]
+        assert match_glints(centers + 10, GLINTS, reach=4).tolist() == [-1, -1, -1]
+        assert match_glints(centers, GLINTS[:0], reach=4).tolist() == [-1, -1, -1]
+
+    def test_each_glint_taken_once(self):
+        centers = np.array([[100., 100.], [101., 101.]])
+        assert match_glints(centers, GLINTS, reach=4).tolist() == [0, -1]
+
+    def test_common_displacement_keeps_identities(self):
+        # a shift by the glint spacing would swap identities if each identity were matched on its own
+        shift = np.array([24., 2.])
+        centers = GLINTS[:, :2] - shift
+        assert np.allclose(register(centers, GLINTS, reach=6, search=60, tolerance=1.5), shift)
+        assert match_glints(centers, GLINTS, reach=6, search=60, tolerance=1.5).tolist() == [0, 1, 2, 3]
+
+    def test_far_displacement_needs_two_identities(self):
+        lone = GLINTS[:1, :2] - [20., 0.]
+        assert np.allclose(register(lone, GLINTS, reach=6, search=60, tolerance=1.5), 0)
+        assert match_glints(lone, GLINTS, reach=6, search=60, tolerance=1.5).tolist() == [-1]
+        assert register(GLINTS[:2, :2] - [20., 0.], GLINTS, reach=6, search=60, tolerance=1.5).tolist() == [20., 0.]
+        assert np.allclose(register(GLINTS[:2, :2] - [20., 0.], GLINTS, reach=6, search=10, tolerance=1.5), 0)
+
+    def test_label_glints(self):
+        binary = np.zeros((60, 80), dtype=np.uint8)
+        binary[10:15, 20:25] = 255  # radius ~2.8
+        binary[40, 60] = 255        # speck
+        binary[30:60, 0:30] = 255   # too large
+        _, _, labels, glints = label_glints(binary, min_radius=1, max_radius=6)
+        assert len(labels) == 1
+        assert np.allclose(glints[0], [22, 12, np.sqrt(25 / np.pi)])
+
+
+@pytest.mark.parametrize("n_crs", [4, 8])
+def test_tracker_follows_rendered_glints(n_crs):
+    from eyeloop.engine.preprocessor import Preprocessor
+    from eyeloop.engine.processor import CornealReflection
+    from eyeloop.sources.synthetic import SyntheticEye
+
+    config.arguments = Arguments(["--clear", "1", "--save", "0", "--crs", str(n_crs)])
+    eye = SyntheticEye(n_crs=n_crs, seed=2, blink_rate=1e-6)  # no blinks
+    images, truth = eye.render(0, 200)
+    params = eye.params(n_crs)
+
+    processors = [CornealReflection(n=i) for i in range(n_crs)]
+    for processor in processors:
+        processor.set_dimensions(images.shape[2:0:-1])
+        processor.binarythreshold, processor.blur = params[processor.name][0], params[processor.name][1]
+        processor.set_center(params[processor.name][2])
+
+    tracker = GlintTracker(processors)
+    for frame, image in enumerate(images):
+        results = tracker.track(image, Preprocessor(image), tuple(truth["pupil"][frame, :2]))
+        for i, params in enumerate(results):
+            assert params is not None, f"cr_{i} lost in frame {frame}"
+            assert np.linalg.norm(np.subtract(params[0], truth[f"cr_{i}"][frame, :2])) < .5
@@ -0,0 +1,37 @@
+# End-to-end tracking of the bundled videos against the golden reference tracks
+import numpy as np
+import pytest
+
+from eyeloop import run_benchmark
+from eyeloop.utilities.accuracy import compare_tracks, load_tracks, track_arrays
+
+
+class TestGolden:
+    @pytest.mark.parametrize("name, blink_frames", [("short_human_3blink", True), ("short_mouse_noblink", False)])
+    def test_reproduces_reference(self, name, blink_frames):
+        video = run_benchmark.BENCHMARK_VIDEOS[name]
+        summary, records = run_benchmark.end_to_end(video, [])
+        tracks = track_arrays(records)
+
+        report = compare_tracks(load_tracks(video["reference"]), tracks)
+        assert report["passed"], report
+        assert tracks["blink"].any() == blink_frames
+
+    def test_detects_deviation(self):
+        reference = load_tracks(run_benchmark.BENCHMARK_VIDEOS["short_mouse_noblink"]["reference"])
+        shifted = {key: value.copy() for key, value in reference.items()}
+        shifted["pupil"][:, 0] += 1
+        shifted["cr_0"][::2] = np.nan
+
+        report = compare_tracks(reference, shifted)
+        assert not report["passed"]
+        assert set(report["failed"]) == {"pupil_center", "fit_mismatch"}
+
+    def test_detects_cr_deviation(self):
+        reference = load_tracks(run_benchmark.BENCHMARK_VIDEOS["short_mouse_noblink"]["reference"])
+        shifted = {key: value.copy() for key, value in reference.items()}
+        shifted["cr_0"][:, 1] += 1
+
+        report = compare_tracks(reference, shifted)
+        assert report["cr_0_center"]["p99"] == pytest.approx(1)
+        assert not report["passed"] and report["failed"] == ["cr_0_center"]
@@ -0,0 +1,120 @@
+# Unit tests for the minimum GUI render loop; window calls are recorded instead of drawn
+from pathlib import Path
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+WINDOW_CALLS = ["namedWindow", "moveWindow", "imshow", "destroyWindow", "destroyAllWindows", "setMouseCallback"]
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    """
+    Records the thread of every HighGUI call; waitKey returns queued key presses.
+    imshow takes 20 ms, like a slow display.
+    """
+    calls = []
+    keys = []
+
+    def record(name, delay=0):
+        def call(*args, **kwargs):
+            calls.append((name, threading.current_thread().name))
+            time.sleep(delay)
+        return call
+
+    def wait_key(delay):
+        calls.append(("waitKey", threading.current_thread().name))
+        time.sleep(.001)
+        return keys.pop(0) if keys else -1
+
+    for name in WINDOW_CALLS:
+        monkeypatch.setattr(cv2, name, record(name, .02 if name == "imshow" else 0))
+    monkeypatch.setattr(cv2, "waitKey", wait_key)
+    return calls, keys
+
+
+def armed_gui(tmpdir, args=[]):
+    config.arguments = Arguments(["--save", "0"] + args)
+    config.file_manager = File_Manager(output_root=Path(tmpdir), img_format=config.arguments.img_format)
+    from eyeloop.engine.processor import CornealReflection, Pupil
+    from eyeloop.guis.minimum.minimum_gui import GUI
+
+    pupil = Pupil()
+    gui = GUI(on_angle=lambda inc: None, on_quit=lambda: None)
+    gui.arm((320, 240), pupil, [CornealReflection(n=x) for x in range(2)])
+    return gui
+
+
+class TestMinimumGUI:
+    def test_renders_on_the_main_thread(self, tmpdir, windows):
+        calls, _ = windows
+        gui = armed_gui(tmpdir)
+        frame = np.zeros((240, 320), dtype=np.uint8)
+        elapsed = []
+
+        def track():
+            start = time.perf_counter()
+            for _ in range(50):
+                gui.update(frame, {})
+            elapsed.append(time.perf_counter() - start)
+            time.sleep(.05)
+            gui.release()
+
+        gui.run(track)
+
+        # 50 synchronous renders would take > 1 s; HighGUI needs the main thread on macOS
+        assert elapsed[0] < .5
+        assert ("imshow", threading.main_thread().name) in calls
+        assert {thread for _, thread in calls} == {threading.main_thread().name}
+
+    def test_keys_apply_on_the_tracking_thread(self, tmpdir, windows):
+        _, keys = windows
+        gui = armed_gui(tmpdir)
+        gui.pupil_processor.binarythreshold = 50
+        keys.extend([ord("r"), ord("r")])
+        thresholds = []
+
+        def track():
+            deadline = time.perf_counter() + 2
+            while gui.commands.qsize() < 2 and time.perf_counter() < deadline:
+                time.sleep(.005)
+            thresholds.append(gui.pupil_processor.binarythreshold)
+            gui.update(np.zeros((240, 320), dtype=np.uint8), {})
+            thresholds.append(gui.pupil_processor.binarythreshold)
+
+        gui.run(track)
+        assert thresholds == [50, 52]
+
+    def test_preview_rate(self, tmpdir, windows):
+        gui = armed_gui(tmpdir, ["--framerate", "10"])
+        frame = np.zeros((240, 320), dtype=np.uint8)
+
+        posted = []
+        put = gui.mailbox.put
+        gui.mailbox.put = lambda item: posted.append(item) or put(item)
+
+        def track():
+            for _ in range(30):
+                gui.update(frame, {})
+                time.sleep(.01)
+
+        gui.run(track)
+
+        # ~0.3 s at 10 previews per second
+        assert 2 <= len(posted) <= 5
+
+    def test_tracking_errors_are_raised(self, tmpdir, windows):
+        gui = armed_gui(tmpdir)
+
+        def track():
+            raise ValueError("source failed")
+
+        with pytest.raises(ValueError):
+            gui.run(track)
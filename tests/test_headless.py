@@ -0,0 +1,62 @@
+# Headless tracking seeded from a params file, with a preview written to disk
+import functools
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+
+def save_params(path, pupil_center):
+    params = {"pupil": [100, [3, 3], pupil_center], "cr_0": [200, [3, 3], (340, 230)], "cr_1": [200, [3, 3], -1]}
+    np.save(path, params)
+
+
+def run_headless(tmpdir, args, n_frames=20):
+    config.arguments = Arguments(["--clear", "1", "--save", "0", "--headless", "1"] + args)
+    config.file_manager = File_Manager(output_root=Path(tmpdir), img_format=config.arguments.img_format)
+    from eyeloop.engine.engine import Engine, load_params
+    from eyeloop.guis.headless.headless_gui import HeadlessGUI
+    from eyeloop.sources.fake import FakeSource
+
+    engine = Engine(source=functools.partial(FakeSource, n_frames=n_frames), gui=HeadlessGUI)
+    engine.activate()
+    engine.set_centers(load_params(config.arguments.params))
+    engine.run()
+    return engine
+
+
+class TestHeadless:
+    def test_seeded_from_params(self, tmpdir):
+        params = str(Path(tmpdir, "params_0.npy"))
+        save_params(params, (315, 245))
+        engine = run_headless(tmpdir, ["--params", params])
+
+        assert engine.pupil_processor.binarythreshold == 100
+        assert np.allclose(engine.dataout["pupil"][0], (320, 240), atol=1)
+        assert engine.cr_processors[0].active
+        assert not engine.cr_processors[1].active
+        assert engine.gui.sent == 0
+
+    def test_preview(self, tmpdir):
+        params = str(Path(tmpdir, "params_0.npy"))
+        save_params(params, (320, 240))
+        engine = run_headless(tmpdir, ["--params", params, "--preview", "preview.avi", "--framerate", "0"])
+        engine.gui.release()
+
+        capture = cv2.VideoCapture(str(Path(config.file_manager.new_folderpath, "preview.avi")))
+        # arm() publishes the first frame once more
+        assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == engine.gui.sent == 21
+        capture.release()
+
+    def test_missing_center(self, tmpdir):
+        from eyeloop.engine.engine import load_params
+
+        params = str(Path(tmpdir, "params_0.npy"))
+        save_params(params, -1)
+        with pytest.raises(ValueError):
+            load_params(params)
@@ -0,0 +1,76 @@
+# Frame-to-output latency measured end to end on a fake source
+import functools
+from pathlib import Path
+import time
+
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+
+class SlowStimulus:
+    """
+    Extractor that takes ~2 ms to issue its output, like a closed-loop stimulus render.
+    """
+
+    def activate(self):
+        return
+
+    def fetch(self, engine):
+        time.sleep(.002)
+
+    def release(self, engine):
+        return
+
+
+def run_engine(tmpdir, args, n_frames=40):
+    config.arguments = Arguments(["--clear", "1", "--save", "0"] + args)
+    config.file_manager = File_Manager(output_root=Path(tmpdir), img_format=config.arguments.img_format)
+    from eyeloop.engine.engine import Engine
+    from eyeloop.sources.fake import FAKE_PUPIL, FakeSource
+
+    engine = Engine(source=functools.partial(FakeSource, n_frames=n_frames, fps=200), gui=None)
+    engine.load_extractors({"stimulus": SlowStimulus()})
+    engine.activate()
+    engine.pupil_processor.set_center(FAKE_PUPIL["center"])
+    engine.run()
+    return engine
+
+
+class TestLatency:
+    def test_serial(self, tmpdir):
+        engine = run_engine(tmpdir, ["--latency", "1"])
+        latencies = engine.latency.latencies("stimulus")
+
+        # arm() publishes the first frame once more
+        assert len(latencies) == 41
+        assert np.all(latencies >= .002)
+        assert engine.latency.summary()["stimulus"]["p50"] >= 2
+
+    def test_pipeline(self, tmpdir):
+        engine = run_engine(tmpdir, ["--pipeline", "1", "--latency", "1"])
+        latencies = engine.latency.latencies("stimulus")
+
+        assert len(latencies) == 41
+        assert np.all(latencies >= .002)
+
+
+def test_latencies_do_not_block_recording():
+    from eyeloop.utilities.latency import LatencyRecorder
+
+    recorder = LatencyRecorder(keep_samples=True)
+    recorder.issued("stimulus", 1., 1.002)
+    held = recorder.latencies("stimulus")
+    for _ in range(100):
+        recorder.issued("stimulus", 1., 1.003)
+
+    assert len(held) == 1 and len(recorder.latencies("stimulus")) == 101
+
+
+def test_samples_only_with_latency_flag(tmpdir):
+    engine = run_engine(tmpdir, [])
+
+    assert len(engine.latency.latencies("stimulus")) == 0
+    assert engine.latency.histograms["stimulus"].count == 41
@@ -0,0 +1,80 @@
+# Unit tests for the shape models
+import numpy as np
+import pytest
+
+from eyeloop.engine.models.circular import Circle, hyper_fit
+from eyeloop.engine.models.ellipsoid import Ellipse, fit_ellipses
+
+
+def circle_points(center, radius, n=16, noise=0., seed=0):
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    points = np.column_stack([np.cos(angles), np.sin(angles)]) * radius + center
+    return points + np.random.default_rng(seed).normal(0, noise, points.shape)
+
+
+class TestCircle:
+    def test_batch(self):
+        truth = np.array([[50., 40., 10.], [120., 80., 3.], [0., -5., 25.]])
+        points = np.stack([circle_points(circle[:2], circle[2]) for circle in truth])
+
+        circles, residuals = hyper_fit(points)
+        assert circles.shape == (3, 3)
+        assert np.allclose(circles, truth)
+        assert np.allclose(residuals, 0, atol=1e-9)
+
+    def test_degenerate_is_nan(self):
+        collinear = np.column_stack([np.arange(8.), np.arange(8.)])
+        coincident = np.full((8, 2), 3.)
+        points = np.stack([collinear, coincident, circle_points((10, 10), 5, n=8)])
+
+        circles, residuals = hyper_fit(points)
+        assert np.all(np.isnan(circles[:2])) and np.all(np.isnan(residuals[:2]))
+        assert np.allclose(circles[2], [10, 10, 5])
+
+    def test_model(self):
+        model = Circle()
+        assert np.allclose(model.fit(circle_points((30, 20), 4, noise=.1)), (30, 20), atol=.2)
+        assert model.residual > 0
+
+        with pytest.raises(ValueError):
+            model.fit(np.column_stack([np.arange(4.), np.zeros(4)]))
+
+
+def ellipse_points(center, width, height, angle, n=24):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    theta = np.radians(angle)
+    rotation = np.array([[np.cos(theta), np.sin(theta)], [-np.sin(theta), np.cos(theta)]])
+    return np.column_stack([width * np.cos(t), height * np.sin(t)]) @ rotation + center
+
+
+class TestEllipse:
+    def test_batch(self):
+        points = np.stack([ellipse_points((300, 200), 30, 20, 25), ellipse_points((50, 60), 8, 12, 0),
+                           np.column_stack([np.arange(24.), np.arange(24.)])])
+
+        params, residuals = fit_ellipses(points)
+        assert np.allclose(params[0, :2], (300, 200)) and np.allclose(sorted(params[0, 2:4]), (20, 30))
+        assert np.allclose(params[1, :2], (50, 60)) and np.allclose(sorted(params[1, 2:4]), (8, 12))
+        assert np.allclose(residuals[:2], 0, atol=1e-6)
+        assert np.all(np.isnan(params[2])) and np.isnan(residuals[2])
+
+    def test_model_matches_batch(self):
+        points = ellipse_points((120, 80), 15, 9, 40) + np.random.default_rng(0).normal(0, .3, (24, 2))
+        model = Ellipse()
+        center = model.fit(points)
+
+        params, residuals = fit_ellipses(points[np.newaxis])
+        assert np.allclose(center, params[0, :2])
+        assert np.allclose(model.params[1:], params[0, 2:])
+        assert 0 < model.residual == pytest.approx(residuals[0])
+
+        with pytest.raises(ValueError):
+            model.fit(np.column_stack([np.arange(8.), np.zeros(8)]))
+
+    def test_circle(self):
+        # integer walkout points on a round pupil: a == c and b == 0 exactly, so the orientation is undefined
+        ring = np.array([(5, 0), (4, 3), (3, 4), (0, 5), (-3, 4), (-4, 3),
+                         (-5, 0), (-4, -3), (-3, -4), (0, -5), (3, -4), (4, -3)], dtype=np.float64)
+        params, residuals = fit_ellipses(ring[np.newaxis] + (40, 30))
+        assert np.allclose(params[0], (40, 30, 5, 5, 0)) and residuals[0] < 1e-9
+        assert np.allclose(Ellipse().fit(ring + (40, 30)), (40, 30))
@@ -0,0 +1,44 @@
+# Unit tests for the alpha-beta motion model
+import cv2
+import numpy as np
+
+import eyeloop.config as config
+from eyeloop.engine.motion import MotionModel
+from eyeloop.utilities.argument_parser import Arguments
+
+
+class TestMotionModel:
+    def test_learns_constant_velocity(self):
+        model = MotionModel(radius=5)
+        model.reset((0, 0))
+        for i in range(1, 30):
+            model.predict()
+            model.update((3 * i, -2 * i))
+
+        assert np.allclose(model.predict(), (90, -60), atol=.1)
+        assert np.allclose(model.velocity, (3, -2), atol=.05)
+
+    def test_outlier_restarts(self):
+        model = MotionModel(radius=5)
+        model.reset((0, 0))
+        model.predict()
+        assert model.update((50, 0)) == 50
+        assert model.outliers == 1
+        assert np.array_equal(model.position, (50, 0)) and not np.any(model.velocity)
+
+    def test_seeds_accelerating_pupil(self):
+        config.arguments = Arguments(["--motion", "1"])
+        from eyeloop.engine.processor import Pupil
+
+        pupil = Pupil()
+        pupil.set_dimensions((640, 480))
+        pupil.binarythreshold = 80
+        pupil.set_center((60, 240))
+
+        for i in range(27):
+            x = 60 + .75 * i * i
+            image = np.full((480, 640), 180, dtype=np.uint8)
+            cv2.circle(image, (int(x), 240), 12, 30, -1)
+
+            params = pupil.track(image)
+            assert params is not None and abs(params[0][0] - int(x)) < 2
@@ -0,0 +1,90 @@
+# Multi-stream tracking: timestamp alignment, core groups and a two-video run
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from eyeloop import run_multi
+from eyeloop.run_benchmark import BENCHMARK_VIDEOS
+
+
+def records(times):
+    return [{"capture": t, "frame": i} for i, t in enumerate(times)]
+
+
+def video_times(path) -> np.ndarray:
+    capture = cv2.VideoCapture(str(path))
+    times = []
+    while capture.grab():
+        times.append(capture.get(cv2.CAP_PROP_POS_MSEC) / 1e3)
+    return np.array(times)
+
+
+class TestTimestampAligner:
+    def test_nearest_frame_within_tolerance(self):
+        aligner = run_multi.TimestampAligner(2)
+        aligner.add(0, records(np.arange(10) * .010))
+        aligner.add(1, records(np.arange(20) * .005 + .001))
+        aligner.end(1)
+        rows = aligner.rows()
+
+        assert len(rows) == 10
+        assert [row["stream_1"]["frame"] for row in rows] == list(range(0, 20, 2))
+        assert aligner.unmatched[1] == 9  # the odd frames, and the 19th once stream 0 ends
+
+    def test_waits_for_later_frames(self):
+        aligner = run_multi.TimestampAligner(2)
+        aligner.add(0, records([.0, .01, .02]))
+        aligner.add(1, records([.0, .011]))
+        assert len(aligner.rows()) == 2  # the third reference frame may still get a partner
+
+        rows = aligner.finish()
+        assert len(rows) == 1 and rows[0]["stream_1"] is None
+
+    def test_fixed_tolerance_and_single_use(self):
+        aligner = run_multi.TimestampAligner(2, tolerance=.002)
+        aligner.add(0, records([.0, .01, .02, .03]))
+        aligner.add(1, records([.0005, .025, .0301]))
+        aligner.end(1)
+        rows = aligner.rows()
+
+        assert [row["stream_1"] and row["stream_1"]["frame"] for row in rows] == [0, None, None, 2]
+        assert aligner.unmatched[1] == 1
+
+
+class TestMulti:
+    def test_core_groups(self):
+        assert run_multi.core_groups(2, [0, 1, 2, 3, 4]) == [{0, 1, 2}, {3, 4}]
+        assert run_multi.core_groups(3, [5]) == [{5}, {5}, {5}]
+
+    def test_two_videos(self, tmpdir):
+        names = ("short_mouse_noblink", "short_human_3blink")
+        streams = []
+        for name in names:
+            video = BENCHMARK_VIDEOS[name]
+            streams += ["--stream", f"--video {video['path']} --params {video['params']} --blink {video['blink']}"]
+        folder = run_multi.main(streams + ["--save", "0", "--clear", "1", "--playback", "4",
+                                           "--output_dir", str(tmpdir)])
+
+        rows = [json.loads(line) for line in Path(folder, "datalog_merged.json").read_text().splitlines()]
+        assert [row["stream_0"]["frame"] for row in rows] == list(range(1, 310))
+
+        # the 78 fps human video covers the first 3.6 s of the 15 fps mouse video: every mouse frame in that span
+        # pairs with the human frame nearest in video time, however fast each worker reads (frames count from 1)
+        mouse, human = (video_times(BENCHMARK_VIDEOS[name]["path"]) for name in names)
+        matched = {row["stream_0"]["frame"]: row["stream_1"]["frame"] for row in rows if row["stream_1"] is not None}
+        expected = {i + 1: int(np.argmin(np.abs(human - t))) + 1 for i, t in enumerate(mouse)
+                    if t <= human[-1] and (i == 0 or t > mouse[i - 1])}  # the first two mouse frames share time 0
+        assert expected and all(matched.get(frame) == partner for frame, partner in expected.items())
+
+        assert len(Path(folder, "stream_0", "datalog.json").read_text().splitlines()) == 309
+        assert len(Path(folder, "stream_1", "datalog.json").read_text().splitlines()) == 284
+
+    def test_failed_stream_releases_the_others(self, tmpdir):
+        video = BENCHMARK_VIDEOS["short_mouse_noblink"]
+        folder = run_multi.main(["--stream", f"--video {video['path']} --params {video['params']}",
+                                 "--stream", f"--video {Path(tmpdir, 'missing.mp4')} --params {video['params']}",
+                                 "--save", "0", "--clear", "1", "--output_dir", str(tmpdir)])
+
+        assert Path(folder, "datalog_merged.json").read_text() == ""  # stream 0 never started tracking
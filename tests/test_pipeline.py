@@ -0,0 +1,54 @@
+# Unit tests for the pipeline ring buffers
+import threading
+
+from eyeloop.utilities.ring_buffer import DropPolicy, RingBuffer
+
+
+class TestRingBuffer:
+    def test_drop_oldest_keeps_latest(self):
+        buffer = RingBuffer(2, DropPolicy.OLDEST)
+        for i in range(5):
+            assert buffer.put(i)
+        buffer.close()
+
+        assert [buffer.get(), buffer.get(), buffer.get()] == [3, 4, None]
+        assert buffer.dropped == 3
+
+    def test_drop_newest_rejects_incoming(self):
+        buffer = RingBuffer(2, DropPolicy.NEWEST)
+        assert [buffer.put(i) for i in range(4)] == [True, True, False, False]
+        buffer.close()
+
+        assert [buffer.get(), buffer.get(), buffer.get()] == [0, 1, None]
+        assert buffer.dropped == 2
+
+    def test_block_applies_backpressure(self):
+        buffer = RingBuffer(1, DropPolicy.BLOCK)
+        received = []
+
+        def consume():
+            while True:
+                item = buffer.get()
+                if item is None:
+                    break
+                received.append(item)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        for i in range(100):
+            buffer.put(i)
+        buffer.close()
+        consumer.join(timeout=5)
+
+        assert received == list(range(100))
+        assert buffer.dropped == 0
+
+    def test_get_batch_drains(self):
+        buffer = RingBuffer(8)
+        for i in range(5):
+            buffer.put(i)
+        buffer.close()
+
+        assert buffer.get_batch(3) == [0, 1, 2]
+        assert buffer.get_batch(3) == [3, 4]
+        assert buffer.get_batch(3) == []
@@ -0,0 +1,49 @@
+# Offline video pacing (--playback)
+from pathlib import Path
+import time
+
+import pytest
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+VIDEO = Path(__file__).parent / "testdata" / "short_mouse_noblink.m4v"  # 15.1 fps
+
+
+def play(tmpdir, playback: float, n_frames: int = 30) -> tuple:
+    """
+    Plays the first n_frames of the test video; returns (wall time in seconds, recorded fps).
+    """
+    config.arguments = Arguments(["--video", str(VIDEO), "--playback", str(playback), "--save", "0"])
+    config.file_manager = File_Manager(output_root=Path(tmpdir), img_format=config.arguments.img_format)
+    from eyeloop.sources.cv_offline import CvOfflineSource
+
+    frames = []
+
+    def on_frame(image):
+        frames.append(image)
+        if len(frames) == n_frames:
+            source.route_frame = None
+
+    source = CvOfflineSource(on_frame)
+    (width, height), image = source.init()
+    source.arm(width, height, image)
+    start = time.perf_counter()
+    source.route()
+    elapsed = time.perf_counter() - start
+    source.capture.release()
+
+    assert len(frames) == n_frames
+    return elapsed, source.fps
+
+
+class TestPlayback:
+    def test_paced_at_playback_rate(self, tmpdir):
+        elapsed, fps = play(tmpdir, playback=4)
+        expected = 30 / (fps * 4)
+        assert elapsed == pytest.approx(expected, rel=.2)
+
+    def test_zero_is_unthrottled(self, tmpdir):
+        elapsed, fps = play(tmpdir, playback=0)
+        assert elapsed < 30 / (fps * 4) / 4
@@ -0,0 +1,99 @@
+# Unit tests for the pupil and corneal reflection processors
+import cv2
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+
+WIDTH, HEIGHT = 640, 480
+PUPIL = {"center": (300, 250), "axes": (60, 45), "angle": 20}
+CR = {"center": (320, 240), "radius": 6}
+
+
+@pytest.fixture
+def eye_image():
+    image = np.full((HEIGHT, WIDTH), 180, dtype=np.uint8)
+    cv2.ellipse(image, PUPIL["center"], PUPIL["axes"], PUPIL["angle"], 0, 360, 30, -1)
+    cv2.circle(image, CR["center"], CR["radius"], 250, -1)
+    return image
+
+
+def make_processors(args):
+    config.arguments = Arguments(args)
+    from eyeloop.engine.processor import CornealReflection, Pupil
+
+    pupil = Pupil()
+    pupil.set_dimensions((WIDTH, HEIGHT))
+    pupil.set_center((310, 255))
+    pupil.binarythreshold = 80
+
+    cr = CornealReflection()
+    cr.set_dimensions((WIDTH, HEIGHT))
+    cr.set_center((321, 241))
+    cr.binarythreshold = 200
+    return pupil, cr
+
+
+class TestProcessors:
+    def test_pupil_and_cr_fit(self, eye_image):
+        pupil, cr = make_processors([])
+
+        center, width, height, _ = pupil.track(eye_image)
+        assert np.allclose(center, PUPIL["center"], atol=1)
+        assert np.allclose((width, height), PUPIL["axes"], atol=2)
+
+        center, radius, _, _ = cr.track(eye_image)
+        assert np.allclose(center, CR["center"], atol=1)
+        assert radius == pytest.approx(CR["radius"], abs=1)
+
+    def test_cond_keeps_both_pixel_rings(self):
+        pupil, _ = make_processors([])
+        angles = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+        radii = np.where(np.arange(32) % 3, 45., 46.)  # rays ending on neighbouring pixels
+        r = np.column_stack((radii * np.cos(angles), radii * np.sin(angles))) + (300, 250)
+        assert len(pupil.cond(r)) == 32
+
+        outlier = np.vstack((r, [[380., 250.]]))
+        assert len(pupil.cond(outlier)) == 32
+
+    def test_roi_matches_full_frame(self, eye_image):
+        full = [processor.track(eye_image) for processor in make_processors([])]
+        pupil, cr = make_processors(["--roi", "1"])
+        cropped = [pupil.track(eye_image), cr.track(eye_image)]
+
+        assert pupil.src.shape[0] < HEIGHT and cr.src.shape[0] < HEIGHT
+        for (full_center, *full_rest), (roi_center, *roi_rest) in zip(full, cropped):
+            assert np.allclose(full_center, roi_center)
+            assert np.allclose(full_rest, roi_rest)
+
+    def test_roi_widens_after_lost_track(self, eye_image):
+        pupil, _ = make_processors(["--roi", "1"])
+        blank = np.full_like(eye_image, 180)
+
+        pupil.track(blank)
+        assert pupil.roi_scale == 2
+
+        pupil.track(eye_image)
+        assert pupil.roi_scale == 1
+
+    def test_preprocessor_shares_blur(self, eye_image):
+        from eyeloop.engine.preprocessor import Preprocessor
+
+        preprocessor = Preprocessor()
+        preprocessor.on_frame(eye_image)
+        pupil, cr = make_processors([])
+        _, second_cr = make_processors([])
+        second_cr.set_center(CR["center"])
+
+        blurred = preprocessor.blurred(cr.blur)
+        cr.track(eye_image, preprocessor)
+        second_cr.track(eye_image, preprocessor)
+        pupil.track(eye_image, preprocessor)
+
+        assert preprocessor.blurred(second_cr.blur) is blurred
+        assert np.shares_memory(cr.blurred, blurred) and np.shares_memory(second_cr.blurred, blurred)
+        assert len([key for key in preprocessor.images if key[0] == "blur"]) == 2
+
+        preprocessor.on_frame(eye_image)
+        assert not preprocessor.images
@@ -0,0 +1,35 @@
+# Unit tests for the latency histograms and stage profiler
+import json
+
+import numpy as np
+import pytest
+
+from eyeloop.utilities.profiler import LatencyHistogram, Profiler
+
+
+class TestLatencyHistogram:
+    def test_percentiles(self):
+        histogram = LatencyHistogram("stage")
+        samples = np.random.default_rng(0).lognormal(np.log(1e-3), .5, 10000)
+        for sample in samples:
+            histogram.add(sample)
+
+        assert histogram.count == 10000
+        assert histogram.max == samples.max()
+        for q in (50, 99):
+            assert histogram.percentile(q) == pytest.approx(np.percentile(samples, q), rel=.13)
+
+    def test_profiler_dump(self, tmpdir):
+        profiler = Profiler()
+        profiler.stop("off", profiler.start())
+        assert profiler.stages == {}
+
+        profiler.enable(tmpdir, interval=0)
+        for _ in range(3):
+            profiler.stop("stage", profiler.start())
+        profiler.tick(frame=3)
+        profiler.disable()
+
+        lines = [json.loads(line) for line in open(tmpdir / "profile.json")]
+        assert len(lines) == 1 and lines[0]["frame"] == 3
+        assert lines[0]["stages"]["stage"]["n"] == 3
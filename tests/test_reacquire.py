@@ -0,0 +1,67 @@
+# Unit tests for pupil re-acquisition after a lost track
+import cv2
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.engine.reacquire import Reacquirer
+from eyeloop.utilities.argument_parser import Arguments
+
+
+def eye_image(center):
+    image = np.full((480, 640), 180, dtype=np.uint8)
+    cv2.ellipse(image, center, (30, 22), 10, 0, 360, 30, -1)
+    cv2.circle(image, (center[0] + 8, center[1] - 5), 5, 250, -1)
+    # distractors: a shadow cut off by the frame border and a small dark spot
+    cv2.circle(image, (40, 440), 60, 60, -1)
+    cv2.circle(image, (150, 100), 8, 40, -1)
+    return image
+
+
+class TestReacquirer:
+    def test_finds_pupil(self):
+        reacquirer = Reacquirer(min_radius=2, max_radius=100)
+        center = reacquirer.find(eye_image((450, 300)), 80, prior=(200, 200), search_radius=100, radius=26)
+        assert np.hypot(center[0] - 450, center[1] - 300) < 1.5
+
+    def test_nothing_dark(self):
+        reacquirer = Reacquirer(min_radius=2, max_radius=100)
+        assert reacquirer.find(np.full((480, 640), 180, dtype=np.uint8), 80) is None
+
+    def test_budget_checked_before_coarse_search(self, monkeypatch):
+        reacquirer = Reacquirer(min_radius=2, max_radius=100, budget=0)
+        monkeypatch.setattr(reacquirer, "coarse", lambda *args: pytest.fail("coarse search past the budget"))
+        assert reacquirer.find(eye_image((450, 300)), 80) is None
+        assert reacquirer.decimate
+
+    def test_decimated_pyramid(self):
+        reacquirer = Reacquirer(min_radius=2, max_radius=100)
+        reacquirer.decimate = True
+        center = reacquirer.find(eye_image((450, 300)), 80, prior=(200, 200), search_radius=100, radius=26)
+        assert np.hypot(center[0] - 450, center[1] - 300) < 1.5
+
+    def test_slow_coarse_search_drops_levels(self, monkeypatch):
+        reacquirer = Reacquirer(min_radius=2, max_radius=100, budget=.01)
+        reacquirer.pixel_time = 1e-6  # 19 ms at 160x120 (2 levels), 5 ms at 80x60
+        scales = []
+        coarse = reacquirer.coarse
+        monkeypatch.setattr(reacquirer, "coarse", lambda *args: scales.append(args[-1]) or coarse(*args))
+
+        center = reacquirer.find(eye_image((450, 300)), 80, prior=(200, 200), search_radius=100, radius=26)
+        assert scales == [8]
+        assert np.hypot(center[0] - 450, center[1] - 300) < 1.5
+        assert reacquirer.pixel_time < 1e-6
+
+    def test_pupil_recovers_after_saccade(self):
+        config.arguments = Arguments([])
+        from eyeloop.engine.processor import Pupil
+
+        pupil = Pupil()
+        pupil.set_dimensions((640, 480))
+        pupil.binarythreshold = 80
+        pupil.set_center((200, 200))
+        assert pupil.track(eye_image((200, 200))) is not None
+
+        assert pupil.track(eye_image((450, 300))) is None  # lost, re-acquired for the next frame
+        params = pupil.track(eye_image((450, 300)))
+        assert np.hypot(params[0][0] - 450, params[0][1] - 300) < 1.5
@@ -0,0 +1,92 @@
+# Synthetic eye video: rendering against its own ground truth, and end-to-end tracking accuracy
+import functools
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+import eyeloop.config as config
+from eyeloop.utilities.argument_parser import Arguments
+from eyeloop.utilities.file_manager import File_Manager
+
+
+class TestSyntheticEye:
+    def setup_method(self):
+        config.arguments = Arguments(["--clear", "1", "--save", "0"])
+
+    def test_frames_do_not_depend_on_batching(self):
+        from eyeloop.sources.synthetic import SyntheticEye
+
+        batched, truth = SyntheticEye(n_crs=2, seed=3).render(30, 12)
+        single, single_truth = SyntheticEye(n_crs=2, seed=3).render(37, 1)
+
+        assert np.array_equal(batched[7], single[0])
+        assert np.array_equal(truth["cr_1"][7], single_truth["cr_1"][0])
+        assert not np.array_equal(batched[0], SyntheticEye(n_crs=2, seed=4).render(30, 1)[0][0])
+
+    def test_pupil_matches_truth(self):
+        from eyeloop.sources.synthetic import SYNTHETIC_LEVELS, SyntheticEye
+
+        eye = SyntheticEye((800, 600), fps=60, n_crs=0, noise=0)  # no reflection cutting into the pupil
+        images, truth = eye.render(0, 120)
+        threshold = (SYNTHETIC_LEVELS["pupil"] + SYNTHETIC_LEVELS["iris"]) / 2 * truth["gain"]
+        for image, pupil, level in zip(images[::10], truth["pupil"][::10], threshold[::10]):
+            if np.isnan(pupil[0]):
+                continue
+            moments = cv2.moments((image < level).astype(np.uint8), binaryImage=True)
+            center = moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+            assert np.allclose(center, pupil[:2], atol=.1)
+            assert moments["m00"] == pytest.approx(np.pi * pupil[2] * pupil[3], rel=.02)
+
+    def test_blinks_hide_the_pupil(self):
+        from eyeloop.sources.synthetic import SYNTHETIC_LEVELS, SyntheticEye
+
+        eye = SyntheticEye(fps=100, blink_rate=2)
+        images, truth = eye.render(0, 300)
+        blink = np.flatnonzero(truth["blink"])
+
+        assert len(blink) > 0
+        assert np.isnan(truth["pupil"][blink]).all()
+        x, y = eye.state(blink[:1])["pupil"][0, :2].round().astype(int)
+        assert images[blink[0], y, x] > SYNTHETIC_LEVELS["background"]
+
+    def test_parse_synthetic(self):
+        from eyeloop.sources.synthetic import parse_synthetic
+
+        assert parse_synthetic("1920x1080@1000") == {"size": (1920, 1080), "fps": 1000}
+        assert parse_synthetic("640x480")["size"] == (640, 480)
+        with pytest.raises(ValueError):
+            parse_synthetic("4k")
+
+
+class TestSyntheticSource:
+    def test_tracking_accuracy(self, tmpdir):
+        config.arguments = Arguments(["--clear", "1", "--save", "0", "--playback", "0"])
+        config.file_manager = File_Manager(output_root=Path(tmpdir), img_format=config.arguments.img_format)
+        from eyeloop.engine.engine import Engine
+        from eyeloop.sources.synthetic import SyntheticEye, SyntheticSource
+        from eyeloop.utilities.accuracy import compare_tracks, load_tracks, track_arrays
+
+        records = []
+
+        class Collector:
+            def fetch(self, engine):
+                records.append(engine.dataout)
+
+        eye = SyntheticEye(fps=500)
+        engine = Engine(source=functools.partial(SyntheticSource, eye=eye, n_frames=200), gui=None)
+        engine.load_extractors({"Collector": Collector()})
+        engine.arm()
+        params = eye.params()
+        engine.apply_params(params)
+        engine.set_centers(params)
+        records.clear()
+        engine.run()
+
+        truth = load_tracks(Path(config.file_manager.new_folderpath, "synthetic_truth.npz"))
+        report = compare_tracks(truth, track_arrays(records))
+        assert report["frames"] == 200 and report["frame_count_match"]
+        assert report["pupil_center"]["n"] == 200
+        assert report["pupil_center"]["p99"] < .5
+        assert report["pupil_axes"]["p99"] < 1
@@ -0,0 +1,61 @@
+# Unit tests for the ray-casting walkout
+import cv2
+import numpy as np
+import pytest
+
+from eyeloop.engine.walkout import RayCaster, get_ray_caster
+
+
+def disc_image(center=(120, 100), radius=30, shape=(200, 240)):
+    src = np.zeros(shape, dtype=np.uint8)
+    cv2.circle(src, center, radius, 255, -1)
+    return src
+
+
+class TestRayCaster:
+    @pytest.mark.parametrize("n_rays", [4, 16, 32, 64])
+    def test_rays_stop_at_disc_edge(self, n_rays):
+        rays = RayCaster(n_rays, min_radius=2, max_radius=100)
+        center = np.array((120, 100))
+        lengths = rays.cast(rays.sample(disc_image(), center))
+
+        assert lengths.shape == (n_rays,)
+        assert np.all(np.abs(lengths - 31) <= 1)
+
+        points = rays.points(center, lengths)
+        assert np.allclose(np.linalg.norm(points - center, axis=1), lengths)
+
+    def test_image_border_ends_rays(self):
+        rays = RayCaster(8, min_radius=1, max_radius=50)
+        src = np.full((40, 40), 255, dtype=np.uint8)
+        lengths = rays.cast(rays.sample(src, np.array((20, 20))))
+
+        assert lengths[0] == 19  # +x reaches the last column
+        assert lengths[4] == 20  # -x reaches column 0
+
+    def test_offset_walks_through_hole(self):
+        src = disc_image()
+        cv2.circle(src, (120, 100), 5, 0, -1)
+        rays = RayCaster(32, min_radius=2, max_radius=100)
+        inside = rays.sample(src, np.array((120, 100)))
+
+        assert np.all(rays.cast(inside) == 2)
+        assert np.all(np.abs(rays.cast_offset(inside) - 31) <= 1)
+
+    def test_tables_are_shared(self):
+        assert get_ray_caster(32, 2, 100) is get_ray_caster(32, 2, 100)
+        assert get_ray_caster(32, 2, 100) is not get_ray_caster(16, 2, 100)
+
+    def test_refine_subpixel_edge(self):
+        center = np.array((120, 100))
+        radius = 30.4
+        ys, xs = np.mgrid[:200, :240]
+        dist = np.hypot(xs - center[0], ys - center[1])
+        gray = cv2.GaussianBlur(255 * np.clip(radius - dist + .5, 0, 1), (7, 7), 0)
+
+        rays = RayCaster(32, min_radius=2, max_radius=100)
+        lengths = rays.cast(rays.sample((gray > 127.5).astype(np.uint8), center))
+        refined = rays.refine(gray, center, lengths, 127.5)
+
+        assert np.max(np.abs(refined - radius)) < .1
+        assert np.max(np.abs(refined - radius)) < np.max(np.abs(lengths - 1 - radius))